@@ -1,23 +1,41 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Request, request, jsonify, g
 from flask_cors import CORS
 from data_loader import DataLoader
+from knowledge_base import KnowledgeBase
 from llm_interface import LLMInterface
 from user_manager import UserManager
-from ocr_engine import OCREngine
+from ocr_service import open_ocr
 from web_search import WebSearcher
+import io
 import os
 import tempfile
 import base64
+import hmac
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import TimeoutError as FuturesTimeout
 from datetime import datetime
 import re
 
+class InMemoryUploadRequest(Request):
+    """Keeps multipart file parts in memory instead of spooling them to temp files."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return io.BytesIO()
+
 app = Flask(__name__)
+app.request_class = InMemoryUploadRequest
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get("NUTRIMED_MAX_UPLOAD_MB", 16)) * 1024 * 1024
 # Allow CORS for all domains on all routes, specifically for API
-CORS(app, resources={r"/api/*": {"origins": "*"}})
+CORS(app, resources={r"/api/*": {"origins": "*"}}, expose_headers=["ETag", "X-Session-Token"])
 
-# Create uploads directory
+# Uploads are analyzed in memory; set NUTRIMED_KEEP_UPLOADS=1 to also keep them here for debugging
 UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), 'uploads')
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+KEEP_UPLOADS = os.environ.get("NUTRIMED_KEEP_UPLOADS", "0") == "1"
+if KEEP_UPLOADS:
+    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
 @app.before_request
 def log_request():
@@ -25,12 +43,25 @@ def log_request():
 
 # Initialize system
 print("🚀 Sistem v3.0 (COMPLETE REWRITE) Başlatılıyor...")
-loader = DataLoader(".")
-loader.load_all_data()
-loader.load_general_qa()  # Load Q&A knowledge base for RAG enhancement
+_loader = DataLoader(".")
+_loader.load_all_data()
+_loader.load_general_qa()  # Load Q&A knowledge base for RAG enhancement
+# Handlers read knowledge.loader once per request; a reload swaps in a new generation (see knowledge_base.py)
+knowledge = KnowledgeBase(_loader, on_swap=lambda loader: _clear_analysis_cache())
+del _loader
+KB_WATCH = float(os.environ.get("NUTRIMED_KB_WATCH", 0))
+if KB_WATCH > 0:
+    knowledge.watch(KB_WATCH)
+ADMIN_TOKEN = os.environ.get("NUTRIMED_ADMIN_TOKEN")
+# Identifying the user by a raw "email" (no session token) lets any caller act as anyone;
+# only for old clients during migration
+ALLOW_EMAIL_AUTH = os.environ.get("NUTRIMED_ALLOW_EMAIL_AUTH", "0") == "1"
+if ALLOW_EMAIL_AUTH:
+    print("⚠️  NUTRIMED_ALLOW_EMAIL_AUTH=1: token'sız email ile kimlik kabul ediliyor (kullanımdan kalkacak).")
 llm = LLMInterface()
 user_mgr = UserManager()
-ocr = OCREngine(use_gpu=False)  # Initialize OCR engine
+ocr = open_ocr(use_gpu=False)  # Lazy by default; NUTRIMED_OCR_MODE=pool/remote run OCR in other processes
+OCR_TIMEOUT = float(os.environ.get("NUTRIMED_OCR_TIMEOUT", 120))
 web_searcher = WebSearcher()  # Initialize web search for verification
 
 @app.route('/api/register', methods=['POST'])
@@ -51,29 +82,287 @@ def login():
     data = request.json
     profile, msg = user_mgr.authenticate_user(data.get("email"), data.get("password"))
     if profile:
-        return jsonify({"success": True, "profile": profile})
+        # Follow-up calls send this token instead of re-verifying the password
+        return jsonify({"success": True, "profile": profile, "token": user_mgr.start_session(data.get("email"))})
     return jsonify({"success": False, "message": msg}), 401
 
-@app.route('/api/profile', methods=['POST'])
-def get_profile():
-    data = request.json
+def _int_param(data, name, maximum=None):
+    value = data.get(name)
+    if value is None or value == "":
+        return None
+    value = int(value)
+    return min(value, maximum) if maximum else value
+
+def _session_token(data):
+    auth = request.headers.get("Authorization", "")
+    if auth.startswith("Bearer "):
+        return auth[len("Bearer "):].strip()
+    return data.get("token")
+
+def _request_user(data):
+    """
+    Resolves the caller from a session token (Authorization: Bearer or "token").
+    A raw "email" without a token is rejected unless NUTRIMED_ALLOW_EMAIL_AUTH=1 (old clients).
+    Returns (user_key, token_version, error_response); token_version is None without a token,
+    user_key is None for an anonymous caller.
+    """
+    token = _session_token(data)
+    if token:
+        session = user_mgr.session_user(token)
+        if session is None:
+            return None, None, (jsonify({"error": "Oturum süresi doldu, tekrar giriş yapın."}), 401)
+        g.session = session
+        return session[0], session[1], None
     email = data.get("email")
+    if not email:
+        return None, None, None
+    if not ALLOW_EMAIL_AUTH:
+        return None, None, (jsonify({"error": "Oturum gerekli: /api/login token'ını Authorization: Bearer ile gönderin."}), 401)
+    print(f"⚠️  {request.path}: token yerine email ile kimlik (kullanımdan kalkacak)")
+    return email.lower().strip(), None, None
+
+def _profile_changed():
+    g.profile_changed = True
+
+def _store_version(version):
+    """Records the profile version this request read from the store, for the refreshed token."""
+    g.store_version = version
+
+@app.after_request
+def refresh_session_token(response):
+    """Token-authenticated calls get a fresh token: later expiry, current profile version."""
+    session = g.get("session")
+    if session:
+        user_key = session[0]
+        version = g.get("store_version")
+        if version is None or g.get("profile_changed"):
+            # Never re-sign the token's own version with a later expiry: the profile may have
+            # changed elsewhere (another device, email-authenticated calls) since it was issued
+            token = user_mgr.start_session(user_key)
+        else:
+            token = user_mgr.sessions.issue(user_key, version)  # Already read in this request
+        response.headers["X-Session-Token"] = token
+    return response
+
+def _profile_etag(user_key, version, page):
+    # The same user, profile version and page always produce the same body. Versions are
+    # per user, so the (keyed, non-reversible) user hash keeps two users' ETags apart
+    user = hmac.new(user_mgr.sessions.secret, user_key.encode("utf-8"), "sha256").hexdigest()[:16]
+    return "-".join(str(p) for p in (user, version) + page)
+
+def _private(response):
+    """Profile responses depend on the caller: never shared between users or from a shared cache."""
+    response.headers["Cache-Control"] = "private, no-cache"
+    response.vary.add("Authorization")
+    return response
+
+@app.route('/api/profile', methods=['GET', 'POST'])
+def get_profile():
+    """
+    Parameters (JSON body or query string):
+      token (or "Authorization: Bearer <token>" from /api/login),
+      view ("full" | "summary"), history_limit (max 100),
+      before (history_cursor of the previous page), since (history_since of an earlier response)
+    Send the returned ETag as If-None-Match to get 304 when nothing changed.
+    """
+    data = request.args if request.method == 'GET' else (request.get_json(silent=True) or {})
+    email, _, error = _request_user(data)
+    if error:
+        return error
     if not email:
         return jsonify({"error": "Email required"}), 400
-        
-    profile = user_mgr.get_user_profile(email)
-    if profile:
-        return jsonify(profile)
-    return jsonify({"error": "User not found"}), 404
+
+    view = data.get("view", "full")
+    try:
+        history_limit = _int_param(data, "history_limit", maximum=100)
+        before = _int_param(data, "before")
+        since = _int_param(data, "since")
+    except ValueError:
+        return jsonify({"error": "history_limit, before ve since tam sayı olmalı"}), 400
+
+    page = (view, history_limit, before, since)
+    # Always the stored version (one cheap read), never the token's: the profile may have
+    # changed elsewhere since the token was issued, and a 304 would hide that
+    version = user_mgr.profile_version(email)
+    if version is None:
+        return jsonify({"error": "User not found"}), 404
+    _store_version(version)
+    if request.if_none_match.contains(_profile_etag(email, version, page)):
+        response = app.response_class(status=304)
+        response.set_etag(_profile_etag(email, version, page))
+        return _private(response)
+
+    profile = user_mgr.get_user_profile(email, view, history_limit, before, since)
+    if not profile:
+        return jsonify({"error": "User not found"}), 404
+    response = jsonify(profile)
+    response.set_etag(_profile_etag(email, profile["version"], page))
+    _store_version(profile["version"])
+    return _private(response)
+
+def _keep_upload(image_bytes):
+    """Debug-only copy of an upload; uuid names never collide within the same second."""
+    ext = ".png" if bytes(image_bytes[:4]) == b"\x89PNG" else ".jpg"
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filepath = os.path.join(UPLOAD_FOLDER, f"upload_{timestamp}_{uuid.uuid4().hex[:8]}{ext}")
+    with open(filepath, 'wb') as f:
+        f.write(image_bytes)
+
+# analyze_direct answers keyed by the linked entities (or the normalized OCR text when nothing
+# links): the same box photographed again skips the LLM call too
+ANALYSIS_CACHE_SIZE = int(os.environ.get("NUTRIMED_ANALYSIS_CACHE_SIZE", 256))
+ANALYSIS_CACHE_TTL = float(os.environ.get("NUTRIMED_ANALYSIS_CACHE_TTL", 3600))
+_analysis_cache = OrderedDict()  # cache key -> (expires at, response)
+_analysis_cache_lock = threading.Lock()
+_analysis_cache_stats = {"hits": 0, "misses": 0}
+
+def _normalize_ocr_text(ocr_results):
+    text = " ".join(ocr_results).replace("İ", "i").replace("I", "ı").lower()
+    return " ".join(re.findall(r"[0-9a-zçğıöşü]+", text))
+
+def _clear_analysis_cache():
+    """Answers of the previous knowledge base generation can no longer be hit; frees them."""
+    with _analysis_cache_lock:
+        _analysis_cache.clear()
+
+def _analyze_ocr_text(query_text, ocr_results):
+    """LLM analysis of OCR lines. Returns (reply, linked entities)."""
+    # A request that started before a reload may finish after the swap; the generation in
+    # the key keeps its answer from being served for the new knowledge base
+    generation, loader = knowledge.current()
+    entities = loader.link_entities(ocr_results)
+    drug_names = [d["name"] for d in entities["drugs"]]
+    if drug_names or entities["foods"]:
+        key = "entities:" + "|".join(sorted(drug_names)) + "#" + "|".join(sorted(entities["foods"]))
+    else:
+        key = _normalize_ocr_text(ocr_results)
+    key = f"{generation}:{key}" if key else key
+    now = time.monotonic()
+    with _analysis_cache_lock:
+        cached = _analysis_cache.get(key)
+        if cached is not None and cached[0] > now:
+            _analysis_cache.move_to_end(key)
+            _analysis_cache_stats["hits"] += 1
+            return cached[1], entities
+        _analysis_cache_stats["misses"] += 1
+
+    if drug_names or entities["foods"]:
+        # Only linked entities and their known interactions go to the LLM, not the raw OCR noise
+        interactions = loader.find_interactions([d["data"] for d in entities["drugs"]], entities["foods"])
+        context_prompt = llm.build_entity_prompt(entities["drugs"], entities["foods"], interactions)
+    else:
+        # Nothing known on the label: ask the model to identify what it sees
+        context_prompt = f"Görseldeki şu metinleri okudum: '{query_text}'. Bu bir ilaç veya besin etiketi olabilir. Analiz et ve varsa uyarılarını sırala."
+    llm_response = llm.analyze_direct(context_prompt)
+
+    # Errors are not cached, the next photo retries the LLM
+    if ANALYSIS_CACHE_SIZE and key and not llm_response.startswith("⚠️") and llm_response != "Analiz yanıtı alınamadı.":
+        with _analysis_cache_lock:
+            _analysis_cache[key] = (now + ANALYSIS_CACHE_TTL, llm_response)
+            _analysis_cache.move_to_end(key)
+            while len(_analysis_cache) > ANALYSIS_CACHE_SIZE:
+                _analysis_cache.popitem(last=False)
+    return llm_response, entities
+
+def _analyze_image_bytes(image_bytes, user_email):
+    """OCR + LLM analysis of an encoded image held in memory. Returns a Flask response."""
+    if KEEP_UPLOADS:
+        _keep_upload(image_bytes)
+
+    # Run OCR (Now enriched with OpenCV), decoded straight from the buffer.
+    # With NUTRIMED_OCR_MODE=pool this waits on a worker process, not on this thread's CPU.
+    try:
+        ocr_results, ocr_timings = ocr.submit(image_bytes).result(timeout=OCR_TIMEOUT)
+    except FuturesTimeout:
+        return jsonify({"success": False, "message": "Görsel analizi zaman aşımına uğradı, lütfen tekrar deneyin."}), 503
+    ocr_timings_ms = {stage: round(seconds * 1000, 1) for stage, seconds in ocr_timings.items()}
+    print(f"🔍 OCR Sonuçları: {ocr_results} | süreler (ms): {ocr_timings_ms}")
+    
+    if not ocr_results:
+        return jsonify({
+            "success": False,
+            "message": "Görselden metin okunamadı."
+        })
+    
+    query_text = " ".join(ocr_results)
+    llm_response, entities = _analyze_ocr_text(query_text, ocr_results)
+    
+    # Log to history
+    if user_email:
+        risk_level = "info"
+        if "risk" in llm_response.lower() or "dikkat" in llm_response.lower():
+            risk_level = "medium"
+        if "tehlikeli" in llm_response.lower() or "kullanmayınız" in llm_response.lower():
+            risk_level = "high"
+            
+        user_mgr.log_interaction_v2(
+            user_email,
+            f"[📷 Görsel] {query_text[:40]}...",
+            risk_level,
+            llm_response[:100] + "...",
+            llm_response
+        )
+        _profile_changed()
+    
+    return jsonify({
+        "success": True,
+        "reply": llm_response,
+        "ocr_results": ocr_results,
+        "ocr_timings_ms": ocr_timings_ms,
+        "detected_drugs": [{"name": d["name"], "matched": d["matched"]} for d in entities["drugs"]],
+        "detected_foods": entities["foods"]
+    })
+
+@app.route('/api/cache-stats', methods=['GET'])
+def cache_stats():
+    """Hit metrics of the OCR (perceptual hash) and image analysis caches."""
+    with _analysis_cache_lock:
+        hits, misses = _analysis_cache_stats["hits"], _analysis_cache_stats["misses"]
+        entries = len(_analysis_cache)
+    lookups = hits + misses
+    return jsonify({
+        "ocr": ocr.cache_info(),
+        "analysis": {"entries": entries, "capacity": ANALYSIS_CACHE_SIZE, "hits": hits, "misses": misses,
+                     "hit_rate": round(hits / lookups, 3) if lookups else None}
+    })
+
+def _is_admin():
+    """X-Admin-Token must match NUTRIMED_ADMIN_TOKEN; without a configured token only localhost is trusted."""
+    if ADMIN_TOKEN:
+        return hmac.compare_digest(request.headers.get("X-Admin-Token", ""), ADMIN_TOKEN)
+    return request.remote_addr in ("127.0.0.1", "::1")
+
+@app.route('/api/admin/reload', methods=['GET', 'POST'])
+def admin_reload():
+    """
+    POST starts a background knowledge base reload of the changed data files
+    ({"full": true} reloads everything); GET returns the reload status.
+    Requests keep being served from the current generation until the new one is ready.
+    """
+    if not _is_admin():
+        return jsonify({"success": False, "message": "Yetkisiz"}), 403
+    if request.method == 'GET':
+        return jsonify({"success": True, **knowledge.status()})
+    data = request.get_json(silent=True) or {}
+    started = knowledge.reload(full=bool(data.get("full")))
+    return jsonify({
+        "success": True,
+        "started": started,
+        "message": "Yeniden yükleme başladı." if started else "Yeniden yükleme zaten sürüyor.",
+        **knowledge.status()
+    }), 202 if started else 409
 
 @app.route('/api/analyze-image', methods=['POST'])
 def analyze_image():
     """
-    Accepts an image, runs improved OCR, and sends text DIRECTLY to fine-tuned LLM.
+    Accepts an image (base64 data URL in JSON), runs improved OCR, and sends text DIRECTLY to fine-tuned LLM.
+    Prefer /api/analyze-image/upload for new clients (no base64 overhead).
     """
     try:
         data = request.json
-        user_email = data.get('email')
+        user_email, _, error = _request_user(data)
+        if error:
+            return error
         image_data = data.get('image')
         
         if not image_data:
@@ -82,66 +371,54 @@ def analyze_image():
         if ',' in image_data:
             image_data = image_data.split(',')[1]
         
-        image_bytes = base64.b64decode(image_data)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filepath = os.path.join(UPLOAD_FOLDER, f"upload_{timestamp}.jpg")
-        
-        with open(filepath, 'wb') as f:
-            f.write(image_bytes)
-        
-        # Run OCR (Now enriched with OpenCV)
-        ocr_results = ocr.extract_text(filepath)
-        print(f"🔍 OCR Sonuçları: {ocr_results}")
-        
-        if not ocr_results:
-            return jsonify({
-                "success": False,
-                "message": "Görselden metin okunamadı."
-            })
-        
-        query_text = " ".join(ocr_results)
-        
-        # Direct LLM Analysis (No DB Search)
-        # Using a prompt that asks the model to identify what it sees
-        context_prompt = f"Görseldeki şu metinleri okudum: '{query_text}'. Bu bir ilaç veya besin etiketi olabilir. Analiz et ve varsa uyarılarını sırala."
-        llm_response = llm.analyze_direct(context_prompt)
-        
-        # Log to history
-        if user_email:
-            risk_level = "info"
-            if "risk" in llm_response.lower() or "dikkat" in llm_response.lower():
-                risk_level = "medium"
-            if "tehlikeli" in llm_response.lower() or "kullanmayınız" in llm_response.lower():
-                risk_level = "high"
-                
-            user_mgr.log_interaction_v2(
-                user_email,
-                f"[📷 Görsel] {query_text[:40]}...",
-                risk_level,
-                llm_response[:100] + "...",
-                llm_response
-            )
-        
-        return jsonify({
-            "success": True,
-            "reply": llm_response,
-            "ocr_results": ocr_results,
-            "detected_drugs": [], # Can't guarantee extraction without DB, leaving empty for now or could parse LLM
-            "detected_foods": []
-        })
+        return _analyze_image_bytes(base64.b64decode(image_data), user_email)
         
     except Exception as e:
         print(f"❌ Image analysis error: {e}")
         return jsonify({"success": False, "message": str(e)}), 500
 
+@app.route('/api/analyze-image/upload', methods=['POST'])
+def analyze_image_upload():
+    """
+    Same analysis as /api/analyze-image, for binary uploads:
+      - multipart/form-data with the file in an "image" field (token as a form field), or
+      - a raw body (Content-Type: image/jpeg, image/png, application/octet-stream),
+        with the token in the Authorization header
+    The upload stays in memory and is decoded with cv2.imdecode without extra copies.
+    """
+    try:
+        if request.files:
+            upload = request.files.get('image')
+            if upload is None:
+                return jsonify({"success": False, "message": "'image' alanı gerekli"}), 400
+            image_bytes = upload.stream.getbuffer()
+            params = request.form
+        else:
+            image_bytes = request.get_data(cache=False)
+            params = request.args
+        if not len(image_bytes):
+            return jsonify({"success": False, "message": "Görsel gerekli"}), 400
+
+        user_email, _, error = _request_user(params)
+        if error:
+            return error
+        return _analyze_image_bytes(image_bytes, user_email)
+
+    except Exception as e:
+        print(f"❌ Image upload error: {e}")
+        return jsonify({"success": False, "message": str(e)}), 500
+
 @app.route('/api/chat', methods=['POST'])
 def chat():
     data = request.json
     user_message = data.get('message', '')
-    user_email = data.get('email')
+    user_email, _, error = _request_user(data)
+    if error:
+        return error
     
     if not user_message:
         return jsonify({"reply": "Lütfen bir mesaj yazın."})
+    loader = knowledge.loader
 
     # =========================================
     # AUTOMATIC MEDICATION EXTRACTION
@@ -149,38 +426,17 @@ def chat():
     detected_medications = []
     added_medications = []
     
-    # Check for medication usage patterns
-    usage_patterns = [
-        r'([\w\s]+?)\s+(?:kullanıyorum|kullanmaktayım|alıyorum|içiyorum)',
-        r'(?:kullanıyorum|alıyorum)\s+([\w\s,]+)',
-    ]
-    
     msg_lower = user_message.lower()
     if any(trigger in msg_lower for trigger in ['kullanıyorum', 'kullanmaktayım', 'alıyorum', 'içiyorum']):
-        # Extract potential drug names
-        # Split by common separators
-        cleaned = re.sub(r'\s+', ' ', user_message)
-        
-        # Remove trigger words and split
-        for trigger in ['kullanıyorum', 'kullanmaktayım', 'alıyorum', 'içiyorum']:
-            cleaned = cleaned.replace(trigger, '|||')  # Mark for split
-        
-        # Split by multiple delimiters
-        parts = re.split(r'[,\|\|\|]|\sve\s|\sile\s', cleaned)
-        
-        for part in parts:
-            part = part.strip()
-            if len(part) > 2 and len(part) < 50:  # Reasonable drug name length
-                # Try to validate against drug database
-                drug_data = loader.search_drug(part)
-                if drug_data:
-                    detected_medications.append({
-                        "name": part.title(),
-                        "validated": True,
-                        "data": drug_data
-                    })
-                    added_medications.append(part.title())
-                    print(f"💊 İlaç Algılandı ve Doğrulandı: {part}")
+        # Every known drug / brand name in the message, in one pass (Turkish suffixes allowed)
+        for medication in loader.extract_medications(user_message):
+            detected_medications.append({
+                "name": medication["name"].title(),
+                "validated": True,
+                "data": medication["data"]
+            })
+            added_medications.append(medication["name"].title())
+            print(f"💊 İlaç Algılandı ve Doğrulandı: {medication['matched']}")
     
     # Build medication confirmation message
     medication_notice = ""
@@ -278,6 +534,7 @@ def chat():
              response_text[:100] + "..." if len(response_text) > 100 else response_text,
              response_text
          )
+         _profile_changed()
 
     # Append medication notice and confidence to response
     final_response = response_text + medication_notice + confidence_notice
@@ -293,7 +550,9 @@ def chat():
 def update_health_profile():
     """Updates user's health profile with diseases, allergies, medications."""
     data = request.json
-    email = data.get("email")
+    email, _, error = _request_user(data)
+    if error:
+        return error
     if not email:
         return jsonify({"success": False, "message": "Email gerekli"}), 400
     
@@ -302,6 +561,7 @@ def update_health_profile():
     medications = data.get("medications")
     
     success = user_mgr.update_user_health_profile(email, diseases, allergies, medications)
+    _profile_changed()
     
     if success:
         return jsonify({"success": True, "message": "Sağlık profili güncellendi"})
@@ -311,12 +571,16 @@ def update_health_profile():
 def get_health_advice():
     """Returns personalized health advice based on user's profile."""
     data = request.json
-    email = data.get("email")
+    email, token_version, error = _request_user(data)
+    if error:
+        return error
     if not email:
         return jsonify({"success": False, "message": "Email gerekli"}), 400
     
-    advice = user_mgr.get_health_advice(email)
-    profile_complete = user_mgr.is_profile_complete(email)
+    # Both come from the advice cache when the token's profile version is current. A token
+    # older than a change made elsewhere is answered once from it; the refreshed token
+    # (see refresh_session_token) then carries the stored version
+    advice, profile_complete = user_mgr.get_health_advice_status(email, version=token_version)
     
     return jsonify({
         "success": True, 
@@ -328,7 +592,9 @@ def get_health_advice():
 def get_profile_status():
     """Checks if user has completed their health profile."""
     data = request.json
-    email = data.get("email")
+    email, _, error = _request_user(data)
+    if error:
+        return error
     if not email:
         return jsonify({"profile_complete": False}), 400
     
@@ -3,12 +3,22 @@ NutriMedAI Benchmark & Doğruluk Değerlendirme Scripti
 =====================================================
 Bu script projenin genel doğruluk oranını test sorularıyla ölçer.
 
-Kullanım: python benchmark_accuracy.py
+Kullanım:
+  python benchmark_accuracy.py                                 # API (/api/chat) üzerinden
+  python benchmark_accuracy.py --api-url http://host:5000/api/chat
+  python benchmark_accuracy.py --llm-url http://localhost:11435  # Doğrudan LLMInterface
+  python benchmark_accuracy.py --stub --concurrency 4          # Gömülü stub LLM ile (GPU gerekmez)
+
+--llm-url / --stub modlarında doğruluk skoru üretilmez; yalnızca gecikme ve
+verim (throughput) ölçülür. Modelin kendisi dışındaki her şeyi tekrarlanabilir
+şekilde ölçmek için stub_llm_server.py ile birlikte kullanın.
 """
 
+import argparse
 import requests
 import json
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 # API endpoint
@@ -43,118 +53,150 @@ TEST_QUESTIONS = [
 ]
 
 
-def run_benchmark():
+def _percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    idx = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[idx]
+
+
+def _run_single(test, api_url, llm):
+    """Runs one test question against the API or directly against LLMInterface."""
+    category = test["category"]
+    question = test["question"]
+    start_time = time.time()
+
+    if llm is not None:
+        reply = llm.analyze_with_qa_context(question)
+        elapsed = time.time() - start_time
+        success = not reply.startswith("⚠️ LLM Hatası") and reply != "Analiz yanıtı alınamadı."
+        return {"category": category, "question": question, "score": None,
+                "time": elapsed, "success": success}
+
+    try:
+        response = requests.post(
+            api_url,
+            json={"message": question},
+            timeout=120
+        )
+        elapsed = time.time() - start_time
+
+        if response.status_code == 200:
+            data = response.json()
+            return {"category": category, "question": question,
+                    "score": data.get("confidence_score", 0),
+                    "time": elapsed, "success": True}
+        print(f"   ❌ Hata: HTTP {response.status_code}")
+        return {"category": category, "question": question, "score": 0, "time": 0, "success": False}
+
+    except requests.exceptions.Timeout:
+        print(f"   ⏰ Zaman aşımı!")
+        return {"category": category, "question": question, "score": 0, "time": 120, "success": False}
+    except Exception as e:
+        print(f"   ❌ Hata: {e}")
+        return {"category": category, "question": question, "score": 0, "time": 0, "success": False}
+
+
+def run_benchmark(api_url=API_URL, llm_url=None, concurrency=1, delay=1.0):
     """Tüm test sorularını çalıştırır ve sonuçları toplar."""
+    llm = None
+    if llm_url:
+        from llm_interface import LLMInterface
+        llm = LLMInterface(host=llm_url)
+
     print("=" * 60)
     print("🔬 NutriMedAI Benchmark Başlatılıyor...")
     print(f"📅 Tarih: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"🎯 Hedef: {'LLM ' + llm.host if llm else 'API ' + api_url} (eşzamanlılık: {concurrency})")
     print(f"📝 Toplam Soru: {len(TEST_QUESTIONS)}")
     print("=" * 60)
-    
+
     results = []
     category_scores = {}
-    
-    for i, test in enumerate(TEST_QUESTIONS, 1):
-        category = test["category"]
-        question = test["question"]
-        
-        print(f"\n[{i}/{len(TEST_QUESTIONS)}] 💬 {question[:50]}...")
-        
-        try:
-            start_time = time.time()
-            
-            response = requests.post(
-                API_URL,
-                json={"message": question},
-                timeout=120
-            )
-            
-            elapsed = time.time() - start_time
-            
-            if response.status_code == 200:
-                data = response.json()
-                score = data.get("confidence_score", 0)
-                reply = data.get("reply", "")[:100]
-                
-                print(f"   ✅ Skor: %{score} | Süre: {elapsed:.1f}s")
-                
-                results.append({
-                    "category": category,
-                    "question": question,
-                    "score": score,
-                    "time": elapsed,
-                    "success": True
-                })
-                
-                # Kategori ortalaması için topla
-                if category not in category_scores:
-                    category_scores[category] = []
-                category_scores[category].append(score)
-            else:
-                print(f"   ❌ Hata: HTTP {response.status_code}")
-                results.append({
-                    "category": category,
-                    "question": question,
-                    "score": 0,
-                    "time": 0,
-                    "success": False
-                })
-                
-        except requests.exceptions.Timeout:
-            print(f"   ⏰ Zaman aşımı!")
-            results.append({
-                "category": category,
-                "question": question,
-                "score": 0,
-                "time": 120,
-                "success": False
-            })
-        except Exception as e:
-            print(f"   ❌ Hata: {e}")
-            results.append({
-                "category": category,
-                "question": question,
-                "score": 0,
-                "time": 0,
-                "success": False
-            })
-        
-        # Rate limiting
-        time.sleep(1)
-    
+    wall_start = time.time()
+
+    def run_indexed(item):
+        i, test = item
+        print(f"\n[{i}/{len(TEST_QUESTIONS)}] 💬 {test['question'][:50]}...")
+        result = _run_single(test, api_url, llm)
+        if result["success"]:
+            score_text = f"Skor: %{result['score']} | " if result["score"] is not None else ""
+            print(f"   ✅ {score_text}Süre: {result['time']:.1f}s")
+        # Rate limiting (sequential API mode only)
+        if concurrency == 1 and delay > 0:
+            time.sleep(delay)
+        return result
+
+    indexed = list(enumerate(TEST_QUESTIONS, 1))
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(run_indexed, indexed))
+    else:
+        results = [run_indexed(item) for item in indexed]
+
+    wall_time = time.time() - wall_start
+
+    for r in results:
+        # Kategori ortalaması için topla
+        if r["success"] and r["score"] is not None:
+            category_scores.setdefault(r["category"], []).append(r["score"])
+
     # Sonuçları hesapla
     print("\n" + "=" * 60)
     print("📊 BENCHMARK SONUÇLARI")
     print("=" * 60)
-    
+
     successful = [r for r in results if r["success"]]
-    
-    if successful:
-        scores = [r["score"] for r in successful]
-        times = [r["time"] for r in successful]
-        
+
+    if not successful:
+        print("❌ Hiçbir test başarılı olmadı!")
+        return 0
+
+    times = [r["time"] for r in successful]
+    avg_time = sum(times) / len(times)
+
+    print(f"\n📈 GENEL İSTATİSTİKLER:")
+    print(f"   Toplam Test: {len(TEST_QUESTIONS)}")
+    print(f"   Başarılı: {len(successful)}")
+    print(f"   Başarısız: {len(TEST_QUESTIONS) - len(successful)}")
+
+    print(f"\n⏱️ YANIT SÜRELERİ:")
+    print(f"   Ortalama: {avg_time:.1f} saniye")
+    print(f"   p50: {_percentile(times, 50):.2f}s | p95: {_percentile(times, 95):.2f}s | Maks: {max(times):.2f}s")
+    print(f"   Verim: {len(successful) / wall_time:.2f} istek/s (toplam {wall_time:.1f}s)")
+
+    report = {
+        "timestamp": datetime.now().isoformat(),
+        "mode": "llm" if llm else "api",
+        "target": llm.host if llm else api_url,
+        "concurrency": concurrency,
+        "total_tests": len(TEST_QUESTIONS),
+        "successful_tests": len(successful),
+        "average_time": round(avg_time, 2),
+        "p50_time": round(_percentile(times, 50), 3),
+        "p95_time": round(_percentile(times, 95), 3),
+        "throughput_rps": round(len(successful) / wall_time, 3),
+        "detailed_results": results
+    }
+
+    scores = [r["score"] for r in successful if r["score"] is not None]
+    avg_score = 0
+    if scores:
         avg_score = sum(scores) / len(scores)
         min_score = min(scores)
         max_score = max(scores)
-        avg_time = sum(times) / len(times)
-        
-        print(f"\n📈 GENEL İSTATİSTİKLER:")
-        print(f"   Toplam Test: {len(TEST_QUESTIONS)}")
-        print(f"   Başarılı: {len(successful)}")
-        print(f"   Başarısız: {len(TEST_QUESTIONS) - len(successful)}")
+
         print(f"\n🎯 DOĞRULUK SKORLARI:")
         print(f"   Ortalama: %{avg_score:.1f}")
         print(f"   Minimum: %{min_score}")
         print(f"   Maksimum: %{max_score}")
-        print(f"\n⏱️ YANIT SÜRELERİ:")
-        print(f"   Ortalama: {avg_time:.1f} saniye")
-        
+
         # Kategori bazlı sonuçlar
         print(f"\n📂 KATEGORİ BAZLI SONUÇLAR:")
         for cat, cat_scores in category_scores.items():
             cat_avg = sum(cat_scores) / len(cat_scores)
             print(f"   {cat}: %{cat_avg:.1f} (n={len(cat_scores)})")
-        
+
         # Skor dağılımı
         print(f"\n📊 SKOR DAĞILIMI:")
         high = len([s for s in scores if s >= 80])
@@ -163,26 +205,22 @@ def run_benchmark():
         print(f"   🟢 Yüksek (≥80%): {high}")
         print(f"   🟡 Orta (60-79%): {medium}")
         print(f"   🔴 Düşük (<60%): {low}")
-        
-        # Sonuçları dosyaya kaydet
-        report = {
-            "timestamp": datetime.now().isoformat(),
-            "total_tests": len(TEST_QUESTIONS),
-            "successful_tests": len(successful),
+
+        report.update({
             "average_score": round(avg_score, 2),
             "min_score": min_score,
             "max_score": max_score,
-            "average_time": round(avg_time, 2),
             "category_scores": {k: round(sum(v)/len(v), 2) for k, v in category_scores.items()},
-            "detailed_results": results
-        }
-        
-        with open("benchmark_results.json", "w", encoding="utf-8") as f:
-            json.dump(report, f, ensure_ascii=False, indent=2)
-        
-        print(f"\n💾 Sonuçlar 'benchmark_results.json' dosyasına kaydedildi.")
-        
-        # Özet sonuç
+        })
+
+    # Sonuçları dosyaya kaydet
+    with open("benchmark_results.json", "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print(f"\n💾 Sonuçlar 'benchmark_results.json' dosyasına kaydedildi.")
+
+    # Özet sonuç
+    if scores:
         print("\n" + "=" * 60)
         if avg_score >= 80:
             print(f"🏆 SONUÇ: YÜKSEK DOĞRULUK (%{avg_score:.1f})")
@@ -191,18 +229,39 @@ def run_benchmark():
         else:
             print(f"⚠️ SONUÇ: DÜŞÜK DOĞRULUK (%{avg_score:.1f})")
         print("=" * 60)
-        
-        return avg_score
-    else:
-        print("❌ Hiçbir test başarılı olmadı!")
-        return 0
+
+    return avg_score
 
 
 if __name__ == "__main__":
-    print("\n⚠️ API sunucusunun çalışır durumda olduğundan emin olun!")
-    print("   (python api_server.py)\n")
-    
-    # Otomatik başlat
-    score = run_benchmark()
-    
-    print(f"\n✅ Benchmark tamamlandı. Genel Doğruluk: %{score:.1f}")
+    parser = argparse.ArgumentParser(description="NutriMedAI doğruluk ve gecikme benchmark'ı")
+    parser.add_argument("--api-url", default=API_URL, help="Chat API adresi")
+    parser.add_argument("--llm-url", help="API yerine doğrudan bu Ollama/stub adresindeki LLM'i ölç")
+    parser.add_argument("--stub", action="store_true", help="Gömülü stub LLM sunucusu başlat ve onu ölç")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--delay", type=float, default=1.0, help="Ardışık istekler arası bekleme (s)")
+    args = parser.parse_args()
+
+    stub = None
+    llm_url = args.llm_url
+    if args.stub:
+        from stub_llm_server import StubOllamaServer
+        stub = StubOllamaServer(port=0).start()
+        llm_url = stub.url
+        print(f"\n🧪 Stub LLM sunucusu başlatıldı: {stub.url}")
+    elif not llm_url:
+        print("\n⚠️ API sunucusunun çalışır durumda olduğundan emin olun!")
+        print("   (python api_server.py)\n")
+
+    try:
+        # Otomatik başlat
+        score = run_benchmark(args.api_url, llm_url, args.concurrency,
+                              0 if llm_url else args.delay)
+    finally:
+        if stub:
+            stub.stop()
+
+    if llm_url:
+        print(f"\n✅ Benchmark tamamlandı (LLM gecikme modu).")
+    else:
+        print(f"\n✅ Benchmark tamamlandı. Genel Doğruluk: %{score:.1f}")
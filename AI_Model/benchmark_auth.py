@@ -0,0 +1,149 @@
+"""
+Giriş maliyeti ölçümü: seçilen parola hash ayarlarında çekirdek başına saniyedeki
+giriş (parola doğrulama) sayısı ve imzalı oturum token'ı doğrulamanın maliyeti
+(sabit süreli karşılaştırma kontrolü dahil).
+
+Kullanım:
+  python benchmark_auth.py                          # ortamdaki ayarlar + karşılaştırma tablosu
+  python benchmark_auth.py --processes 4 --seconds 3
+  NUTRIMED_SCRYPT_N=32768 python benchmark_auth.py
+"""
+
+import argparse
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.append(os.getcwd())
+
+from security import PasswordHasher, SessionTokens
+from user_manager import UserManager
+
+
+def verify_rate(hasher, seconds):
+    """Password verifications per second on one core."""
+    stored = hasher.hash("benchmark-password")
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        hasher.verify(stored, "benchmark-password")
+        count += 1
+    return count / (time.perf_counter() - start)
+
+
+def _verify_worker(args):
+    scheme, scrypt_n, iterations, seconds = args
+    return verify_rate(PasswordHasher(scheme, scrypt_n, iterations), seconds)
+
+
+def login_rate(seconds):
+    """End-to-end UserManager.authenticate_user calls per second (one thread)."""
+    data_dir = tempfile.mkdtemp(prefix="nutrimed_auth_")
+    os.makedirs(os.path.join(data_dir, "data"))
+    try:
+        um = UserManager(data_dir, backend="json")
+        um.register_user("Bench", "User", "bench@example.com", "benchmark-password")
+        count = 0
+        start = time.perf_counter()
+        while time.perf_counter() - start < seconds:
+            profile, _ = um.authenticate_user("bench@example.com", "benchmark-password")
+            assert profile is not None
+            count += 1
+        rate = count / (time.perf_counter() - start)
+        um.store.close()
+        return rate
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def token_rate(seconds):
+    tokens = SessionTokens("benchmark-secret")
+    token = tokens.issue("bench@example.com", 42)
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        tokens.verify(token)
+        count += 1
+    return count / (time.perf_counter() - start)
+
+
+def _tamper(token, position):
+    chars = list(token)
+    chars[position] = "A" if chars[position] != "A" else "B"
+    return "".join(chars)
+
+
+def token_timing(rounds=20000):
+    """
+    Mean verification time (ns) for a valid token and for signatures that are
+    wrong in the first vs. the last character. With a constant-time compare
+    the two forged cases take the same time.
+    """
+    tokens = SessionTokens("benchmark-secret")
+    token = tokens.issue("bench@example.com", 42)
+    sig_start = token.rindex(".") + 1
+    cases = {"geçerli": token, "ilk karakter hatalı": _tamper(token, sig_start),
+             "son karakter hatalı": _tamper(token, len(token) - 2)}
+    results = {}
+    for name, candidate in cases.items():
+        best = None
+        for _ in range(5):  # Best of 5 to damp scheduler noise
+            start = time.perf_counter_ns()
+            for _ in range(rounds):
+                tokens.verify(candidate)
+            elapsed = (time.perf_counter_ns() - start) / rounds
+            best = elapsed if best is None else min(best, elapsed)
+        results[name] = best
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parola doğrulama / giriş verim ölçümü")
+    parser.add_argument("--seconds", type=float, default=2.0, help="Her ölçümün süresi")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1,
+                        help="Paralel ölçüm için process sayısı")
+    parser.add_argument("--no-compare", action="store_true", help="Karşılaştırma tablosunu atla")
+    args = parser.parse_args()
+
+    hasher = PasswordHasher()
+    cost = f"n={hasher.scrypt_n}" if hasher.scheme == "scrypt" else f"iterations={hasher.pbkdf2_iterations}"
+    print("=" * 60)
+    print(f"🔐 Seçili ayar: {hasher.scheme} ({cost})")
+    print("=" * 60)
+
+    single = verify_rate(hasher, args.seconds)
+    print(f"Tek çekirdek: {single:.1f} doğrulama/s ({1000 / single:.1f} ms/giriş)")
+
+    if args.processes > 1:
+        ctx = multiprocessing.get_context("spawn")
+        job = (hasher.scheme, hasher.scrypt_n, hasher.pbkdf2_iterations, args.seconds)
+        with ctx.Pool(args.processes) as pool:
+            rates = pool.map(_verify_worker, [job] * args.processes)
+        total = sum(rates)
+        print(f"{args.processes} process: toplam {total:.1f} doğrulama/s, "
+              f"çekirdek başına {total / args.processes:.1f}/s")
+
+    print(f"UserManager.authenticate_user: {login_rate(args.seconds):.1f} giriş/s (tek thread)")
+    print(f"Oturum token'ı doğrulama: {token_rate(min(args.seconds, 1.0)):,.0f} istek/s")
+    timing = token_timing()
+    print("Token doğrulama süresi: " + ", ".join(f"{k} {v:,.0f} ns" for k, v in timing.items()))
+    forged = (timing["ilk karakter hatalı"], timing["son karakter hatalı"])
+    print(f"  Sahte imza farkı: {abs(forged[0] - forged[1]) / max(forged) * 100:.1f}% "
+          "(sabit süreli karşılaştırmada gürültü düzeyinde kalmalı)")
+
+    if not args.no_compare:
+        print("\nMaliyet karşılaştırması (tek çekirdek):")
+        options = [("scrypt", n, None) for n in (8192, 16384, 32768)] if hasattr(__import__("hashlib"), "scrypt") else []
+        options += [("pbkdf2_sha256", None, it) for it in (210000, 600000)]
+        for scheme, n, iterations in options:
+            h = PasswordHasher(scheme, n, iterations)
+            label = f"n={n}" if scheme == "scrypt" else f"iterations={iterations}"
+            rate = verify_rate(h, args.seconds / 2)
+            print(f"  {scheme:<14} {label:<18} {rate:8.1f}/s  {1000 / rate:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
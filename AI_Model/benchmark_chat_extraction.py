@@ -0,0 +1,105 @@
+"""
+Sohbet mesajlarından ilaç çıkarma verimi: eski yöntem (tetikleyici fiiller + regex
+bölme + her parçaya search_drug) ile Aho–Corasick çıkarıcı (DataLoader.extract_medications)
+karşılaştırması. Mesajlar veritabanındaki ilaç adlarından, Türkçe eklerle üretilir;
+saniyedeki mesaj sayısı ve bulunan ilaçların isabeti raporlanır.
+
+Kullanım:
+  python benchmark_chat_extraction.py
+  python benchmark_chat_extraction.py --messages 2000 --seed 7
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.append(os.getcwd())
+
+from data_loader import DataLoader
+
+TRIGGERS = ["kullanıyorum", "alıyorum", "içiyorum", "kullanmaktayım"]
+SUFFIXES = ["", "", "'ü", "'yi", "i", "'den", "'la"]
+FILLERS = ["Merhaba,", "Doktorum söyledi,", "bir süredir", "her sabah", "akşamları", "tok karnına"]
+
+
+def legacy_extract(loader, user_message):
+    """The old /api/chat extraction, kept here as the baseline."""
+    found = []
+    cleaned = re.sub(r'\s+', ' ', user_message)
+    for trigger in TRIGGERS:
+        cleaned = cleaned.replace(trigger, '|||')
+    parts = re.split(r'[,\|\|\|]|\sve\s|\sile\s', cleaned)
+    for part in parts:
+        part = part.strip()
+        if len(part) > 2 and len(part) < 50:
+            if loader.search_drug(part):
+                found.append(part)
+    return found
+
+
+def sample_messages(loader, n, seed):
+    """Messages mentioning 1-3 known drugs; returns [(message, {expected names})]."""
+    rng = random.Random(seed)
+    names = [name for name in loader.drug_index if len(name) >= 4]
+    messages = []
+    for _ in range(n):
+        picked = rng.sample(names, rng.randint(1, 3))
+        mentions = [name.title() + rng.choice(SUFFIXES) for name in picked]
+        text = f"{rng.choice(FILLERS)} {' ve '.join(mentions)} {rng.choice(TRIGGERS)}"
+        messages.append((text, set(picked)))
+    return messages
+
+
+def run(extract, messages):
+    """Returns (messages per second, recall)."""
+    hits = total = 0
+    with contextlib.redirect_stdout(io.StringIO()):  # search_drug prints its fallbacks
+        start = time.perf_counter()
+        results = [extract(text) for text, _ in messages]
+        elapsed = time.perf_counter() - start
+    for found, (_, expected) in zip(results, messages):
+        total += len(expected)
+        hits += len(expected & found)
+    return len(messages) / elapsed, hits / total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sohbet ilaç çıkarma verim karşılaştırması")
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    loader = DataLoader(".")
+    loader.load_all_data()
+    if not loader.drug_index:
+        print("❌ İlaç verisi bulunamadı.")
+        return
+
+    start = time.perf_counter()
+    loader.build_entity_index()
+    build_ms = (time.perf_counter() - start) * 1000
+    messages = sample_messages(loader, args.messages, args.seed)
+
+    def legacy(text):
+        return {loader.search_drug(part)["product_name"] for part in legacy_extract(loader, text)}
+
+    def automaton(text):
+        return {m["data"]["product_name"] for m in loader.extract_medications(text)}
+
+    print("=" * 50)
+    print(f"{len(messages)} mesaj, {len(loader.medication_matcher)} ad (indeks {build_ms:.0f} ms)")
+    print(f"{'Yöntem':<16}{'mesaj/s':>12}{'Bulunan':>12}")
+    print("-" * 50)
+    for name, extract in [("eski (regex)", legacy), ("Aho–Corasick", automaton)]:
+        rate, recall = run(extract, messages)
+        print(f"{name:<16}{rate:>12.1f}{recall * 100:>11.0f}%")
+    print("=" * 50)
+
+
+if __name__ == "__main__":
+    main()
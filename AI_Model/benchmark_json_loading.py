@@ -0,0 +1,139 @@
+"""
+Büyük veri*.json kaynaklarını yükleme karşılaştırması: eski yöntem (json.load ile
+tüm belge, ardından indeks) ile kayıt kayıt akış (json_stream; ijson kuruluysa o da)
+ve JSON Lines. Her mod temiz bir alt process içinde DataLoader'ın birincil veri
+yükleyicisiyle ölçülür: süre ve tepe bellek (RSS).
+
+Dosya verilmezse veri7/veri8 biçiminde (drug_interactions iç içe JSON metni) sentetik
+bir dosya üretilir.
+
+Kullanım:
+  python benchmark_json_loading.py
+  python benchmark_json_loading.py --drugs 4000 --interactions 300
+  python benchmark_json_loading.py --file data/veri7.json
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.getcwd())
+
+MODES = ["json.load", "akış", "ijson", "jsonl"]
+
+
+def peak_rss_mb():
+    # Same as ocr_service.peak_rss_mb, without importing OpenCV into the measured process
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def write_sample(path, drugs, interactions, seed=7):
+    """veri7-style file written one entry at a time."""
+    rng = random.Random(seed)
+    names = [f"drug{i}" for i in range(drugs)]
+    effects = [f"The risk or severity of adverse effects can be increased when combined ({k})." for k in range(300)]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("[")
+        for i, name in enumerate(names):
+            partners = rng.sample(names, min(interactions, drugs))
+            entry = {
+                "product_name": name, "type": "branded", "salt_composition": name,
+                "medicine_desc": f"{name} açıklaması. " * 20, "side_effects": f"{name} yan etkileri. " * 10,
+                "drug_interactions": json.dumps({"drug": partners, "brand": [""] * len(partners),
+                                                 "effect": [rng.choice(effects) for _ in partners]}),
+            }
+            f.write(("," if i else "") + "\n" + json.dumps(entry, ensure_ascii=False, indent=2))
+        f.write("\n]")
+
+
+def child(mode, path):
+    """Runs inside a fresh interpreter; prints one JSON line."""
+    import json_stream
+    import data_loader
+    from data_loader import DataLoader
+
+    if mode == "json.load":
+        def load_whole(path, progress=False):
+            with open(path, "r", encoding="utf-8") as f:
+                return iter(json.load(f))
+        data_loader.iter_records = load_whole
+    elif mode == "akış":
+        json_stream.ijson = None
+
+    baseline = peak_rss_mb()
+    loader = DataLoader(os.path.dirname(path))
+    loader.files["primary"] = [os.path.basename(path)]
+    start = time.perf_counter()
+    loader._load_primary_data()
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"mode": mode, "seconds": elapsed, "baseline": baseline, "rss": peak_rss_mb(),
+                      "drugs": len(loader.drug_index)}))
+
+
+def measure(mode, path):
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", mode, path],
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def _fmt(value, unit, digits=1):
+    return f"{value:.{digits}f}{unit}" if value is not None else "-"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Büyük JSON kaynaklarını yükleme: süre ve tepe bellek")
+    parser.add_argument("--file", help="veri7/veri8 biçiminde JSON dosyası (verilmezse sentetik)")
+    parser.add_argument("--drugs", type=int, default=2000)
+    parser.add_argument("--interactions", type=int, default=150, help="İlaç başına etkileşim")
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(*args.child)
+        return
+
+    import json_stream
+
+    workdir = tempfile.mkdtemp(prefix="json_loading_")
+    try:
+        path = os.path.join(workdir, "veri7.json")
+        # DataLoader prefers veri7.jsonl next to veri7.json, so the JSON Lines copy gets its own folder
+        jsonl_path = os.path.join(workdir, "jsonl", "veri7.json")
+        os.makedirs(os.path.dirname(jsonl_path))
+        if args.file:
+            shutil.copy(args.file, path)
+        else:
+            print(f"Sentetik dosya üretiliyor ({args.drugs} ilaç x {args.interactions} etkileşim)...")
+            write_sample(path, args.drugs, args.interactions)
+        json_stream.to_jsonl(path, os.path.splitext(jsonl_path)[0] + ".jsonl", progress=False)
+
+        modes = [m for m in MODES if m != "ijson" or json_stream.ijson is not None]
+        print("=" * 64)
+        print(f"{os.path.basename(args.file or path)}: {os.path.getsize(path) / 1e6:.1f} MB")
+        print(f"{'Mod':<12}{'Süre':>10}{'Tepe RSS':>12}{'Yükleme farkı':>16}{'İlaç':>10}")
+        print("-" * 64)
+        for mode in modes:
+            r = measure(mode, jsonl_path if mode == "jsonl" else path)
+            growth = r["rss"] - r["baseline"] if r["rss"] is not None else None
+            print(f"{mode:<12}{_fmt(r['seconds'], 's', 2):>10}{_fmt(r['rss'], ' MB'):>12}"
+                  f"{_fmt(growth, ' MB'):>16}{r['drugs']:>10}")
+        print("=" * 64)
+        if json_stream.ijson is None:
+            print("ℹ️  ijson kurulu değil (pip install ijson): akış modu yerleşik ayrıştırıcıyı kullandı.")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
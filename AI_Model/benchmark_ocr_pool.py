@@ -0,0 +1,90 @@
+"""
+OCR verim ölçümü: tek model (istekler sırayla) ile OCRPool (çekirdek başına bir
+worker, bekleyen görseller toplu işlenir) karşılaştırması ve aşama süreleri
+(kuyruk, decode, ön işleme, tespit, tanıma).
+
+Kullanım:
+  python benchmark_ocr_pool.py
+  python benchmark_ocr_pool.py --images 64 --concurrency 16 --workers 4 --batch-size 8
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+sys.path.append(os.getcwd())
+
+from ocr_engine import OCREngine
+from ocr_service import STAGES, OCRPool
+
+WORDS = ["PAROL 500 MG", "ASPIRIN 100", "CORASPIN", "AUGMENTIN BID", "NUROFEN COLD"]
+
+
+def sample_images(n):
+    images = []
+    for i in range(n):
+        img = np.full((160, 640, 3), 255, dtype=np.uint8)
+        cv2.putText(img, WORDS[i % len(WORDS)], (10, 100), cv2.FONT_HERSHEY_SIMPLEX, 2, (0, 0, 0), 4)
+        images.append(cv2.imencode(".jpg", img)[1].tobytes())
+    return images
+
+
+def run(submit, images, concurrency):
+    """Sends every image from `concurrency` client threads; returns (seconds, timings list)."""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as clients:
+        results = list(clients.map(submit, images))
+    return time.perf_counter() - start, [timings for _, timings in results]
+
+
+def report(name, elapsed, timings, n):
+    stage_ms = {s: sum(t.get(s, 0.0) for t in timings) / n * 1000 for s in STAGES}
+    print(f"{name:<10} {n / elapsed:7.2f} görsel/s  " +
+          "  ".join(f"{s} {stage_ms[s]:.1f}" for s in STAGES) + "  (ms, ortalama)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OCR tek model / process havuzu verim karşılaştırması")
+    parser.add_argument("--images", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=8, help="Eşzamanlı istemci sayısı")
+    parser.add_argument("--workers", type=int, default=None, help="Varsayılan: çekirdek sayısı")
+    parser.add_argument("--batch-size", type=int, default=4)
+    args = parser.parse_args()
+
+    images = sample_images(args.images)
+
+    # Result cache off: the same few labels repeat, and this measures OCR itself
+    engine = OCREngine(cache_size=0)
+    lock = threading.Lock()  # As in OCRServer: one model, one request at a time
+
+    def single(image):
+        queued = time.perf_counter()
+        with lock:
+            started = time.perf_counter()
+            texts, timings = engine.extract_batch([image])[0]
+        timings["queue"] = started - queued
+        return texts, timings
+
+    print("=" * 100)
+    elapsed, timings = run(single, images, args.concurrency)
+    report("tek model", elapsed, timings, args.images)
+
+    pool = OCRPool(workers=args.workers, batch_size=args.batch_size, engine_options={"cache_size": 0})
+    try:
+        elapsed, timings = run(lambda image: pool.submit(image).result(), images, args.concurrency)
+        report("havuz", elapsed, timings, args.images)
+        stats = pool.stats()
+        print(f"havuz: {stats['workers']} worker, ortalama toplu iş boyutu {stats['mean_batch']}")
+    finally:
+        pool.close()
+    print("=" * 100)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+OCR ön işleme karşılaştırması: eski (sabit 2x büyütme, tam çözünürlük),
+uyarlanabilir ölçekleme ve uyarlanabilir ölçekleme + etiket bölgesi kırpma
+modlarında doğruluk ve gecikme.
+
+Görseller bir klasörden okunur. Beklenen metin labels.json'dan
+({"dosya.jpg": "Parol 500 mg"}) ya da dosya adından ("parol_500mg.jpg" -> "parol 500mg")
+alınır; OCR çıktısı beklenen tüm kelimeleri içeriyorsa görsel doğru sayılır.
+Klasör verilmezse sentetik 12 MP "telefon fotoğrafları" üretilir.
+
+Kullanım:
+  python benchmark_ocr_preprocess.py --images-dir data/box_photos
+  python benchmark_ocr_preprocess.py --synthetic 8
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+
+import cv2
+import numpy as np
+
+sys.path.append(os.getcwd())
+
+from ocr_engine import OCREngine
+
+MODES = {
+    "eski": {"adaptive": False},
+    "ölçekleme": {"adaptive": True, "crop_roi": False},
+    "ölçek+kırpma": {"adaptive": True, "crop_roi": True},
+}
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+SYNTHETIC_LABELS = [("PAROL", "500 mg tablet"), ("ASPIRIN", "100 mg"), ("CORASPIN", "300 mg"),
+                    ("AUGMENTIN", "1000 mg"), ("NUROFEN", "400 mg")]
+
+
+def normalize(text):
+    text = text.replace("İ", "i").replace("I", "ı").lower()
+    return re.sub(r"[^0-9a-zçğıöşü]+", " ", text).strip()
+
+
+def load_dataset(images_dir):
+    labels = {}
+    labels_file = os.path.join(images_dir, "labels.json")
+    if os.path.exists(labels_file):
+        with open(labels_file, "r", encoding="utf-8") as f:
+            labels = json.load(f)
+    dataset = []
+    for name in sorted(os.listdir(images_dir)):
+        if not name.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        expected = labels.get(name, os.path.splitext(name)[0].replace("_", " "))
+        with open(os.path.join(images_dir, name), "rb") as f:
+            dataset.append((name, f.read(), expected))
+    return dataset
+
+
+def synthetic_photo(seed, width=4032, height=3024):
+    """Textured background with a box label at a random position, as JPEG bytes."""
+    rng = np.random.default_rng(seed)
+    noise = (rng.random((height // 8, width // 8, 3)) * 120 + 40).astype(np.uint8)
+    img = cv2.resize(cv2.GaussianBlur(noise, (0, 0), 3), (width, height), interpolation=cv2.INTER_CUBIC)
+    x0, y0 = int(rng.integers(200, width - 1800)), int(rng.integers(200, height - 1200))
+    cv2.rectangle(img, (x0, y0), (x0 + 1500, y0 + 900), (235, 235, 230), -1)
+    brand, dose = SYNTHETIC_LABELS[seed % len(SYNTHETIC_LABELS)]
+    cv2.putText(img, brand, (x0 + 80, y0 + 300), cv2.FONT_HERSHEY_SIMPLEX, 4.2, (20, 20, 120), 8)
+    cv2.putText(img, dose, (x0 + 80, y0 + 560), cv2.FONT_HERSHEY_SIMPLEX, 3, (20, 20, 20), 5)
+    return f"sentetik_{seed}.jpg", cv2.imencode(".jpg", img)[1].tobytes(), f"{brand} {dose}"
+
+
+def is_correct(texts, expected):
+    found = normalize(" ".join(texts))
+    return all(word in found for word in normalize(expected).split() if len(word) >= 3)
+
+
+def evaluate(mode, options, dataset):
+    engine = OCREngine(cache_size=0, **options)
+    measure_accuracy = engine.engine_type != "none"
+    totals = {"preprocess": 0.0, "ocr": 0.0, "pixels": 0, "correct": 0}
+    for name, data, expected in dataset:
+        timings = {}
+        gray, _ = engine._prepare(data, timings)
+        totals["pixels"] += gray.size
+        if measure_accuracy:
+            texts, timings = engine.extract_batch([data])[0]
+            totals["ocr"] += timings.get("detect", 0.0) + timings.get("recognize", 0.0)
+            totals["correct"] += is_correct(texts, expected)
+        totals["preprocess"] += timings["preprocess"]
+    n = len(dataset)
+    accuracy = f"{totals['correct'] / n * 100:.0f}%" if measure_accuracy else "-"
+    ocr_ms = f"{totals['ocr'] / n * 1000:.0f}" if measure_accuracy else "-"
+    print(f"{mode:<14}{totals['pixels'] / n / 1e6:>10.2f}{totals['preprocess'] / n * 1000:>14.1f}"
+          f"{ocr_ms:>10}{accuracy:>10}")
+    return engine.engine_type
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OCR ön işleme doğruluk / gecikme karşılaştırması")
+    parser.add_argument("--images-dir", help="Kutu fotoğrafları klasörü (isteğe bağlı labels.json)")
+    parser.add_argument("--synthetic", type=int, default=5, help="Klasör yoksa üretilecek görsel sayısı")
+    args = parser.parse_args()
+
+    if args.images_dir:
+        dataset = load_dataset(args.images_dir)
+    else:
+        dataset = [synthetic_photo(i) for i in range(args.synthetic)]
+    if not dataset:
+        print("❌ Görsel bulunamadı.")
+        return
+
+    print("=" * 58)
+    print(f"{len(dataset)} görsel")
+    print(f"{'Mod':<14}{'MP (OCR)':>10}{'Ön işleme ms':>14}{'OCR ms':>10}{'Doğru':>10}")
+    print("-" * 58)
+    for mode, options in MODES.items():
+        engine_type = evaluate(mode, options, dataset)
+    print("=" * 58)
+    if engine_type == "none":
+        print("⚠️  OCR motoru yok: yalnızca ön işleme süresi ve OCR'a giden görüntü boyutu ölçüldü.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+OCR başlatma maliyeti ölçümü: API işleminin OCR olmadan, tembel (lazy), hemen
+yüklenen (eager) ve paylaşılan OCR servisine bağlanan (remote) modlarda açılış
+süresi, tepe bellek kullanımı (RSS) ve ilk görselin işlenme süresi.
+
+Her mod temiz bir alt process içinde ölçülür; remote modu için bu script
+ocr_service.py'yi kendisi başlatır.
+
+Kullanım:
+  python benchmark_ocr_startup.py
+  python benchmark_ocr_startup.py --modes lazy,remote --port 7012
+"""
+
+import argparse
+import json
+import os
+import secrets
+import subprocess
+import sys
+import time
+
+sys.path.append(os.getcwd())
+
+MODES = ["none", "lazy", "eager", "remote"]
+
+
+def _sample_image():
+    import cv2
+    import numpy as np
+    img = np.full((120, 480, 3), 255, dtype=np.uint8)
+    cv2.putText(img, "PAROL 500 MG", (10, 80), cv2.FONT_HERSHEY_SIMPLEX, 2, (0, 0, 0), 4)
+    return cv2.imencode(".png", img)[1].tobytes()
+
+
+def child(mode):
+    """Runs inside a fresh interpreter (imports included in startup); prints one JSON line."""
+    start = time.perf_counter()
+    from ocr_service import open_ocr, peak_rss_mb
+    ocr = None if mode == "none" else open_ocr(mode=mode)
+    startup = time.perf_counter() - start
+    startup_rss = peak_rss_mb()
+
+    first_image = None
+    if ocr is not None:
+        image = _sample_image()
+        start = time.perf_counter()
+        ocr.extract_text(image)
+        first_image = time.perf_counter() - start
+    print(json.dumps({"mode": mode, "startup": startup, "startup_rss": startup_rss,
+                      "first_image": first_image, "rss": peak_rss_mb(),
+                      "engine": getattr(ocr, "engine_type", "-")}))
+
+
+def measure(mode, env):
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", mode],
+                         env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def start_service(env, address):
+    """Starts ocr_service.py and waits until it answers."""
+    from ocr_service import RemoteOCREngine
+    host, port = address.rsplit(":", 1)
+    proc = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "ocr_service.py"),
+                             "--host", host, "--port", port], env=env, stdout=subprocess.DEVNULL)
+    client = RemoteOCREngine(address)
+    deadline = time.time() + 300  # First EasyOCR start may download models
+    while time.time() < deadline:
+        try:
+            return proc, client.info()
+        except OSError:
+            if proc.poll() is not None:
+                raise RuntimeError("OCR servisi başlatılamadı")
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError("OCR servisi zamanında hazır olmadı")
+
+
+def _fmt(value, unit, digits=2):
+    return f"{value:.{digits}f}{unit}" if value is not None else "-"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OCR açılış süresi / bellek karşılaştırması")
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--port", type=int, default=7011)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child)
+        return
+
+    address = f"127.0.0.1:{args.port}"
+    # One key for the service, the measured children and the client below
+    os.environ.setdefault("NUTRIMED_OCR_AUTHKEY", secrets.token_hex(32))
+    env = dict(os.environ, NUTRIMED_OCR_ADDRESS=address)
+    modes = [m for m in args.modes.split(",") if m]
+    service, service_info = None, None
+    if "remote" in modes:
+        service, service_info = start_service(env, address)
+
+    try:
+        results = [measure(mode, env) for mode in modes]
+        if service is not None:
+            from ocr_service import RemoteOCREngine
+            service_info = RemoteOCREngine(address).info()
+    finally:
+        if service is not None:
+            service.terminate()
+            service.wait()
+
+    print("=" * 72)
+    print(f"{'Mod':<8}{'Motor':<13}{'Açılış':>10}{'Açılış RSS':>13}{'İlk görsel':>12}{'Tepe RSS':>12}")
+    print("-" * 72)
+    for r in results:
+        print(f"{r['mode']:<8}{r['engine']:<13}{_fmt(r['startup'], 's'):>10}"
+              f"{_fmt(r['startup_rss'], ' MB', 0):>13}{_fmt(r['first_image'], 's'):>12}{_fmt(r['rss'], ' MB', 0):>12}")
+    if service_info:
+        print("-" * 72)
+        print(f"OCR servisi ({service_info['engine_type']}): model yükleme {service_info['load_seconds']:.2f}s, "
+              f"tepe RSS {_fmt(service_info['rss_mb'], ' MB', 0)} (tüm API işlemleri için tek kopya)")
+    print("=" * 72)
+
+
+if __name__ == "__main__":
+    main()
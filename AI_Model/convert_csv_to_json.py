@@ -1,133 +1,101 @@
-import pandas as pd
-import json
+"""
+Converts DrugBank style interaction CSVs into columnar knowledge-base snapshots
+(see kb_snapshot.py) that DataLoader loads instead of veri7.json / veri8.json.
+
+The CSV is read in chunks and each chunk is handled with column operations:
+per-drug attributes come from a groupby on 'Drug 1_normalized' (first row wins,
+as before), and interaction edges are written straight to an edge shard. Memory
+stays bounded by the chunk size plus the distinct drugs and strings, so
+multi-GB files convert without building the whole index in memory.
+
+Usage:
+  python convert_csv_to_json.py                       # the two default CSVs -> data/veri7.kb, data/veri8.kb
+  python convert_csv_to_json.py input.csv data/veri9.kb --chunk-size 100000
+"""
+
+import argparse
 import os
-import sys
+import time
+
+import pandas as pd
+
+from kb_snapshot import SnapshotWriter
+
+# Columns mapping based on previous analysis
+COL_DRUG1 = 'Drug 1_normalized'
+COL_DRUG2 = 'Drug 2_normalized'
+COL_INTERACTION = 'Interaction Description'
+ATTRIBUTE_COLUMNS = {
+    'description': 'medicine_desc',
+    'toxicity': 'side_effects',
+    'indication': 'indication',
+    'pharmacodynamics': 'pharmacodynamics',
+    'absorption': 'absorption',
+    'metabolism': 'metabolism',
+}
+COL_MOA = 'mechanism-of-action'
+
+DEFAULT_FILES = [('FINAL_CLEANED1.csv', 'data/veri7.kb'),
+                 ('FINAL_CLEANED1_final_corrected2.csv', 'data/veri8.kb')]
+
 
-def process_file(input_csv, output_json):
+def _drug_attributes(chunk):
+    """First row per drug in the chunk, mapped to snapshot attribute columns."""
+    firsts = chunk.groupby(COL_DRUG1, sort=False).first().apply(lambda col: col.str.strip())
+    attributes = {target: firsts[col].to_numpy() for col, target in ATTRIBUTE_COLUMNS.items() if col in firsts}
+    if COL_MOA in firsts:
+        # Mechanism of action is appended to the side effects, as in the JSON converter
+        toxicity = firsts['toxicity'] if 'toxicity' in firsts else pd.Series("", index=firsts.index)
+        moa = firsts[COL_MOA]
+        attributes['side_effects'] = toxicity.where(moa == "", toxicity + "\n\nMechanism of Action: " + moa).str.strip().to_numpy()
+    return firsts.index.to_numpy(), attributes
+
+
+def process_file(input_csv, output_path, chunk_size=50000):
     if not os.path.exists(input_csv):
         print(f"Error: {input_csv} not found.")
-        return
-
-    print(f"Processing {input_csv} -> {output_json}...")
-    
-    drug_index = {}
-    
-    # Columns mapping based on previous analysis
-    col_drug1 = 'Drug 1_normalized'
-    col_drug2 = 'Drug 2_normalized'
-    col_interaction = 'Interaction Description'
-    col_desc = 'description'
-    col_toxicity = 'toxicity'
-    col_moa = 'mechanism-of-action'
-    col_indication = 'indication'
-    col_pharm = 'pharmacodynamics'
-    col_absorp = 'absorption'
-    col_metab = 'metabolism'
-    
-    chunk_count = 0
-    chunk_size = 50000
-    
-    try:
-        # Read in chunks to handle large files
-        for chunk in pd.read_csv(input_csv, chunksize=chunk_size, dtype=str):
-            chunk_count += 1
-            print(f"Processing chunk {chunk_count}...", end='\r')
-            
-            # Fill NaNs
-            chunk.fillna("", inplace=True)
-            
-            # Iterate efficiently
-            
-            # Check if columns exist
-            missing_cols = [c for c in [col_drug1, col_drug2, col_interaction] if c not in chunk.columns]
-            if missing_cols:
-                print(f"\nMissing columns in {input_csv}: {missing_cols}")
-                return
-
-            drug1_vals = chunk[col_drug1].values
-            drug2_vals = chunk[col_drug2].values
-            interaction_vals = chunk[col_interaction].values
-            
-            # Optional columns
-            desc_vals = chunk[col_desc].values if col_desc in chunk.columns else [""] * len(chunk)
-            tox_vals = chunk[col_toxicity].values if col_toxicity in chunk.columns else [""] * len(chunk)
-            moa_vals = chunk[col_moa].values if col_moa in chunk.columns else [""] * len(chunk)
-            ind_vals = chunk[col_indication].values if col_indication in chunk.columns else [""] * len(chunk)
-            pharm_vals = chunk[col_pharm].values if col_pharm in chunk.columns else [""] * len(chunk)
-            abs_vals = chunk[col_absorp].values if col_absorp in chunk.columns else [""] * len(chunk)
-            metab_vals = chunk[col_metab].values if col_metab in chunk.columns else [""] * len(chunk)
-            
-            for i in range(len(chunk)):
-                d1 = drug1_vals[i].strip()
-                if not d1: continue
-                
-                if d1 not in drug_index:
-                    # Initialize entry
-                    side_effects = tox_vals[i].strip()
-                    moa = moa_vals[i].strip()
-                    if moa:
-                        side_effects += f"\n\nMechanism of Action: {moa}"
-                        
-                    drug_index[d1] = {
-                        "product_name": d1,
-                        "type": "branded",
-                        "salt_composition": d1,
-                        "medicine_desc": desc_vals[i].strip(),
-                        "side_effects": side_effects.strip(),
-                        "indication": ind_vals[i].strip(),
-                        "pharmacodynamics": pharm_vals[i].strip(),
-                        "absorption": abs_vals[i].strip(),
-                        "metabolism": metab_vals[i].strip(),
-                        "interactions_list": [] 
-                    }
-                
-                # Add interaction
-                d2 = drug2_vals[i].strip()
-                effect = interaction_vals[i].strip()
-                
-                if d2:
-                    drug_index[d1]["interactions_list"].append({
-                        "drug": d2,
-                        "effect": effect
-                    })
-
-    except Exception as e:
-        print(f"\nError processing {input_csv}: {e}")
-        import traceback
-        traceback.print_exc()
-        return
-
-    print(f"\nFinished reading CSV. Converting interactions for {len(drug_index)} drugs...")
-    
-    # Convert dict to list format expected by JSON
-    final_data = []
-    
-    for drug, data in drug_index.items():
-        # Format interactions as the special JSON string explicitly required by data_loader
-        # Structure: {"drug": [], "brand": [], "effect": []}
-        interactions_struct = {
-            "drug": [],
-            "brand": [],
-            "effect": []
-        }
-        
-        for interaction in data["interactions_list"]:
-            interactions_struct["drug"].append(interaction["drug"])
-            interactions_struct["brand"].append("") # No brand info for interacting drug
-            interactions_struct["effect"].append(interaction["effect"])
-            
-        # Serialize interactions to string
-        data["drug_interactions"] = json.dumps(interactions_struct)
-        del data["interactions_list"] # Remove temp list
-        
-        final_data.append(data)
-        
-    print(f"Writing to {output_json}...")
-    with open(output_json, 'w', encoding='utf-8') as f:
-        json.dump(final_data, f, indent=2, ensure_ascii=False)
-        
-    print(f"Done. Saved {len(final_data)} entries to {output_json}.")
+        return None
+
+    print(f"Processing {input_csv} -> {output_path}...")
+    start = time.perf_counter()
+    header = pd.read_csv(input_csv, nrows=0).columns
+    missing_cols = [c for c in [COL_DRUG1, COL_DRUG2, COL_INTERACTION] if c not in header]
+    if missing_cols:
+        print(f"Missing columns in {input_csv}: {missing_cols}")
+        return None
+    wanted = [COL_DRUG1, COL_DRUG2, COL_INTERACTION, COL_MOA, *ATTRIBUTE_COLUMNS]
+    usecols = [c for c in wanted if c in header]
+
+    writer = SnapshotWriter(output_path, source=os.path.basename(input_csv))
+    rows = 0
+    for chunk_count, chunk in enumerate(pd.read_csv(input_csv, chunksize=chunk_size, dtype=str,
+                                                    usecols=usecols), 1):
+        rows += len(chunk)
+        print(f"Processing chunk {chunk_count}...", end='\r')
+        chunk = chunk.fillna("")
+        for col in (COL_DRUG1, COL_DRUG2, COL_INTERACTION):  # Attributes are stripped per drug, after the groupby
+            chunk[col] = chunk[col].str.strip()
+        chunk = chunk[chunk[COL_DRUG1] != ""]
+
+        names, attributes = _drug_attributes(chunk)
+        writer.add_drugs(names, attributes)
+
+        edges = chunk[chunk[COL_DRUG2] != ""]
+        writer.add_edges(edges[COL_DRUG1].to_numpy(), edges[COL_DRUG2].to_numpy(), edges[COL_INTERACTION].to_numpy())
+
+    meta = writer.close()
+    print(f"\nDone. {rows} rows -> {meta['drugs']} drugs, {meta['edges']} interactions, "
+          f"{len(writer.effects)} distinct effects in {output_path} ({time.perf_counter() - start:.1f}s).")
+    return meta
+
 
 if __name__ == "__main__":
-    process_file('FINAL_CLEANED1.csv', 'veri7.json')
-    process_file('FINAL_CLEANED1_final_corrected2.csv', 'veri8.json')
+    parser = argparse.ArgumentParser(description="Etkileşim CSV'lerini sütunlu bilgi tabanı snapshot'ına dönüştürür")
+    parser.add_argument("input", nargs="?", help="CSV dosyası (verilmezse varsayılan iki dosya)")
+    parser.add_argument("output", nargs="?", help="Snapshot klasörü (ör. data/veri7.kb)")
+    parser.add_argument("--chunk-size", type=int, default=50000)
+    args = parser.parse_args()
+
+    files = [(args.input, args.output or os.path.splitext(args.input)[0] + ".kb")] if args.input else DEFAULT_FILES
+    for input_csv, output_path in files:
+        process_file(input_csv, output_path, args.chunk_size)
@@ -1,12 +1,36 @@
+import copy
 import json
+import multiprocessing
 import os
 import re
+import time
+from concurrent.futures import ProcessPoolExecutor
 
 import difflib
 
+from json_stream import iter_items, iter_records
+from kb_snapshot import read_snapshot
+from severity import classify
+from text_matcher import TURKISH_SUFFIXES, PhraseMatcher
+
+GENERAL_QA_FILE = "data/training_data_merged.json"
+PARALLEL_MIN_BYTES = 1 << 20 # Smaller files load in the parent; pickling their result would cost more than it saves
+
+# Attributes each loader fills; a worker sends back only these
+LOADED_ATTRIBUTES = {
+    "_load_priority_list": ["priority_drugs"],
+    "_load_enriched_cache": ["enriched_map"],
+    "_load_food_interactions": ["food_interactions"],
+    "_load_generic_db": ["generic_data"],
+    "_load_primary_data": ["drug_index"],
+    "_load_synthetic_data": ["drug_index"],
+    "_load_food_food_interactions": ["food_index", "food_food_interactions"],
+}
+
 class DataLoader:
-    def __init__(self, data_dir):
+    def __init__(self, data_dir, progress=False):
         self.data_dir = data_dir
+        self.progress = progress # Print per-file read progress while loading
         self.drug_index = {}  # Normalized Name -> Drug Data
         self.food_interactions = {} # Generic/Drug Name -> Food Interaction Text
         self.generic_data = {} # Generic Name -> Warnings/Contraindications
@@ -15,6 +39,8 @@ class DataLoader:
         
         self.food_food_interactions = [] # List of {food1, food2, level, effect}
         self.food_index = [] # List of known food names
+        self.entity_matcher = None # OCR-tolerant Aho–Corasick matcher over drug and food names
+        self.medication_matcher = None # Aho–Corasick matcher over drug names for chat messages
         
         # Files to load (all in data/ subfolder)
         self.files = {
@@ -28,17 +54,139 @@ class DataLoader:
             "food_food": "data/all_foods_match_status.json"
         }
 
-    def load_all_data(self):
-        """Loads and indexes all data."""
-        print("Veriler Yükleniyor...")
-        self._load_priority_list()
-        self._load_enriched_cache()
-        self._load_food_interactions()
-        self._load_generic_db()
-        self._load_primary_data()
-        self._load_synthetic_data()
-        self._load_food_food_interactions()
+    def load_all_data(self, workers=None):
+        """Loads and indexes all data.
+
+        workers > 1 (or NUTRIMED_LOAD_WORKERS) parses files of at least PARALLEL_MIN_BYTES
+        in a process pool; results are merged in the sequential order, so the index is the same.
+        """
+        workers = int(workers or os.environ.get("NUTRIMED_LOAD_WORKERS", 1))
+        if workers > 1 and "fork" not in multiprocessing.get_all_start_methods():
+            # Spawned workers would re-import api_server.py, which loads data at import time
+            print("ℹ️  Paralel yükleme bu platformda desteklenmiyor, sırayla yükleniyor.")
+            workers = 1
+        print("Veriler Yükleniyor..." if workers == 1 else f"Veriler Yükleniyor ({workers} işçi)...")
+        start = time.perf_counter()
+        self.load_timings = {}
+        jobs = self._load_jobs()
+        if workers > 1:
+            self._load_parallel(jobs, workers)
+        else:
+            for label, _, method, args in jobs:
+                job_start = time.perf_counter()
+                getattr(self, method)(*args)
+                self.load_timings[label] = time.perf_counter() - job_start
+        index_start = time.perf_counter()
+        self.build_entity_index()
+        self.load_timings["entity_index"] = time.perf_counter() - index_start
+        self.load_timings["total"] = time.perf_counter() - start
         print(f"Veri yükleme tamamlandı. {len(self.drug_index)} ilaç, {len(self.food_index)} besin indekslendi.")
+        self._print_timings()
+
+    def _load_jobs(self):
+        """(label, file, loader method, arguments) in load order; every primary file is its own job."""
+        files = self.files
+        return ([("priority", files["priority"], "_load_priority_list", ()),
+                 ("enriched", files["enriched"], "_load_enriched_cache", ()),
+                 ("food", files["food"], "_load_food_interactions", ()),
+                 ("generic", files["generic"], "_load_generic_db", ())]
+                + [(filename, filename, "_load_primary_data", ([filename],)) for filename in files["primary"]]
+                + [("synthetic", files["synthetic"], "_load_synthetic_data", ()),
+                   ("food_food", files["food_food"], "_load_food_food_interactions", ())])
+
+    def _file_size(self, filename):
+        """Bytes on disk behind a data file (a .kb snapshot counts its whole folder)."""
+        path = self._source_path(filename)
+        snapshot = os.path.splitext(path)[0] + ".kb"
+        if os.path.isdir(snapshot):
+            return sum(entry.stat().st_size for entry in os.scandir(snapshot) if entry.is_file())
+        return os.path.getsize(path) if os.path.exists(path) else 0
+
+    def _load_parallel(self, jobs, workers):
+        """Parses large files in worker processes and small ones here, then merges in job order."""
+        parts = {}
+        heavy = [i for i, job in enumerate(jobs) if self._file_size(job[1]) >= PARALLEL_MIN_BYTES]
+        pool = None
+        if heavy:
+            pool = ProcessPoolExecutor(max_workers=min(workers, len(heavy)), mp_context=multiprocessing.get_context("fork"))
+        try:
+            for i in heavy:
+                parts[i] = pool.submit(_load_source, self.data_dir, self.files, *jobs[i][2:])
+            for i, (_, _, method, args) in enumerate(jobs):
+                if i not in parts:  # Small files load here while the pool parses
+                    parts[i] = _load_source(self.data_dir, self.files, method, args, self.progress)
+            for i, (label, _, method, _) in enumerate(jobs):
+                loaded, seconds = parts[i].result() if i in heavy else parts[i]
+                self._merge_loaded(method, loaded)
+                self.load_timings[label] = seconds
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+    def _merge_loaded(self, method, loaded):
+        """Applies one job's result with the precedence of sequential loading."""
+        if method == "_load_primary_data":
+            self.drug_index.update(loaded["drug_index"])  # Later primary files override earlier ones
+        elif method == "_load_synthetic_data":
+            for name, entry in loaded["drug_index"].items():  # Synthetic entries only fill missing names
+                self.drug_index.setdefault(name, entry)
+        else:
+            for attribute, value in loaded.items():
+                setattr(self, attribute, value)
+
+    def _print_timings(self):
+        print("⏱️  Yükleme süreleri:")
+        for label, seconds in self.load_timings.items():
+            print(f"   {label:<28}{seconds:>7.2f}s")
+
+    def source_signature(self):
+        """(mtime, size) per load job label and "general_qa"; None for missing files."""
+        signature = {}
+        for label, filename, _, _ in self._load_jobs() + [("general_qa", GENERAL_QA_FILE, None, None)]:
+            path = self._source_path(filename)
+            meta = os.path.join(os.path.splitext(path)[0] + ".kb", "meta.json")  # Written last, replaced with the snapshot
+            path = meta if os.path.exists(meta) else path
+            try:
+                stat = os.stat(path)
+                signature[label] = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                signature[label] = None
+        return signature
+
+    def reloaded(self, changed=None, workers=None):
+        """
+        A new loader generation with the changed sources (labels of source_signature) reloaded;
+        this loader is never modified, so requests still holding it keep a consistent view.
+        Unchanged indexes and their entries are shared between the generations; search_drug
+        enriches a copy of an entry, so neither generation writes into them.
+        Changes to primary or synthetic files (or changed=None) rebuild everything, since
+        drug_index depends on their merge order. Other sources are reloaded on their own and
+        the rest of the index is shared with this generation.
+        """
+        drug_jobs = {label for label, _, method, _ in self._load_jobs()
+                     if method in ("_load_primary_data", "_load_synthetic_data")}
+        if changed is None or drug_jobs & set(changed):
+            loader = DataLoader(self.data_dir, self.progress)
+            loader.files = dict(self.files)
+            loader.load_all_data(workers)
+            if hasattr(self, "general_qa"):
+                loader.load_general_qa()
+            return loader
+
+        loader = copy.copy(self)
+        loader.load_timings = {}
+        for label, _, method, args in self._load_jobs():
+            if label in changed:
+                loaded, seconds = _load_source(self.data_dir, self.files, method, args, self.progress)
+                loader._merge_loaded(method, loaded)  # Assigns new objects, never updates shared ones
+                loader.load_timings[label] = seconds
+        if "general_qa" in changed:
+            loader.load_general_qa()
+        if {"priority", "enriched", "food_food"} & set(changed):
+            start = time.perf_counter()
+            loader.build_entity_index()  # Aliases and food names feed the matchers
+            loader.load_timings["entity_index"] = time.perf_counter() - start
+        return loader
 
     def _load_food_food_interactions(self):
         """Loads all_foods_match_status.json"""
@@ -47,10 +195,11 @@ class DataLoader:
             print(f"Uyarı: {path} bulunamadı.")
             return
 
-        with open(path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            self.food_index = [self._normalize_name(f) for f in data.get("matched_foods", [])]
-            self.food_food_interactions = data.get("interactions", [])
+        for key, value in iter_items(path, self.progress):
+            if key == "matched_foods":
+                self.food_index = [self._normalize_name(f) for f in value]
+            elif key == "interactions":
+                self.food_food_interactions = value
 
     def search_food(self, query):
         """Checks if a query is a known food."""
@@ -88,14 +237,19 @@ class DataLoader:
             return ""
         return name.lower().strip()
 
+    def _source_path(self, filename):
+        """Path of a data file; a JSON Lines copy (data/x.jsonl next to data/x.json) is preferred."""
+        path = os.path.join(self.data_dir, filename)
+        jsonl = os.path.splitext(path)[0] + ".jsonl"
+        return jsonl if os.path.exists(jsonl) else path
+
     def _load_priority_list(self):
         """Loads top_500_drugs.json"""
-        path = os.path.join(self.data_dir, self.files["priority"])
+        path = self._source_path(self.files["priority"])
         if not os.path.exists(path):
             return
         
-        with open(path, 'r', encoding='utf-8') as f:
-            self.priority_drugs = json.load(f)
+        self.priority_drugs = list(iter_records(path, self.progress))
 
     def _load_enriched_cache(self):
         """Loads enriched_drugs.json"""
@@ -103,94 +257,105 @@ class DataLoader:
         if not os.path.exists(path):
             return
             
-        with open(path, 'r', encoding='utf-8') as f:
-            raw_map = json.load(f)
-            # Normalize keys
-            for k, v in raw_map.items():
-                if v:
-                    self.enriched_map[self._normalize_name(k)] = v
+        # Normalize keys
+        for k, v in iter_items(path, self.progress):
+            if v:
+                self.enriched_map[self._normalize_name(k)] = v
 
     def _load_food_interactions(self):
         """Loads drug-food.json"""
-        path = os.path.join(self.data_dir, self.files["food"])
+        path = self._source_path(self.files["food"])
         if not os.path.exists(path):
             print(f"Uyarı: {path} bulunamadı.")
             return
 
-        with open(path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            for entry in data:
-                name = self._normalize_name(entry.get("name"))
-                interactions = entry.get("food_interactions", [])
-                if name:
-                    self.food_interactions[name] = interactions
+        for entry in iter_records(path, self.progress):
+            name = self._normalize_name(entry.get("name"))
+            interactions = entry.get("food_interactions", [])
+            if name:
+                self.food_interactions[name] = interactions
 
     def _load_generic_db(self):
         """Loads db_drug_interactions.json"""
-        path = os.path.join(self.data_dir, self.files["generic"])
+        path = self._source_path(self.files["generic"])
         if not os.path.exists(path):
             print(f"Warning: {path} not found.")
             return
 
-        with open(path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            for entry in data:
-                generic_name = self._normalize_name(entry.get("Generic Name"))
-                if generic_name:
-                    self.generic_data[generic_name] = {
-                        "contraindications": entry.get("Contraindications"),
-                        "warnings": entry.get("Interaction warnings & Precautions"),
-                        "side_effects": entry.get("Side Effects")
-                    }
+        for entry in iter_records(path, self.progress):
+            generic_name = self._normalize_name(entry.get("Generic Name"))
+            if generic_name:
+                self.generic_data[generic_name] = {
+                    "contraindications": entry.get("Contraindications"),
+                    "warnings": entry.get("Interaction warnings & Precautions"),
+                    "side_effects": entry.get("Side Effects")
+                }
 
-    def _load_primary_data(self):
-        """Loads veri3.json and veri4.json"""
-        for filename in self.files["primary"]:
-            path = os.path.join(self.data_dir, filename)
+    def _load_primary_data(self, filenames=None):
+        """Loads veri3.json and veri4.json (veri7/veri8 from their .kb snapshots when converted)"""
+        for filename in filenames or self.files["primary"]:
+            path = self._source_path(filename)
+            snapshot = os.path.splitext(path)[0] + ".kb"
+            if os.path.isdir(snapshot):
+                self._load_snapshot(snapshot, filename)
+                continue
             if not os.path.exists(path):
                 print(f"Warning: {path} not found.")
                 continue
 
-            with open(path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                for entry in data:
-                    product_name = self._normalize_name(entry.get("product_name"))
-                    salt_composition = self._normalize_name(entry.get("salt_composition", ""))
-                    
-                    # Store main entry
-                    if product_name:
-                        self.drug_index[product_name] = {
-                            "product_name": product_name,
-                            "type": "branded",
-                            "source": filename,
-                            "salt_composition": salt_composition,
-                            "medicine_desc": entry.get("medicine_desc"),
-                            "side_effects": entry.get("side_effects"),
-                            "drug_interactions": self._parse_interactions(entry.get("drug_interactions"))
-                        }
+            # Record by record: the parsed file is never held in memory next to the index
+            for entry in iter_records(path, self.progress):
+                product_name = self._normalize_name(entry.get("product_name"))
+                salt_composition = self._normalize_name(entry.get("salt_composition", ""))
+                
+                # Store main entry
+                if product_name:
+                    self.drug_index[product_name] = {
+                        "product_name": product_name,
+                        "type": "branded",
+                        "source": filename,
+                        "salt_composition": salt_composition,
+                        "medicine_desc": entry.get("medicine_desc"),
+                        "side_effects": entry.get("side_effects"),
+                        "drug_interactions": self._parse_interactions(entry.get("drug_interactions"))
+                    }
+
+    def _load_snapshot(self, path, filename):
+        """Loads a columnar snapshot written by convert_csv_to_json.py (severity is already stored)."""
+        for name, attributes, interactions in read_snapshot(path):
+            product_name = self._normalize_name(name)
+            if product_name:
+                self.drug_index[product_name] = {
+                    "product_name": product_name,
+                    "type": "branded",
+                    "source": filename,
+                    "salt_composition": product_name,
+                    "medicine_desc": attributes["medicine_desc"],
+                    "side_effects": attributes["side_effects"],
+                    "drug_interactions": interactions
+                }
 
     def _load_synthetic_data(self):
         """Loads veri6.json"""
-        path = os.path.join(self.data_dir, self.files["synthetic"])
+        path = self._source_path(self.files["synthetic"])
         if not os.path.exists(path):
             print(f"Warning: {path} not found.")
             return
 
-        with open(path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            for entry in data:
-                drug_name = self._normalize_name(entry.get("drug_name"))
-                if drug_name:
-                    # Provide fallback or merge if exists
-                    if drug_name not in self.drug_index:
-                        self.drug_index[drug_name] = {
-                            "type": "synthetic",
-                            "source": "veri6.json",
-                            "side_effects": entry.get("side_effects"),
-                            "contraindications": entry.get("contraindications"),
-                            "warnings": entry.get("warnings"),
-                            "indications": entry.get("indications")
-                        }
+        for entry in iter_records(path, self.progress):
+            drug_name = self._normalize_name(entry.get("drug_name"))
+            if drug_name:
+                # Provide fallback or merge if exists
+                if drug_name not in self.drug_index:
+                    self.drug_index[drug_name] = {
+                        "product_name": drug_name,
+                        "type": "synthetic",
+                        "source": "veri6.json",
+                        "side_effects": entry.get("side_effects"),
+                        "contraindications": entry.get("contraindications"),
+                        "warnings": entry.get("warnings"),
+                        "indications": entry.get("indications")
+                    }
 
     def _parse_interactions(self, interaction_str):
         """Parses the nested JSON string in drug_interactions field."""
@@ -203,9 +368,11 @@ class DataLoader:
             interactions = []
             if "drug" in parsed and "effect" in parsed:
                 for i in range(len(parsed["drug"])):
+                    effect = parsed["effect"][i] if i < len(parsed["effect"]) else "Unknown"
                     interactions.append({
                         "drug": parsed["drug"][i],
-                        "effect": parsed["effect"][i] if i < len(parsed["effect"]) else "Unknown"
+                        "effect": effect,
+                        "severity": int(classify(effect))  # severity.Severity, classified once here
                     })
             return interactions
         except json.JSONDecodeError:
@@ -268,28 +435,180 @@ class DataLoader:
 
         # 6. If found, enrich with Food and Generic info
         if result:
-            salt = result.get("salt_composition", "")
-            
-            # Extract basic generic name from salt (e.g., "Hydroxyzine (10mg)" -> "hydroxyzine")
-            # Simple regex to take first word or before space/parenthesis
-            generic_key = salt.split('(')[0].strip().lower() if salt else ""
+            return self._with_details(result, query_norm)
             
-            # Enrich with Food Interactions
-            food_info = self.food_interactions.get(generic_key, [])
-            # Also try matching exact drug name in food db
-            if not food_info:
-                 food_info = self.food_interactions.get(query_norm, [])
-            
-            result["food_interactions"] = food_info
+        return None
 
-            # Enrich with Generic DB info (Contraindications)
-            if generic_key in self.generic_data:
-                gen_info = self.generic_data[generic_key]
-                result["generic_warnings"] = gen_info
+    def _with_details(self, entry, query_norm):
+        """Copy of a drug_index entry enriched with its food interactions and generic warnings."""
+        # A copy: index entries are shared with older loader generations (see reloaded)
+        result = dict(entry)
+        salt = result.get("salt_composition", "")
 
-            return result
-            
-        return None
+        # Extract basic generic name from salt (e.g., "Hydroxyzine (10mg)" -> "hydroxyzine")
+        # Simple regex to take first word or before space/parenthesis
+        generic_key = salt.split('(')[0].strip().lower() if salt else ""
+
+        # Enrich with Food Interactions
+        food_info = self.food_interactions.get(generic_key, [])
+        # Also try matching exact drug name in food db
+        if not food_info:
+             food_info = self.food_interactions.get(query_norm, [])
+
+        result["food_interactions"] = food_info
+
+        # Enrich with Generic DB info (Contraindications)
+        if generic_key in self.generic_data:
+            gen_info = self.generic_data[generic_key]
+            result["generic_warnings"] = gen_info
+
+        return result
+
+    def _index_key(self, name):
+        """
+        drug_index key a name resolves to exactly, following enriched aliases first as
+        search_drug does; None if it does not resolve without fuzzy matching.
+        """
+        key = self._normalize_name(name)
+        seen = set()
+        while key in self.enriched_map and key not in seen:
+            seen.add(key)
+            generic_name = self.enriched_map[key]
+            if not generic_name or generic_name.lower() == key:
+                break
+            key = self._normalize_name(generic_name)
+        return key if key in self.drug_index else None
+
+    # =====================================================
+    # ENTITY LINKING (OCR lines -> known drugs / foods)
+    # =====================================================
+
+    def _drug_name_variants(self, name):
+        """Product name, its spaced-out dose form and the bare brand ("atarax 10mg tablet" -> "atarax")."""
+        spaced = re.sub(r"([^\W\d])(\d)", r"\1 \2", name)
+        brand = []
+        for token in spaced.split():
+            if any(ch.isdigit() for ch in token):
+                break
+            brand.append(token)
+        return [name, spaced, " ".join(brand)]
+
+    def build_entity_index(self):
+        """
+        Builds the OCR-tolerant matcher over every drug name, brand alias and food, and the
+        chat matcher over drug names with Turkish suffixes ("Parol'ü", "aspirini").
+        Exact product names are registered first, so they win over shared brand aliases.
+        Enriched and priority names are resolved to their drug_index key here and skipped
+        if they do not resolve, so a match is always a direct index lookup.
+        """
+        matcher = PhraseMatcher(ocr=True)
+        medications = PhraseMatcher(min_length=4, suffixes=TURKISH_SUFFIXES)
+        variants = [self._drug_name_variants(name) for name in self.drug_index]
+        keys = [self._index_key(name) or name for name in self.drug_index]  # An enriched alias wins, as in search_drug
+        for rank in range(3):
+            for key, names in zip(keys, variants):
+                matcher.add(names[rank], ("drug", key), min_length=4)
+                medications.add(names[rank], (key, names[rank]))
+        for name in list(self.enriched_map) + list(self.priority_drugs):
+            key = self._index_key(name)
+            if key is None:
+                continue
+            matcher.add(name, ("drug", key), min_length=4)
+            medications.add(name, (key, name))
+        for food in self.food_index:
+            matcher.add(food, ("food", food))
+        matcher.build()
+        medications.build()
+        self.entity_matcher = matcher
+        self.medication_matcher = medications
+
+    def link_entities(self, lines):
+        """
+        Finds known drugs and foods in OCR lines, one automaton pass per line.
+        Returns {"drugs": [{"name", "matched", "data"}], "foods": [name, ...]}, without duplicates.
+        """
+        if self.entity_matcher is None:
+            self.build_entity_index()
+        drugs, foods, seen = [], [], set()
+        for line in lines:
+            for start, end, (kind, name) in self.entity_matcher.find(line):
+                if kind == "food":
+                    if name not in foods:
+                        foods.append(name)
+                    continue
+                if name in seen:
+                    continue
+                seen.add(name)
+                data = self._with_details(self.drug_index[name], name)
+                drugs.append({"name": data.get("product_name", name), "matched": line[start:end], "data": data})
+        return {"drugs": drugs, "foods": foods}
+
+    def extract_medications(self, message):
+        """
+        Medication mentions in a chat message, found in one automaton pass over the message.
+        Returns [{"name", "matched", "data"}] without duplicates; name is the mentioned
+        drug or brand name, matched the text as written (without the suffix).
+        """
+        if self.medication_matcher is None:
+            self.build_entity_index()
+        medications, seen = [], set()
+        for start, end, (key, mentioned) in self.medication_matcher.find(message):
+            if key in seen:
+                continue
+            seen.add(key)
+            data = self._with_details(self.drug_index[key], key)
+            medications.append({"name": mentioned, "matched": message[start:end], "data": data})
+        return medications
+
+    def find_interactions(self, detected_drugs, detected_foods):
+        """Drug-drug, drug-food and food-food interactions between detected items, as report lines."""
+        all_interactions = []
+
+        # 1. Drug-Drug Interactions
+        if len(detected_drugs) > 1:
+            for i in range(len(detected_drugs)):
+                for j in range(i + 1, len(detected_drugs)):
+                    d1 = detected_drugs[i]
+                    d2 = detected_drugs[j]
+
+                    d2_name = d2['product_name'].lower()
+                    d2_salt = d2.get('salt_composition', '').lower()
+
+                    for inter in d1.get('drug_interactions', []):
+                        inter_drug = inter['drug'].lower()
+                        if inter_drug in d2_name or (d2_salt and inter_drug in d2_salt):
+                            all_interactions.append(f"⚠️  İLAÇ-İLAÇ ETKİLEŞİMİ: {d1['product_name']} + {d2['product_name']} -> {inter['effect']}")
+                            break
+
+        # 2. Drug-Food Interactions
+        for drug in detected_drugs:
+            d_name = drug['product_name']
+            d_food_inters = drug.get('food_interactions', [])
+
+            # Check against detected foods
+            for food in detected_foods:
+                # Simple keyword match in warnings
+                for text in d_food_inters:
+                    if food.lower() in text.lower():
+                        all_interactions.append(f"⚠️  İLAÇ-BESİN ETKİLEŞİMİ: {d_name} + {food} -> {text}")
+
+            # Also always show general food warnings for the drug
+            if d_food_inters:
+                all_interactions.append(f"ℹ️  {d_name} için genel besin uyarıları: {'; '.join(d_food_inters)}")
+
+        # 3. Food-Food Interactions
+        if len(detected_foods) > 1:
+            for i in range(len(detected_foods)):
+                for j in range(i + 1, len(detected_foods)):
+                    f1 = detected_foods[i]
+                    f2 = detected_foods[j]
+                    inters = self.check_food_food_interaction(f1, f2)
+                    for inter in inters:
+                        level = inter.get('interaction_level', 'Bilinmiyor')
+                        nutrient = inter.get('nutrient_name', 'Bilinmiyor')
+                        all_interactions.append(f"🍎 BESİN-BESİN ETKİLEŞİMİ ({level}): {f1} + {f2} -> {nutrient} değerlerinde farklılık/etkileşim.")
+
+        return all_interactions
 
     def get_suggestions(self, query, limit=5):
         """Returns a list of close matches for the query."""
@@ -311,16 +630,15 @@ class DataLoader:
     
     def load_general_qa(self):
         """Loads training_data_merged.json as a general Q&A knowledge base."""
-        path = os.path.join(self.data_dir, "data/training_data_merged.json")
+        path = os.path.join(self.data_dir, GENERAL_QA_FILE)
         if not os.path.exists(path):
             print(f"Uyarı: {path} bulunamadı. Q&A bilgi tabanı yüklenmedi.")
             self.general_qa = []
             return
         
         try:
-            with open(path, 'r', encoding='utf-8') as f:
-                self.general_qa = json.load(f)
-                print(f"✅ Q&A Bilgi Tabanı yüklendi: {len(self.general_qa)} kayıt")
+            self.general_qa = list(iter_records(path, self.progress))
+            print(f"✅ Q&A Bilgi Tabanı yüklendi: {len(self.general_qa)} kayıt")
         except Exception as e:
             print(f"Hata: Q&A yüklenemedi: {e}")
             self.general_qa = []
@@ -367,6 +685,15 @@ class DataLoader:
         results.sort(key=lambda x: x["score"], reverse=True)
         return results[:top_k]
 
+def _load_source(data_dir, files, method, args, progress=False):
+    """Load job (also run in pool workers): one loader on a fresh DataLoader -> (its attributes, seconds)."""
+    loader = DataLoader(data_dir, progress)
+    loader.files = files
+    start = time.perf_counter()
+    getattr(loader, method)(*args)
+    return {name: getattr(loader, name) for name in LOADED_ATTRIBUTES[method]}, time.perf_counter() - start
+
+
 if __name__ == "__main__":
     # Test the loader
     loader = DataLoader(".")
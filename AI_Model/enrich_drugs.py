@@ -1,100 +1,232 @@
+"""
+Eksik ilaçlar (missing_drugs.json) için etken madde (jenerik isim) eşlemesi üretir.
 
+İki aşamalı, eşzamanlı bir boru hattı:
+  1. Web aşaması: web araması + her aday için DataLoader.search_drug doğrulaması
+  2. LLM aşaması: web'de bulunamayanlar için LLMInterface.get_generic_names
+     (tek çağrıda birden fazla ilaç, JSON çıktı)
+
+Her sonuç anında 'enriched_drugs.journal.jsonl' dosyasına eklenir (append-only),
+böylece kesilen bir çalışma kaldığı yerden devam eder. İş bitince günlük
+'enriched_drugs.json' içine sıkıştırılır ve silinir.
+
+Kullanım: python enrich_drugs.py --web-workers 8 --llm-workers 2
+"""
+
+import argparse
 import json
 import os
 import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from llm_interface import LLMInterface
 from web_search import WebSearcher
 from data_loader import DataLoader
 
+OUTPUT_FILE = "enriched_drugs.json"
+JOURNAL_FILE = "enriched_drugs.journal.jsonl"
+
+
+def load_progress(output_file, journal_file):
+    """Loads the compacted output and replays the journal on top of it (resume)."""
+    enriched_data = {}
+    if os.path.exists(output_file):
+        with open(output_file, "r", encoding="utf-8") as f:
+            enriched_data = json.load(f)
+        print(f"Mevcut önbellekten {len(enriched_data)} kayıt yüklendi.")
+
+    replayed = 0
+    if os.path.exists(journal_file):
+        with open(journal_file, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Torn last line after a crash
+                enriched_data[record["drug"]] = record.get("generic")
+                replayed += 1
+        print(f"Günlükten {replayed} kayıt geri yüklendi (devam ediliyor).")
+    return enriched_data
+
+
+def compact(enriched_data, output_file, journal_file):
+    """Writes the full mapping atomically and drops the journal."""
+    tmp_path = output_file + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(enriched_data, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, output_file)
+    if os.path.exists(journal_file):
+        os.remove(journal_file)
+
+
+def web_stage(drug, web_search, loader):
+    """Strategy 1: Web Search (More reliable for Turkish brand names)."""
+    # LLM (llama3) tends to hallucinate active ingredients for local brands.
+    potential_names = web_search.search_drug_name(drug)
+    for name in potential_names or []:
+        # Is this name in DB?
+        if loader.search_drug(name):
+            return name
+    return None
+
+
+def llm_stage(drugs, llm, loader):
+    """Strategy 2: Active Ingredient lookup via LLM (Fallback), several brands per call."""
+    # Each answer is verified against the DB to be safe
+    return llm.get_generic_names(drugs, loader=loader, batch_size=len(drugs))
+
+
+def run_pipeline(pending, loader, llm, web_search, journal_file,
+                 web_workers=8, llm_workers=2, llm_batch_size=10, use_web=True, fsync_every=20):
+    """
+    Runs the web and LLM stages concurrently with bounded worker pools.
+    Web misses are grouped into batches of llm_batch_size for the LLM stage.
+    Results are appended to the journal from this (single) thread as they arrive.
+    Returns (results dict, stats dict).
+    """
+    results = {}
+    stats = {"web": 0, "llm": 0, "miss": 0, "web_time": 0.0, "llm_time": 0.0, "llm_calls": 0}
+    total = len(pending)
+    done = 0
+
+    def timed(stage, fn, drugs):
+        start = time.perf_counter()
+        value = fn(drugs)
+        return stage, value, time.perf_counter() - start
+
+    def web_one(drugs):
+        return {drugs[0]: web_stage(drugs[0], web_search, loader)}
+
+    web_pool = ThreadPoolExecutor(max_workers=web_workers, thread_name_prefix="web")
+    llm_pool = ThreadPoolExecutor(max_workers=llm_workers, thread_name_prefix="llm")
+    in_flight = set()
+    web_in_flight = 0
+    llm_queue = []
+
+    def flush_llm(force=False):
+        while llm_queue and (force or len(llm_queue) >= llm_batch_size):
+            batch = llm_queue[:llm_batch_size]
+            del llm_queue[:llm_batch_size]
+            stats["llm_calls"] += 1
+            in_flight.add(llm_pool.submit(timed, "llm", lambda d: llm_stage(d, llm, loader), batch))
+
+    try:
+        for drug in pending:
+            if use_web:
+                in_flight.add(web_pool.submit(timed, "web", web_one, [drug]))
+                web_in_flight += 1
+            else:
+                llm_queue.append(drug)
+        flush_llm(force=not use_web)
+
+        with open(journal_file, "a", encoding="utf-8") as journal:
+            while in_flight:
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    stage, stage_results, elapsed = future.result()
+                    stats[f"{stage}_time"] += elapsed
+                    if stage == "web":
+                        web_in_flight -= 1
+
+                    for drug, generic in stage_results.items():
+                        if generic is None and stage == "web":
+                            llm_queue.append(drug)  # Web missed, fall back to LLM
+                            continue
+
+                        done += 1
+                        if generic:
+                            print(f"[{done}/{total}] ✅ {'Web' if stage == 'web' else 'LLM'} Buldu: {drug} -> {generic}")
+                            stats[stage] += 1
+                        else:
+                            print(f"[{done}/{total}] ❌ Sonuç bulunamadı: {drug}")
+                            stats["miss"] += 1  # Stored as None to avoid reprocessing
+
+                        results[drug] = generic
+                        journal.write(json.dumps({"drug": drug, "generic": generic, "source": stage if generic else None},
+                                                 ensure_ascii=False) + "\n")
+                        journal.flush()
+                        if done % fsync_every == 0:
+                            os.fsync(journal.fileno())
+
+                # Partial batches go out once no more web misses can join them
+                flush_llm(force=web_in_flight == 0)
+            journal.flush()
+            os.fsync(journal.fileno())
+    finally:
+        web_pool.shutdown(wait=False, cancel_futures=True)
+        llm_pool.shutdown(wait=False, cancel_futures=True)
+
+    return results, stats
+
+
+def print_summary(stats, processed, elapsed):
+    print("\n" + "=" * 50)
+    print("📊 ZENGİNLEŞTİRME ÖZETİ")
+    print("=" * 50)
+    print(f"İşlenen: {processed} ilaç, {elapsed:.1f}s")
+    if elapsed > 0:
+        print(f"Verim: {processed / elapsed:.2f} ilaç/s ({processed / elapsed * 3600:.0f} ilaç/saat)")
+    print(f"Web ile bulunan: {stats['web']} | LLM ile bulunan: {stats['llm']} | Bulunamayan: {stats['miss']}")
+    print(f"Toplam aşama süresi: web {stats['web_time']:.1f}s, LLM {stats['llm_time']:.1f}s ({stats['llm_calls']} toplu LLM çağrısı)")
+    print("=" * 50)
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Eksik ilaçlar için jenerik isim zenginleştirme")
+    parser.add_argument("--input", default="missing_drugs.json")
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    parser.add_argument("--journal", default=JOURNAL_FILE)
+    parser.add_argument("--web-workers", type=int, default=8, help="Eşzamanlı web araması sayısı")
+    parser.add_argument("--llm-workers", type=int, default=2, help="Eşzamanlı LLM isteği sayısı")
+    parser.add_argument("--llm-batch-size", type=int, default=10, help="Tek LLM çağrısındaki ilaç sayısı")
+    parser.add_argument("--no-web", action="store_true", help="Web aşamasını atla, doğrudan LLM kullan")
+    args = parser.parse_args()
+
     # 1. Load Missing List
     try:
-        with open("missing_drugs.json", "r", encoding="utf-8") as f:
+        with open(args.input, "r", encoding="utf-8") as f:
             missing_drugs = json.load(f)
     except FileNotFoundError:
-        print("missing_drugs.json bulunamadı!")
+        print(f"{args.input} bulunamadı!")
+        return
+
+    # Load existing enriched data + journal (to resume)
+    enriched_data = load_progress(args.output, args.journal)
+
+    pending = []
+    seen = set()
+    for drug in missing_drugs:
+        drug = drug.strip()
+        if drug and drug not in enriched_data and drug not in seen:
+            pending.append(drug)
+            seen.add(drug)
+
+    print(f"Toplam {len(missing_drugs)} eksik ilaç, {len(pending)} tanesi işlenecek.")
+    if not pending:
+        compact(enriched_data, args.output, args.journal)
+        print("Yapılacak iş yok.")
         return
 
     # 2. Init Components
-    print(f"Toplam {len(missing_drugs)} eksik ilaç zenginleştirilecek.")
-    
     loader = DataLoader(".")
     loader.load_all_data()
-    
+
     llm = LLMInterface()
     web_search = WebSearcher()
-    
-    enriched_data = {}
-    
-    # Load existing enriched data if any (to resume)
-    if os.path.exists("enriched_drugs.json"):
-        with open("enriched_drugs.json", "r", encoding="utf-8") as f:
-             enriched_data = json.load(f)
-             print(f"Mevcut önbellekten {len(enriched_data)} kayıt yüklendi.")
-
-    # 3. Process each drug
-    count = 0
-    total = len(missing_drugs)
-    
-    for drug in missing_drugs:
-        drug = drug.strip()
-        if drug in enriched_data:
-            continue # Skip already processed
-            
-        print(f"\n[{count+1}/{total}] İşleniyor: {drug}...")
-        match_found = False
-        
-        # Strategy 1: Web Search (More reliable for Turkish brand names)
-        # LLM (llama3) tends to hallucinate active ingredients for local brands.
-        print(f"🌍 Web aranıyor: {drug}...")
-        potential_names = web_search.search_drug_name(drug)
-        if potential_names:
-             # Try matches from web search
-             for name in potential_names:
-                  # Is this name in DB?
-                  if loader.search_drug(name):
-                      print(f"✅ Web Buldu: {drug} -> {name}")
-                      enriched_data[drug] = name
-                      match_found = True
-                      break
-                  
-                  # Or check if this result IS the generic name (by checking DB)
-                  # or ask LLM to extract generic from this specific web result title if needed.
-                  
-                  # If the found name + "Tablets" etc. is in DB?
-                  
-        # Strategy 2: Active Ingredient lookup via LLM (Fallback)
-        if not match_found:
-             print(f"⏳ LLM Etken Madde Sorgusu: '{drug}'...")
-             generic_name = llm.get_generic_name(drug)
-             if generic_name and generic_name != "Unknown":
-                # Verify if this generic exists in DB to be safe
-                db_result = loader.search_drug(generic_name)
-                if db_result:
-                    print(f"✅ LLM Buldu: {drug} -> {generic_name}")
-                    enriched_data[drug] = generic_name
-                    match_found = True
-                else:
-                    print(f"⚠️  LLM '{generic_name}' dedi ama veritabanında yok.")
-
-        if not match_found:
-            print(f"❌ Sonuç bulunamadı: {drug}")
-            enriched_data[drug] = None # Mark as not found to avoid reprocessing
-            
-        # Save incrementally every 2 items (safety)
-        if count % 2 == 0:
-            with open("enriched_drugs.json", "w", encoding="utf-8") as f:
-                json.dump(enriched_data, f, indent=2, ensure_ascii=False)
-        
-        count += 1
-        # Be nice to APIs
-        # time.sleep(0.5) 
-
-    # Final Save
-    with open("enriched_drugs.json", "w", encoding="utf-8") as f:
-        json.dump(enriched_data, f, indent=2, ensure_ascii=False)
-    
-    print("\nİşlem tamamlandı. 'enriched_drugs.json' kaydedildi.")
+
+    # 3. Process concurrently
+    start = time.perf_counter()
+    results, stats = run_pipeline(pending, loader, llm, web_search, args.journal,
+                                  web_workers=args.web_workers, llm_workers=args.llm_workers,
+                                  llm_batch_size=args.llm_batch_size,
+                                  use_web=not args.no_web)
+    elapsed = time.perf_counter() - start
+
+    # Final Save (compact journal into the snapshot)
+    enriched_data.update(results)
+    compact(enriched_data, args.output, args.journal)
+
+    print_summary(stats, len(results), elapsed)
+    print(f"\nİşlem tamamlandı. '{args.output}' kaydedildi.")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,196 @@
+"""
+Record-by-record reading of large JSON sources.
+
+  iter_records(path)   elements of a top-level JSON array, or one object per line for .jsonl files
+  iter_items(path)     (key, value) pairs of a top-level JSON object
+  json_kind(path)      "array", "object" or "jsonl", from the first bytes of the file
+
+Only the current record (plus a read buffer) is held in memory, instead of the
+whole parsed document. ijson (pip install ijson) is used when installed;
+otherwise records are cut from a buffered read with json.JSONDecoder.raw_decode.
+With progress=True a percentage of the file read is printed on one line.
+
+Command line:
+  python json_stream.py to-jsonl data/veri7.json     # writes data/veri7.jsonl
+  python json_stream.py count data/veri7.json
+"""
+
+import argparse
+import codecs
+import json
+import os
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+CHUNK_SIZE = 1 << 20
+_WHITESPACE = " \t\r\n"
+
+
+class _Progress:
+    """Prints "<name> %NN" on one line whenever another `step` percent of the file is read."""
+
+    def __init__(self, path, enabled, step=5):
+        self.name = os.path.basename(path)
+        self.size = os.path.getsize(path) or 1
+        self.enabled = enabled
+        self.step = step
+        self.shown = -step
+
+    def update(self, position):
+        if not self.enabled:
+            return
+        percent = min(100, position * 100 // self.size)
+        if percent >= self.shown + self.step:
+            self.shown = percent
+            print(f"📦 {self.name} %{percent}", end="\r", flush=True)
+
+    def done(self, records):
+        if self.enabled:
+            print(f"📦 {self.name} %100 ({records} kayıt)")
+
+
+def json_kind(path):
+    if path.endswith(".jsonl"):
+        return "jsonl"
+    with open(path, "rb") as f:
+        head = f.read(64).decode("utf-8-sig", errors="ignore").lstrip(_WHITESPACE)
+    return {"[": "array", "{": "object"}.get(head[:1], "unknown")
+
+
+def iter_records(path, progress=False):
+    """Yields the records of a JSON array file or a JSON Lines (.jsonl) file one at a time."""
+    kind = json_kind(path)
+    if kind == "jsonl":
+        yield from _iter_jsonl(path, _Progress(path, progress))
+    elif kind == "array":
+        yield from _iter_container(path, "[", _Progress(path, progress))
+    else:
+        raise ValueError(f"{path}: JSON dizisi bekleniyordu ({kind})")
+
+
+def iter_items(path, progress=False):
+    """Yields (key, value) pairs of a top-level JSON object one at a time."""
+    if json_kind(path) != "object":
+        raise ValueError(f"{path}: JSON nesnesi bekleniyordu")
+    yield from _iter_container(path, "{", _Progress(path, progress))
+
+
+def _iter_jsonl(path, progress):
+    count = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+                count += 1
+                progress.update(f.tell())
+    progress.done(count)
+
+
+def _iter_container(path, opener, progress):
+    count = 0
+    with open(path, "rb") as f:
+        if ijson is not None:
+            events = ijson.items(f, "item", use_float=True) if opener == "[" else ijson.kvitems(f, "", use_float=True)
+            for record in events:
+                yield record
+                count += 1
+                if count % 1000 == 0:
+                    progress.update(f.tell())
+        else:
+            for record in _raw_decode_container(f, opener):
+                yield record
+                count += 1
+                progress.update(f.tell())
+    progress.done(count)
+
+
+def _raw_decode_container(f, opener):
+    """Fallback parser: decodes one element (or key/value pair) at a time from a growing buffer."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    raw_decode = json.JSONDecoder().raw_decode
+    buf, pos, eof = "", 0, False
+
+    def fill():
+        nonlocal buf, pos, eof
+        data = f.read(max(CHUNK_SIZE, len(buf) - pos))  # Grows geometrically for records larger than the buffer
+        eof = not data
+        buf = buf[pos:] + decoder.decode(data, final=eof)
+        pos = 0
+
+    def skip(chars):
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in chars:
+                pos += 1
+            if pos < len(buf) or eof:
+                return
+            fill()
+
+    def value():
+        nonlocal pos
+        while True:
+            try:
+                obj, end = raw_decode(buf, pos)
+                # A number cut by the buffer end ("2.5e" of "2.5e3") only counts once a delimiter follows
+                if eof or not isinstance(obj, (int, float)) or (end < len(buf) and buf[end] in _WHITESPACE + ",]}"):
+                    pos = end
+                    return obj
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            fill()
+
+    fill()
+    skip(_WHITESPACE)
+    if buf[pos:pos + 1] != opener:
+        raise ValueError(f"'{opener}' bekleniyordu")
+    pos += 1
+    closer = "]" if opener == "[" else "}"
+    while True:
+        skip(_WHITESPACE + ",")
+        if pos >= len(buf):
+            raise ValueError("Beklenmeyen dosya sonu")
+        if buf[pos] == closer:
+            return
+        if opener == "[":
+            yield value()
+            continue
+        key = value()
+        skip(_WHITESPACE)
+        if buf[pos:pos + 1] != ":":
+            raise ValueError("':' bekleniyordu")
+        pos += 1
+        skip(_WHITESPACE)
+        yield key, value()
+
+
+def to_jsonl(path, output=None, progress=True):
+    """Rewrites a JSON array file as JSON Lines without loading it whole. Returns the record count."""
+    output = output or os.path.splitext(path)[0] + ".jsonl"
+    count = 0
+    with open(output + ".tmp", "w", encoding="utf-8") as out:
+        for record in iter_records(path, progress):
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            count += 1
+    os.replace(output + ".tmp", output)
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Büyük JSON dosyalarını kayıt kayıt okur / JSON Lines'a çevirir")
+    parser.add_argument("command", choices=["to-jsonl", "count"])
+    parser.add_argument("path")
+    parser.add_argument("--output", help="to-jsonl çıktısı (varsayılan: aynı ad, .jsonl)")
+    args = parser.parse_args()
+
+    if args.command == "to-jsonl":
+        n = to_jsonl(args.path, args.output)
+        print(f"✅ {n} kayıt yazıldı.")
+    else:
+        kind = json_kind(args.path)
+        records = iter_items(args.path, progress=True) if kind == "object" else iter_records(args.path, progress=True)
+        n = sum(1 for _ in records)
+        print(f"{args.path}: {kind}, {n} kayıt")
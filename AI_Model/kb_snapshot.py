@@ -0,0 +1,195 @@
+"""
+Columnar knowledge-base snapshot for large drug-drug interaction sources.
+
+A snapshot is a directory written by convert_csv_to_json.py and read by DataLoader
+in place of the matching JSON file (data/veri7.json -> data/veri7.kb/):
+  meta.json             {"format": 2, "source", "drugs", "edges", "edge_shards": [...]}
+  drugs.npz             one row per drug, in first-seen order
+                          name (D,) strings, plus one (D,) string column per ATTRIBUTES entry
+  strings.npz           string tables shared by all edges
+                          partner (P,) strings   interacting drug names
+                          effect  (F,) strings   distinct interaction descriptions
+                          effect_severity (F,) int8  severity.Severity of each effect
+  edges-<n>.npz         interaction edges, one shard per input chunk
+                          drug (E,) int32 row in drugs.npz, partner (E,) int32, effect (E,) int32
+
+A string column <col> is stored as two arrays: <col>_data (uint8, the UTF-8
+bytes of all rows back to back) and <col>_offsets ((n + 1,) int64, row i is
+data[offsets[i]:offsets[i + 1]]). A numpy str array would pad every row to the
+longest one at 4 bytes per character. Format 1 snapshots (str arrays) are
+still read.
+
+Effects repeat heavily in DrugBank style data, so every edge is three int32s
+and each description is stored (and classified) once. Edges are streamed to
+disk shard by shard; the writer only keeps the distinct drugs (with their
+attributes), partners and effects in memory. That is bounded by the
+vocabulary, not the number of edges: a source whose distinct effect texts do
+not fit in memory has to be split before conversion.
+"""
+
+import json
+import os
+import shutil
+
+import numpy as np
+
+from severity import classify
+
+FORMAT_VERSION = 2
+READABLE_FORMATS = (1, 2)
+ATTRIBUTES = ["medicine_desc", "side_effects", "indication", "pharmacodynamics", "absorption", "metabolism"]
+
+
+def _factorize(values):
+    """(codes, distinct values in first-seen order). Uses pandas' hash-based factorize when installed."""
+    try:
+        from pandas import factorize  # Only the converter writes snapshots; DataLoader never imports pandas
+    except ImportError:
+        uniques, first, inverse = np.unique(np.asarray(values, dtype=object), return_index=True, return_inverse=True)
+        order = np.argsort(first)
+        rank = np.empty(len(order), dtype=np.intp)
+        rank[order] = np.arange(len(order))
+        return rank[inverse.reshape(-1)], uniques[order]
+    return factorize(np.asarray(values, dtype=object))
+
+
+def _pack_strings(strings):
+    """{"data", "offsets"} arrays of a string column (see the module docstring)."""
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return {"data": np.frombuffer(b"".join(encoded), dtype=np.uint8), "offsets": offsets}
+
+
+def _save_strings(path, **columns):
+    """Writes string columns (and plain arrays) to one .npz file."""
+    arrays = {}
+    for name, values in columns.items():
+        if isinstance(values, np.ndarray):
+            arrays[name] = values
+        else:
+            for part, array in _pack_strings(values).items():
+                arrays[f"{name}_{part}"] = array
+    np.savez_compressed(path, **arrays)
+
+
+def _load_strings(npz, name):
+    """A string column as a list; falls back to the format 1 str array."""
+    if name in npz.files:
+        return npz[name].tolist()
+    blob = npz[f"{name}_data"].tobytes()
+    offsets = npz[f"{name}_offsets"].tolist()
+    return [blob[lo:hi].decode("utf-8") for lo, hi in zip(offsets, offsets[1:])]
+
+
+class StringTable:
+    """Append-only string -> id table, held in memory (every distinct string once)."""
+
+    def __init__(self):
+        self.strings = []
+        self.index = {}
+
+    def __len__(self):
+        return len(self.strings)
+
+    def ids(self, values):
+        """Ids of an array of strings; only the distinct values are looked up, new ones in first-seen order."""
+        codes, uniques = _factorize(values)
+        lookup = np.empty(len(uniques), dtype=np.int32)
+        for i, value in enumerate(uniques.tolist()):
+            lookup[i] = self.index.get(value, -1)
+            if lookup[i] < 0:
+                lookup[i] = self.index[value] = len(self.strings)
+                self.strings.append(value)
+        return lookup[codes]
+
+
+class SnapshotWriter:
+    """Builds a snapshot in <path>.tmp and moves it into place on close()."""
+
+    def __init__(self, path, source=""):
+        self.path = path
+        self.tmp_path = path + ".tmp"
+        self.source = source
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
+        os.makedirs(self.tmp_path)
+        self.drugs = StringTable()
+        self.attributes = {name: [] for name in ATTRIBUTES}
+        self.partners = StringTable()
+        self.effects = StringTable()
+        self.effect_severity = []
+        self.edge_shards = []
+        self.edge_count = 0
+
+    def add_drugs(self, names, attributes):
+        """Registers drugs (arrays of equal length); drugs already seen keep their first attributes."""
+        before = len(self.drugs)
+        ids = self.drugs.ids(names)
+        new = np.flatnonzero(ids >= before)
+        new = new[np.argsort(ids[new])]  # In id order, so attribute rows line up with names
+        for name in ATTRIBUTES:
+            values = attributes.get(name)
+            self.attributes[name].extend([""] * len(new) if values is None else np.asarray(values, dtype=object)[new].tolist())
+
+    def add_edges(self, drugs, partners, effects):
+        """Appends one shard of edges; drugs must have been registered with add_drugs."""
+        if not len(drugs):
+            return
+        drug_ids = self.drugs.ids(drugs)
+        partner_ids = self.partners.ids(partners)
+        known_effects = len(self.effects)
+        effect_ids = self.effects.ids(effects)
+        self.effect_severity.extend(int(classify(e)) for e in self.effects.strings[known_effects:])
+
+        name = f"edges-{len(self.edge_shards):05d}.npz"
+        np.savez_compressed(os.path.join(self.tmp_path, name), drug=drug_ids, partner=partner_ids, effect=effect_ids)
+        self.edge_shards.append(name)
+        self.edge_count += len(drug_ids)
+
+    def close(self):
+        _save_strings(os.path.join(self.tmp_path, "drugs.npz"), name=self.drugs.strings, **self.attributes)
+        _save_strings(os.path.join(self.tmp_path, "strings.npz"),
+                      partner=self.partners.strings, effect=self.effects.strings,
+                      effect_severity=np.array(self.effect_severity, dtype=np.int8))
+        meta = {"format": FORMAT_VERSION, "source": self.source, "drugs": len(self.drugs),
+                "edges": self.edge_count, "edge_shards": self.edge_shards}
+        with open(os.path.join(self.tmp_path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.replace(self.tmp_path, self.path)
+        return meta
+
+
+def read_snapshot(path):
+    """Yields (drug name, attributes dict, interactions list) per drug, in snapshot order."""
+    with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("format") not in READABLE_FORMATS:
+        raise ValueError(f"Desteklenmeyen snapshot sürümü: {meta.get('format')} ({path})")
+
+    with np.load(os.path.join(path, "strings.npz")) as strings:
+        partners = _load_strings(strings, "partner")
+        effects = _load_strings(strings, "effect")
+        severities = strings["effect_severity"].tolist()
+    columns = {"drug": [], "partner": [], "effect": []}
+    for shard in meta["edge_shards"]:
+        with np.load(os.path.join(path, shard)) as edges:
+            for name in columns:
+                columns[name].append(edges[name])
+    drug_ids, partner_ids, effect_ids = (np.concatenate(columns[name]) if columns[name] else np.zeros(0, np.int32)
+                                         for name in ("drug", "partner", "effect"))
+
+    # Group edges by drug with one stable sort: drug i owns order[bounds[i]:bounds[i + 1]]
+    order = np.argsort(drug_ids, kind="stable")
+    bounds = np.searchsorted(drug_ids[order], np.arange(meta["drugs"] + 1))
+    partner_ids = partner_ids[order].tolist()
+    effect_ids = effect_ids[order].tolist()
+
+    with np.load(os.path.join(path, "drugs.npz")) as drugs:
+        names = _load_strings(drugs, "name")
+        attributes = {name: _load_strings(drugs, name) for name in ATTRIBUTES}
+    for i, name in enumerate(names):
+        lo, hi = bounds[i], bounds[i + 1]
+        interactions = [{"drug": partners[p], "effect": effects[e], "severity": severities[e]}
+                        for p, e in zip(partner_ids[lo:hi], effect_ids[lo:hi])]
+        yield name, {attr: values[i] for attr, values in attributes.items()}, interactions
@@ -0,0 +1,129 @@
+"""
+Hot reload of the knowledge base (DataLoader) without restarting the API.
+
+KnowledgeBase holds the current DataLoader generation. A reload builds the next
+generation in a background thread (DataLoader.reloaded) and swaps it in with a
+single assignment. Callers read `knowledge.loader` once per request, so a
+request started before the swap finishes on the old generation. Only sources
+whose files changed (mtime or size) are reloaded: a new enriched_drugs.json
+reloads the alias cache and rebuilds the matchers, while changes to the veri
+files rebuild everything. Both generations are in memory until the old one's
+last request finishes.
+
+Configuration (environment, read by api_server.py):
+  NUTRIMED_KB_WATCH      poll data files every N seconds and reload on change (0 = off, default)
+  NUTRIMED_ADMIN_TOKEN   token for POST /api/admin/reload (without it only localhost may reload)
+"""
+
+import threading
+import time
+import traceback
+
+
+class KnowledgeBase:
+    """Current DataLoader generation plus background reloads that replace it atomically."""
+
+    def __init__(self, loader, on_swap=None, workers=None):
+        """loader: a loaded DataLoader. on_swap(loader) runs after each swap (e.g. to clear caches)."""
+        self._loader = loader
+        self._signature = loader.source_signature()
+        self.on_swap = on_swap
+        self.workers = workers  # load_all_data workers for full rebuilds
+        self.generation = 1
+        self.loaded_at = time.time()
+        self.last_reload = None  # {"changed", "full", "seconds", "error"} of the latest reload
+        self._lock = threading.Lock()
+        self._thread = None
+        self._watcher = None
+        self._failed_signature = None  # Files that last failed to load; the watcher waits for them to change again
+
+    @property
+    def loader(self):
+        return self._loader
+
+    def current(self):
+        """(generation, loader), read together so the number always belongs to the loader."""
+        with self._lock:
+            return self.generation, self._loader
+
+    def _changes(self):
+        """(current file signature, labels of the sources changed since this generation was built)."""
+        signature = self._loader.source_signature()
+        return signature, [label for label, value in signature.items() if self._signature.get(label) != value]
+
+    def reload(self, full=False, wait=False):
+        """
+        Starts a background reload; returns False if one is already running.
+        full=True rebuilds every source even if no file changed.
+        """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            self._thread = threading.Thread(target=self._reload, args=(full,), name="kb-reload", daemon=True)
+            self._thread.start()
+            thread = self._thread
+        if wait:
+            thread.join()
+        return True
+
+    def _reload(self, full):
+        start = time.perf_counter()
+        # Taken before loading: a file written during the reload differs again on the next check
+        signature, changed = self._changes()
+        if full:
+            changed = None
+        elif not changed:
+            self.last_reload = {"changed": [], "full": False, "seconds": 0.0, "error": None}
+            print("ℹ️  Bilgi tabanı: değişen kaynak yok.")
+            return
+        print(f"🔄 Bilgi tabanı yeniden yükleniyor ({'tamamı' if changed is None else ', '.join(changed)})...")
+        try:
+            loader = self._loader.reloaded(changed, self.workers)
+        except Exception as e:
+            # The current generation keeps serving
+            traceback.print_exc()
+            self._failed_signature = signature
+            self.last_reload = {"changed": changed, "full": changed is None,
+                                "seconds": time.perf_counter() - start, "error": str(e)}
+            print(f"❌ Bilgi tabanı yüklenemedi, önceki sürüm kullanılmaya devam ediyor: {e}")
+            return
+
+        with self._lock:
+            self._loader = loader
+            self._signature = signature
+            self.generation += 1
+            self.loaded_at = time.time()
+        if self.on_swap is not None:
+            self.on_swap(loader)
+        seconds = time.perf_counter() - start
+        # load_all_data records a total; an incremental reload only times the sources it reloaded
+        self.last_reload = {"changed": changed, "full": "total" in loader.load_timings,
+                            "seconds": seconds, "error": None}
+        print(f"✅ Bilgi tabanı sürüm {self.generation} devrede ({seconds:.2f}s, {len(loader.drug_index)} ilaç).")
+
+    def watch(self, interval):
+        """Polls the data files every `interval` seconds and reloads when one changes."""
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    signature = self._loader.source_signature()
+                    if signature != self._signature and signature != self._failed_signature:
+                        self.reload()
+                except Exception as e:
+                    print(f"⚠️  Bilgi tabanı izleme hatası: {e}")
+
+        self._watcher = threading.Thread(target=run, name="kb-watch", daemon=True)
+        self._watcher.start()
+
+    def status(self):
+        with self._lock:
+            reloading = self._thread is not None and self._thread.is_alive()
+        return {
+            "generation": self.generation,
+            "loaded_at": self.loaded_at,
+            "drugs": len(self._loader.drug_index),
+            "reloading": reloading,
+            "watching": self._watcher is not None,
+            "last_reload": self.last_reload,
+        }
@@ -0,0 +1,220 @@
+"""
+Multiple Ollama backends behind one LLMInterface.
+
+Routing picks the healthy backend with the fewest outstanding requests among
+those that have the requested model loaded. Health checks reuse /api/tags,
+which both proves liveness and refreshes each node's model list. Nodes that
+fail repeatedly or respond too slowly are ejected for a cooldown period; after
+it they receive traffic again, and the next failure ejects them right away.
+
+Configuration (environment):
+  NUTRIMED_LLM_URLS   Comma separated list, e.g. "http://gpu1:11434,http://gpu2:11434"
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+
+
+class NoBackendAvailable(requests.exceptions.ConnectionError):
+    """Raised when no backend can serve the requested model."""
+
+
+def _base_model_name(name):
+    return name.split(':')[0]
+
+
+class Backend:
+    """Routing state of a single Ollama node."""
+
+    def __init__(self, url):
+        self.url = url.rstrip("/")
+        self.outstanding = 0
+        self.models = None  # None = not probed yet, else set of names (with and without tag)
+        self.consecutive_failures = 0
+        self.latency_ewma = None  # Seconds until response headers (~ time to first token)
+        self.probe_latency = None
+        self.ejected_until = 0.0
+        self.total_requests = 0
+        self.total_failures = 0
+
+    def is_ejected(self, now=None):
+        return (now or time.monotonic()) < self.ejected_until
+
+    def has_model(self, model_name):
+        if self.models is None:
+            return False
+        return model_name in self.models or _base_model_name(model_name) in self.models
+
+    def to_dict(self):
+        return {
+            "url": self.url,
+            "outstanding": self.outstanding,
+            "models": sorted(self.models) if self.models is not None else None,
+            "ejected": self.is_ejected(),
+            "consecutive_failures": self.consecutive_failures,
+            "latency_ewma": round(self.latency_ewma, 3) if self.latency_ewma is not None else None,
+            "probe_latency": round(self.probe_latency, 3) if self.probe_latency is not None else None,
+            "total_requests": self.total_requests,
+            "total_failures": self.total_failures,
+        }
+
+
+class BackendPool:
+    """
+    Least-outstanding-requests router over a list of Ollama base URLs.
+
+    Usage:
+        pool = BackendPool(["http://gpu1:11434", "http://gpu2:11434"])
+        with pool.acquire("llama3.1") as backend:
+            requests.post(f"{backend.url}/api/generate", ...)
+            pool.record_success(backend)
+
+    Exceptions raised inside the block count as failures of that backend.
+    """
+
+    def __init__(self, urls, failure_threshold=3, eject_seconds=30.0,
+                 slow_threshold=20.0, health_interval=15.0, probe_timeout=2.0):
+        if not urls:
+            raise ValueError("BackendPool en az bir adres gerektirir.")
+        self.backends = [Backend(u) for u in urls]
+        self.failure_threshold = failure_threshold
+        self.eject_seconds = eject_seconds
+        self.slow_threshold = slow_threshold
+        self.health_interval = health_interval
+        self.probe_timeout = probe_timeout
+        self._lock = threading.Lock()
+        self._health_thread = None
+        self._stop = threading.Event()
+
+    @classmethod
+    def from_env(cls, host=None, hosts=None, default_url="http://localhost:11434"):
+        """Builds a pool from explicit arguments, NUTRIMED_LLM_URLS or NUTRIMED_LLM_URL."""
+        if not hosts:
+            env_hosts = os.environ.get("NUTRIMED_LLM_URLS", "")
+            hosts = [h.strip() for h in env_hosts.split(",") if h.strip()]
+        if not hosts:
+            hosts = [host or os.environ.get("NUTRIMED_LLM_URL") or default_url]
+        return cls(hosts)
+
+    @property
+    def primary(self):
+        return self.backends[0]
+
+    # ------------------------------------------------------------------
+    # Health checks
+    # ------------------------------------------------------------------
+    def probe(self, backend):
+        """Health-checks one backend via /api/tags and refreshes its model list."""
+        try:
+            start = time.perf_counter()
+            response = requests.get(f"{backend.url}/api/tags", timeout=self.probe_timeout)
+            elapsed = time.perf_counter() - start
+            response.raise_for_status()
+            names = set()
+            for m in response.json().get('models', []):
+                names.add(m['name'])
+                names.add(_base_model_name(m['name']))
+        except Exception:
+            self.record_failure(backend)
+            return False
+
+        with self._lock:
+            backend.models = names
+            backend.consecutive_failures = 0
+            backend.probe_latency = elapsed
+        return True
+
+    def refresh(self):
+        """Probes every backend. Returns the number of healthy ones."""
+        return sum(1 for b in self.backends if self.probe(b))
+
+    def start_health_checks(self):
+        """Starts a daemon thread that re-probes all backends periodically."""
+        if self._health_thread is not None:
+            return
+
+        def loop():
+            while not self._stop.wait(self.health_interval):
+                self.refresh()
+
+        self._health_thread = threading.Thread(target=loop, daemon=True, name="llm-health")
+        self._health_thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def available_models(self):
+        models = set()
+        for b in self.backends:
+            if b.models:
+                models |= b.models
+        return models
+
+    # ------------------------------------------------------------------
+    # Routing
+    # ------------------------------------------------------------------
+    def _pick(self, model_name, exclude=()):
+        now = time.monotonic()
+        pool = [b for b in self.backends if b not in exclude] or self.backends
+        live = [b for b in pool if not b.is_ejected(now)]
+        candidates = [b for b in live if model_name and b.has_model(model_name)]
+        if not candidates:
+            # Nodes never probed successfully may still serve the model
+            candidates = [b for b in live if b.models is None]
+        if not candidates:
+            # Degraded mode: every suitable node is ejected, try them anyway
+            candidates = [b for b in pool
+                          if b.models is None or not model_name or b.has_model(model_name)]
+        if not candidates:
+            raise NoBackendAvailable(f"'{model_name}' modelini sunan LLM sunucusu yok.")
+        return min(candidates, key=lambda b: (b.outstanding, b.latency_ewma or 0.0))
+
+    @contextmanager
+    def acquire(self, model_name=None, exclude=()):
+        """Reserves the least-loaded backend for the duration of one request."""
+        with self._lock:
+            backend = self._pick(model_name, exclude)
+            backend.outstanding += 1
+            backend.total_requests += 1
+        try:
+            yield backend
+        except Exception:
+            self.record_failure(backend)
+            raise
+        finally:
+            with self._lock:
+                backend.outstanding -= 1
+
+    def observe_latency(self, backend, seconds):
+        """Records time-to-first-byte of a generate call; ejects the node if it is too slow."""
+        with self._lock:
+            self._observe_latency(backend, seconds)
+
+    def _observe_latency(self, backend, seconds):
+        if backend.latency_ewma is None:
+            backend.latency_ewma = seconds
+        else:
+            backend.latency_ewma = 0.8 * backend.latency_ewma + 0.2 * seconds
+        if backend.latency_ewma > self.slow_threshold and len(self.backends) > 1:
+            backend.ejected_until = time.monotonic() + self.eject_seconds
+
+    def record_success(self, backend):
+        with self._lock:
+            backend.consecutive_failures = 0
+
+    def record_failure(self, backend):
+        with self._lock:
+            backend.consecutive_failures += 1
+            backend.total_failures += 1
+            if (backend.consecutive_failures >= self.failure_threshold and len(self.backends) > 1
+                    and not backend.is_ejected()):
+                backend.ejected_until = time.monotonic() + self.eject_seconds
+                print(f"⚠️  LLM sunucusu devre dışı bırakıldı ({self.eject_seconds:.0f}s): {backend.url}")
+
+    def status(self):
+        with self._lock:
+            return [b.to_dict() for b in self.backends]
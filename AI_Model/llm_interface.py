@@ -1,22 +1,30 @@
 
 import requests
 import json
+from llm_backends import BackendPool
+from severity import most_severe, severity_of
+
+# Ollama base URL; override with NUTRIMED_LLM_URL (e.g. to target stub_llm_server.py)
+# or list several with NUTRIMED_LLM_URLS for load balancing.
+DEFAULT_LLM_URL = "http://localhost:11434"
 
 class LLMInterface:
-    def __init__(self, model_name="llama-3.1-8b-turkish-drug-finetuned"):
-        self.base_url = "http://localhost:11434/api/generate"
+    def __init__(self, model_name="llama-3.1-8b-turkish-drug-finetuned", host=None, hosts=None):
+        self.backends = BackendPool.from_env(host, hosts, DEFAULT_LLM_URL)
+        self.host = self.backends.primary.url
+        self.base_url = f"{self.host}/api/generate"
         self.model_name = model_name
         self.validate_model()
+        if len(self.backends.backends) > 1:
+            self.backends.start_health_checks()
 
     def validate_model(self):
         """Checks if model exists, falls back to others if not."""
         try:
-            # List available models
-            response = requests.get("http://localhost:11434/api/tags", timeout=2)
-            if response.status_code == 200:
-                models = [m['name'] for m in response.json().get('models', [])]
-                # Normalize names (handle :latest)
-                models_base = [m.split(':')[0] for m in models]
+            # List available models on every backend (/api/tags doubles as health check)
+            if self.backends.refresh():
+                models = sorted(m for m in self.backends.available_models() if ':' in m)
+                models_base = self.backends.available_models()
                 
                 if self.model_name not in models and self.model_name not in models_base:
                     print(f"⚠️  UYARI: '{self.model_name}' modeli bulunamadı! (Mevcut Modeller: {models})")
@@ -33,12 +41,54 @@ class LLMInterface:
             print(f"⚠️  Model kontrolü yapılamadı: {e}")
 
     def check_connection(self):
-        """Checks if Ollama is running."""
-        try:
-            response = requests.get("http://localhost:11434/", timeout=2)
-            return response.status_code == 200
-        except:
-            return False
+        """Checks if at least one Ollama backend is running."""
+        for backend in self.backends.backends:
+            try:
+                response = requests.get(f"{backend.url}/", timeout=2)
+                if response.status_code == 200:
+                    return True
+            except:
+                continue
+        return False
+
+    def _generate(self, payload, timeout):
+        """
+        Sends a generate request to the least-loaded backend serving the model.
+        Streams are consumed fully; returns the concatenated response text.
+        A backend that fails before answering is retried once on another node.
+        """
+        stream = payload.get("stream", False)
+        tried = []
+        attempts = min(2, len(self.backends.backends))
+        for attempt in range(attempts):
+            with self.backends.acquire(payload.get("model"), exclude=tried) as backend:
+                tried.append(backend)
+                try:
+                    response = requests.post(f"{backend.url}/api/generate", json=payload, timeout=timeout, stream=stream)
+                    self.backends.observe_latency(backend, response.elapsed.total_seconds())
+                    response.raise_for_status()
+                except (requests.exceptions.ConnectionError, requests.exceptions.HTTPError):
+                    if attempt + 1 < attempts:
+                        self.backends.record_failure(backend)
+                        continue
+                    raise
+                self.backends.record_success(backend)
+
+                if not stream:
+                    return response.json().get("response", "")
+
+                full_response = ""
+                for line in response.iter_lines():
+                    if line:
+                        try:
+                            json_obj = json.loads(line.decode('utf-8'))
+                            chunk = json_obj.get("response", "")
+                            full_response += chunk
+                            if json_obj.get("done", False):
+                                break
+                        except json.JSONDecodeError:
+                            continue
+                return full_response
 
     def analyze_direct(self, user_query):
         """
@@ -64,26 +114,45 @@ Sen yardımcı bir ilaç asistanısın. Her zaman Türkçe yanıt ver.<|eot_id|>
                 }
             }
             
-            response = requests.post(self.base_url, json=payload, timeout=120, stream=True)
-            response.raise_for_status()
-            
-            full_response = ""
-            for line in response.iter_lines():
-                if line:
-                    try:
-                        json_obj = json.loads(line.decode('utf-8'))
-                        chunk = json_obj.get("response", "")
-                        full_response += chunk
-                        if json_obj.get("done", False):
-                            break
-                    except json.JSONDecodeError:
-                        continue
-                        
+            full_response = self._generate(payload, timeout=120)
             return full_response if full_response else "Analiz yanıtı alınamadı."
             
         except Exception as e:
             return f"⚠️ LLM Hatası: {str(e)}"
 
+    def build_entity_prompt(self, drugs, foods, interactions, max_field=200):
+        """
+        Compact clinical prompt for analyze_direct from entities linked in OCR text.
+        drugs: [{"name", "data"}] from DataLoader.link_entities(); foods: names;
+        interactions: DataLoader.find_interactions() lines. Long fields are truncated to max_field.
+        """
+        def short(text):
+            text = " ".join(str(text).split())
+            return text if len(text) <= max_field else text[:max_field].rstrip() + "..."
+
+        lines = ["Görseldeki ilaç/besin etiketinde şunlar tespit edildi."]
+        if drugs:
+            lines.append("İlaçlar:")
+            for drug in drugs:
+                data = drug["data"]
+                line = f"- {drug['name']}"
+                if data.get("salt_composition"):
+                    line += f" (etken madde: {data['salt_composition']})"
+                lines.append(line)
+                warnings = data.get("generic_warnings", {}).get("contraindications") or data.get("contraindications")
+                if warnings:
+                    lines.append(f"  Kontrendikasyonlar: {short(warnings)}")
+                if data.get("food_interactions"):
+                    lines.append(f"  Besin uyarıları: {short('; '.join(data['food_interactions'][:3]))}")
+        if foods:
+            lines.append(f"Besinler: {', '.join(foods)}")
+        relevant = [i for i in interactions if not i.startswith("ℹ️")]  # General food warnings are listed above
+        if relevant:
+            lines.append("Etkileşimler:")
+            lines.extend(f"- {short(i)}" for i in relevant[:5])
+        lines.append("Bunları değerlendir: kritik etkileşimleri, besin uyarılarını ve kullanım uyarılarını kısaca sırala.")
+        return "\n".join(lines)
+
     def analyze_with_qa_context(self, user_query, qa_results=None):
         """
         Analyzes user query with Q&A knowledge base context for better responses.
@@ -125,21 +194,7 @@ KURALLAR:
                 }
             }
             
-            response = requests.post(self.base_url, json=payload, timeout=120, stream=True)
-            response.raise_for_status()
-            
-            full_response = ""
-            for line in response.iter_lines():
-                if line:
-                    try:
-                        json_obj = json.loads(line.decode('utf-8'))
-                        chunk = json_obj.get("response", "")
-                        full_response += chunk
-                        if json_obj.get("done", False):
-                            break
-                    except json.JSONDecodeError:
-                        continue
-                        
+            full_response = self._generate(payload, timeout=120)
             return full_response if full_response else "Analiz yanıtı alınamadı."
             
         except Exception as e:
@@ -188,9 +243,7 @@ KURALLAR:
                 }
             }
             # Reduced timeout since we limited tokens
-            response = requests.post(self.base_url, json=payload, timeout=45) 
-            response.raise_for_status()
-            result = response.json().get("response", "").strip()
+            result = self._generate(payload, timeout=45).strip()
             print(" ✅")
             
             # Basic cleanup (remove dots, extra words if LLM is chatty)
@@ -200,7 +253,7 @@ KURALLAR:
             return result
             
         except requests.exceptions.ConnectionError:
-            print(" ❌ (Hata: Ollama bağlantısı sağlanamadı. Lütfen uygulamanın çalıştığından emin olun: localhost:11434)")
+            print(f" ❌ (Hata: Ollama bağlantısı sağlanamadı. Lütfen uygulamanın çalıştığından emin olun: {self.host})")
             return None
         except requests.exceptions.Timeout:
             print(" ❌ (Zaman aşımı)")
@@ -209,35 +262,113 @@ KURALLAR:
             print(f" ❌ (Hata: {e})")
             return None
 
+    def get_generic_names(self, brand_names, loader=None, batch_size=10):
+        """
+        Batched variant of get_generic_name: resolves several brands per generation
+        using Ollama's structured JSON output (format: json).
+        If a DataLoader is given, each answer must exist in the drug database.
+        Brands missing from (or malformed in) the JSON answer fall back to
+        single-item get_generic_name calls.
+        Returns: dict {brand_name: generic name or None}
+        """
+        results = {}
+        unique = list(dict.fromkeys(b.strip() for b in brand_names if b and b.strip()))
+
+        for start in range(0, len(unique), batch_size):
+            batch = unique[start:start + batch_size]
+            parsed = self._query_generic_batch(batch)
+            for brand in batch:
+                if brand in parsed:
+                    generic = parsed[brand]
+                else:
+                    # Item failed to parse: retry it on its own
+                    generic = self.get_generic_name(brand)
+                results[brand] = self._validate_generic(brand, generic, loader)
+        return results
+
+    def _query_generic_batch(self, batch):
+        """Returns {brand: generic or None} for the brands the model answered cleanly."""
+        brand_lines = "\n".join(f"{i}. {b}" for i, b in enumerate(batch, 1))
+        prompt = f"""
+        Identify the main active ingredient (generic name) for each drug brand below.
+
+        RULES:
+        1. Answer with JSON only: {{"results": [{{"brand": "<brand>", "generic": "<generic name in English>"}}]}}
+        2. Keep the brand names exactly as given, one object per brand.
+        3. If you are not 100% sure or if the drug is a local brand you don't know, use "Unknown".
+        4. Do NOT guess. Hallucinations are dangerous.
+
+        Example:
+        Brands: 1. Delix 2. UnknownBrand123
+        Output: {{"results": [{{"brand": "Delix", "generic": "Ramipril"}}, {{"brand": "UnknownBrand123", "generic": "Unknown"}}]}}
+
+        Brands:
+        {brand_lines}
+        """
+
+        print(f"⏳ LLM Toplu Etken Madde Sorgusu: {len(batch)} ilaç için bekleniyor...", end="", flush=True)
+        try:
+            payload = {
+                "model": self.model_name,
+                "prompt": prompt,
+                "stream": False,
+                "format": "json",
+                "options": {
+                    "num_predict": 30 * len(batch) + 20,
+                    "temperature": 0.0
+                }
+            }
+            raw = self._generate(payload, timeout=45 + 5 * len(batch))
+            data = json.loads(raw)
+            print(" ✅")
+        except json.JSONDecodeError:
+            print(" ❌ (Geçersiz JSON, tekli sorguya geçiliyor)")
+            return {}
+        except requests.exceptions.ConnectionError:
+            print(f" ❌ (Hata: Ollama bağlantısı sağlanamadı. Lütfen uygulamanın çalıştığından emin olun: {self.host})")
+            return {}
+        except requests.exceptions.Timeout:
+            print(" ❌ (Zaman aşımı)")
+            return {}
+        except Exception as e:
+            print(f" ❌ (Hata: {e})")
+            return {}
+
+        items = data.get("results", []) if isinstance(data, dict) else data
+        wanted = {b.lower(): b for b in batch}
+        parsed = {}
+        for item in items if isinstance(items, list) else []:
+            if not isinstance(item, dict):
+                continue
+            brand = wanted.get(str(item.get("brand", "")).strip().lower())
+            generic = item.get("generic")
+            if not brand or not isinstance(generic, str):
+                continue
+            generic = generic.strip()
+            parsed[brand] = None if "Unknown" in generic or not generic else generic
+        return parsed
+
+    def _validate_generic(self, brand, generic, loader):
+        """Rejects chatty answers and, if a DataLoader is given, names missing from the DB."""
+        if not generic:
+            return None
+        if len(generic) > 50:
+            print(f"⚠️  LLM Cevabı belirsiz: {brand} -> {generic}")
+            return None
+        if loader is not None and not loader.search_drug(generic):
+            print(f"⚠️  LLM '{generic}' dedi ama veritabanında yok ({brand}).")
+            return None
+        return generic
+
     def _construct_prompt(self, drug_name, data, detected_interactions=None):
         """Constructs the prompt for the LLM."""
         
         # 1. Pre-translate and Sort Interactions
         interactions_list = []
         if data.get("drug_interactions"):
-            # Scoring logic: higher is more severe
-            def get_severity_score(text):
-                text_lower = text.lower()
-                if any(x in text_lower for x in ["life-threatening", "severe", "contraindicated", "serious", "avoid"]):
-                    return 3 # Severe
-                if any(x in text_lower for x in ["monitor", "risk", "increase", "decrease", "moderate"]):
-                    return 2 # Moderate
-                return 1 # Minor
-            
-            # Sort by severity score (descending)
-            sorted_interactions = sorted(
-                data['drug_interactions'], 
-                key=lambda x: get_severity_score(x['effect']), 
-                reverse=True
-            )
-            
-            # Take top 10
-            top_interactions = sorted_interactions[:10]
-            
-            for i in top_interactions:
-                score = get_severity_score(i['effect'])
-                label = "CİDDİ" if score == 3 else "ORTA" if score == 2 else "HAFİF"
-                interactions_list.append(f"{i['drug']} ({label} Etkileşim)")
+            # Top 10 by the severity stored on each edge at load time
+            for i in most_severe(data['drug_interactions'], 10):
+                interactions_list.append(f"{i['drug']} ({severity_of(i).label} Etkileşim)")
                 
         interactions_text = ", ".join(interactions_list) if interactions_list else "Belirtilmemiş"
             
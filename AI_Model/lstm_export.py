@@ -0,0 +1,301 @@
+"""
+Streaming export of user analytics for the planned LSTM model.
+
+Users are visited in key order and their analysis_history is read page by
+page through the store, so memory stays bounded by one shard regardless of
+the total number of events. Each user becomes a sequence of time buckets
+(default: one day) holding per-risk-level event counts, plus the user's
+medications, diseases and allergies as vocabulary ids.
+
+Output directory:
+  vocab.json                {"risk": [...], "drug": [...], "disease": [...], "allergy": [...]}
+                            id = list index, 0 = "<unk>"; ids never change between runs
+  state.json                resumable cursor (last exported user, next shard, run info)
+  shard-<run>-<n>.npz       users_per_shard users per shard (.parquet when pyarrow is installed)
+
+npz shard arrays (CSR style; user i spans seq_offsets[i]:seq_offsets[i + 1]):
+  user           (U,)    str    user key
+  seq_offsets    (U+1,)  int64
+  bucket         (T,)    int64  timestamp // bucket_seconds, ascending within a user
+  risk_counts    (T, R)  int32  events per risk level id in that bucket
+  drug_offsets / drug_ids, disease_offsets / disease_ids, allergy_offsets / allergy_ids
+
+An interrupted run resumes after the last completed shard. Once a run has
+finished, the next one only exports entries logged since its start (nightly
+incremental export, in new shard files): each run records the store's
+history_seq() when it starts and the next one asks for entries with a larger
+seq. Pass full=True to export everything again.
+
+Usage: python lstm_export.py --output data/lstm_export [--full]
+"""
+
+import argparse
+import json
+import os
+import time
+from collections import Counter
+from datetime import datetime
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+UNK = "<unk>"
+RISK_LEVELS = ["high", "medium", "low", "info"]
+
+
+class Vocab:
+    """Append-only token table; ids stay stable across runs."""
+
+    def __init__(self, tokens=None):
+        self.tokens = list(tokens or [UNK])
+        self.index = {t: i for i, t in enumerate(self.tokens)}
+
+    def id(self, token):
+        token = str(token or "").strip().lower()
+        if not token:
+            return 0
+        if token not in self.index:
+            self.index[token] = len(self.tokens)
+            self.tokens.append(token)
+        return self.index[token]
+
+
+def _write_atomic(path, write):
+    tmp_path = path + ".tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _write_json(path, obj):
+    def write(tmp_path):
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(obj, f, ensure_ascii=False)
+    _write_atomic(path, write)
+
+
+def entry_timestamp(entry):
+    """Unix time of a history entry: its int "id", else "date" + "time"."""
+    ts = entry.get("id")
+    if isinstance(ts, (int, float)) and ts > 0:
+        return int(ts)
+    try:
+        return int(datetime.strptime(f"{entry['date']} {entry.get('time', '00:00')}", "%Y-%m-%d %H:%M").timestamp())
+    except (KeyError, ValueError):
+        return None
+
+
+class LSTMExporter:
+    def __init__(self, store, output_dir, bucket_seconds=86400, users_per_shard=10000,
+                 page_size=500, fmt="auto"):
+        self.store = store
+        self.output_dir = output_dir
+        self.bucket_seconds = bucket_seconds
+        self.users_per_shard = users_per_shard
+        self.page_size = page_size
+        if fmt == "auto":
+            fmt = "parquet" if pa is not None else "npz"
+        if fmt == "parquet" and pa is None:
+            raise ImportError("Parquet çıktısı için pyarrow gerekli (pip install pyarrow).")
+        self.fmt = fmt
+        self.state_file = os.path.join(output_dir, "state.json")
+        self.vocab_file = os.path.join(output_dir, "vocab.json")
+        os.makedirs(output_dir, exist_ok=True)
+        self.vocabs = self._load_vocabs()
+
+    # ------------------------------------------------------------------
+    # State
+    # ------------------------------------------------------------------
+    def _load_vocabs(self):
+        tables = {"risk": [UNK] + RISK_LEVELS, "drug": None, "disease": None, "allergy": None}
+        if os.path.exists(self.vocab_file):
+            with open(self.vocab_file, "r", encoding="utf-8") as f:
+                tables.update(json.load(f))
+        return {name: Vocab(tokens) for name, tokens in tables.items()}
+
+    def _load_state(self):
+        if not os.path.exists(self.state_file):
+            return None
+        with open(self.state_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _new_state(self, previous, full):
+        run_started = int(time.time())
+        since = None
+        if previous is not None:
+            run_started = max(run_started, previous["run_started"] + 1)  # Unique shard names
+            if previous.get("done") and not full:
+                # Incremental: entries logged after the previous run started. Entries logged
+                # while that run was going may be exported twice, but none are lost.
+                # (A state without history_seq predates seq cursors: export everything.)
+                since = previous.get("history_seq")
+        return {"run_started": run_started, "history_seq": self.store.history_seq(), "since": since,
+                "last_user": None, "next_shard": 0, "users": 0, "events": 0, "shards": [], "done": False}
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+    def _history(self, user_key, since):
+        """Streams a user's history newest first, one page at a time."""
+        before = None
+        while True:
+            page, before = self.store.history_page(user_key, self.page_size, before, since)
+            yield from page
+            if before is None:
+                return
+
+    def _user_sequence(self, user_key, since):
+        """Returns (buckets, risk_counts rows, event count) or None if the user has no events."""
+        counts = Counter()
+        events = 0
+        for entry in self._history(user_key, since):
+            ts = entry_timestamp(entry)
+            if ts is None:
+                continue
+            counts[(ts // self.bucket_seconds, self.vocabs["risk"].id(entry.get("riskLevel")))] += 1
+            events += 1
+        if not events:
+            return None
+
+        buckets = sorted({b for b, _ in counts})
+        position = {b: i for i, b in enumerate(buckets)}
+        rows = [Counter() for _ in buckets]
+        for (bucket, risk), n in counts.items():
+            rows[position[bucket]][risk] = n
+        return buckets, rows, events
+
+    def _static_ids(self, record):
+        meds = [m.get("name", "") if isinstance(m, dict) else m for m in record.get("medications", [])]
+        return {
+            "drug": [self.vocabs["drug"].id(m) for m in meds],
+            "disease": [self.vocabs["disease"].id(d) for d in record.get("diseases", [])],
+            "allergy": [self.vocabs["allergy"].id(a) for a in record.get("allergies", [])],
+        }
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+    def _write_shard(self, path, users):
+        n_risk = len(self.vocabs["risk"].tokens)
+        if self.fmt == "parquet":
+            table = pa.table({
+                "user": [u["user"] for u in users],
+                "bucket": [u["buckets"] for u in users],
+                "risk_counts": [[[row.get(r, 0) for r in range(n_risk)] for row in u["rows"]] for u in users],
+                "drug_ids": [u["drug"] for u in users],
+                "disease_ids": [u["disease"] for u in users],
+                "allergy_ids": [u["allergy"] for u in users],
+            })
+            _write_atomic(path, lambda tmp: pq.write_table(table, tmp))
+            return
+
+        def csr(lists, dtype):
+            offsets = np.zeros(len(lists) + 1, dtype=np.int64)
+            offsets[1:] = np.cumsum([len(x) for x in lists])
+            values = np.fromiter((v for x in lists for v in x), dtype=dtype, count=int(offsets[-1]))
+            return offsets, values
+
+        seq_offsets, bucket = csr([u["buckets"] for u in users], np.int64)
+        risk_counts = np.zeros((len(bucket), n_risk), dtype=np.int32)
+        t = 0
+        for u in users:
+            for row in u["rows"]:
+                for risk, n in row.items():
+                    risk_counts[t, risk] = n
+                t += 1
+        drug_offsets, drug_ids = csr([u["drug"] for u in users], np.int32)
+        disease_offsets, disease_ids = csr([u["disease"] for u in users], np.int32)
+        allergy_offsets, allergy_ids = csr([u["allergy"] for u in users], np.int32)
+
+        def write(tmp_path):
+            with open(tmp_path, "wb") as f:
+                np.savez_compressed(
+                    f, user=np.array([u["user"] for u in users], dtype=str), seq_offsets=seq_offsets,
+                    bucket=bucket, risk_counts=risk_counts,
+                    drug_offsets=drug_offsets, drug_ids=drug_ids,
+                    disease_offsets=disease_offsets, disease_ids=disease_ids,
+                    allergy_offsets=allergy_offsets, allergy_ids=allergy_ids)
+        _write_atomic(path, write)
+
+    def _commit_shard(self, state, users):
+        name = f"shard-{state['run_started']}-{state['next_shard']:05d}.{self.fmt}"
+        self._write_shard(os.path.join(self.output_dir, name), users)
+        # Shard, then vocab, then cursor: a crash in between only repeats this shard
+        _write_json(self.vocab_file, {k: v.tokens for k, v in self.vocabs.items()})
+        state["last_user"] = users[-1]["user"]
+        state["next_shard"] += 1
+        state["users"] += len(users)
+        state["events"] += sum(u["events"] for u in users)
+        state["shards"].append(name)
+        _write_json(self.state_file, state)
+        print(f"💾 {name}: {len(users)} kullanıcı (toplam {state['users']} kullanıcı, {state['events']} olay)")
+
+    def run(self, full=False):
+        """Exports (or resumes exporting) all users. Returns the final state dict."""
+        state = self._load_state()
+        if state is None or state.get("done") or full:
+            state = self._new_state(state, full)
+        else:
+            print(f"↩️  Yarım kalan dışa aktarım sürdürülüyor ({state['last_user']} sonrasından).")
+
+        start = time.perf_counter()
+        buffer = []
+        for user_key in sorted(self.store.keys()):
+            if state["last_user"] is not None and user_key <= state["last_user"]:
+                continue
+            sequence = self._user_sequence(user_key, state["since"])
+            if sequence is None:
+                continue
+            buckets, rows, events = sequence
+            record = self.store.get(user_key, include_history=False) or {}
+            buffer.append({"user": user_key, "buckets": buckets, "rows": rows, "events": events,
+                           **self._static_ids(record)})
+            if len(buffer) >= self.users_per_shard:
+                self._commit_shard(state, buffer)
+                buffer = []
+        if buffer:
+            self._commit_shard(state, buffer)
+
+        state["done"] = True
+        _write_json(self.vocab_file, {k: v.tokens for k, v in self.vocabs.items()})
+        _write_json(self.state_file, state)
+        elapsed = time.perf_counter() - start
+        print(f"✅ LSTM dışa aktarımı tamamlandı: {state['users']} kullanıcı, {state['events']} olay, "
+              f"{len(state['shards'])} parça, {elapsed:.1f}s")
+        return state
+
+
+def load_npz_shard(path):
+    """Yields (user, buckets, risk_counts, static ids dict) per user from an npz shard."""
+    with np.load(path) as data:
+        offsets = data["seq_offsets"]
+        statics = {name: (data[f"{name}_offsets"], data[f"{name}_ids"]) for name in ("drug", "disease", "allergy")}
+        for i, user in enumerate(data["user"]):
+            lo, hi = offsets[i], offsets[i + 1]
+            ids = {name: ids_[off[i]:off[i + 1]] for name, (off, ids_) in statics.items()}
+            yield str(user), data["bucket"][lo:hi], data["risk_counts"][lo:hi], ids
+
+
+if __name__ == "__main__":
+    from user_store import open_store
+
+    parser = argparse.ArgumentParser(description="Kullanıcı analiz geçmişini LSTM eğitimi için dışa aktarır")
+    parser.add_argument("--output", default="data/lstm_export")
+    parser.add_argument("--data-dir", default=".")
+    parser.add_argument("--backend", choices=["json", "sqlite"], default=None)
+    parser.add_argument("--bucket-hours", type=float, default=24.0, help="Zaman kovası genişliği (saat)")
+    parser.add_argument("--users-per-shard", type=int, default=10000)
+    parser.add_argument("--format", choices=["auto", "npz", "parquet"], default="auto")
+    parser.add_argument("--full", action="store_true", help="Artımlı değil, tüm geçmişi yeniden aktar")
+    args = parser.parse_args()
+
+    store = open_store(args.data_dir, args.backend, write_behind=False)
+    try:
+        LSTMExporter(store, args.output, bucket_seconds=int(args.bucket_hours * 3600),
+                     users_per_shard=args.users_per_shard, fmt=args.format).run(full=args.full)
+    finally:
+        store.close()
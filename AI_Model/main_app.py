@@ -58,53 +58,7 @@ def process_queries(drug_queries, loader, llm, web_search, first_name="Misafir",
     # (Simplified for now)
     
     # --- INTERACTION ANALYSIS ---
-    all_interactions = []
-    
-    # 1. Drug-Drug Interactions
-    if len(detected_drugs) > 1:
-        for i in range(len(detected_drugs)):
-            for j in range(i + 1, len(detected_drugs)):
-                d1 = detected_drugs[i]
-                d2 = detected_drugs[j]
-                
-                d2_name = d2['product_name'].lower()
-                d2_salt = d2.get('salt_composition', '').lower()
-                
-                found_interaction = False
-                for inter in d1.get('drug_interactions', []):
-                    inter_drug = inter['drug'].lower()
-                    if inter_drug in d2_name or (d2_salt and inter_drug in d2_salt):
-                        all_interactions.append(f"⚠️  İLAÇ-İLAÇ ETKİLEŞİMİ: {d1['product_name']} + {d2['product_name']} -> {inter['effect']}")
-                        found_interaction = True
-                        break
-    
-    # 2. Drug-Food Interactions
-    for drug in detected_drugs:
-        d_name = drug['product_name']
-        d_food_inters = drug.get('food_interactions', [])
-        
-        # Check against detected foods
-        for food in detected_foods:
-            # Simple keyword match in warnings
-            for text in d_food_inters:
-                if food.lower() in text.lower():
-                     all_interactions.append(f"⚠️  İLAÇ-BESİN ETKİLEŞİMİ: {d_name} + {food} -> {text}")
-        
-        # Also always show general food warnings for the drug
-        if d_food_inters:
-             all_interactions.append(f"ℹ️  {d_name} için genel besin uyarıları: {'; '.join(d_food_inters)}")
-
-    # 3. Food-Food Interactions
-    if len(detected_foods) > 1:
-        for i in range(len(detected_foods)):
-            for j in range(i + 1, len(detected_foods)):
-                f1 = detected_foods[i]
-                f2 = detected_foods[j]
-                inters = loader.check_food_food_interaction(f1, f2)
-                for inter in inters:
-                    level = inter.get('interaction_level', 'Bilinmiyor')
-                    nutrient = inter.get('nutrient_name', 'Bilinmiyor')
-                    all_interactions.append(f"🍎 BESİN-BESİN ETKİLEŞİMİ ({level}): {f1} + {f2} -> {nutrient} değerlerinde farklılık/etkileşim.")
+    all_interactions = loader.find_interactions(detected_drugs, detected_foods)
 
     # Display Results
     print("\n" + "="*40)
@@ -178,7 +132,7 @@ def main():
     loader = DataLoader(".")
     loader.load_all_data()
     
-    ocr = OCREngine(use_gpu=args.use_gpu)
+    ocr = OCREngine(use_gpu=args.use_gpu, lazy=True)  # Models load only if --image is used
     llm = LLMInterface()
     web_search = WebSearcher()
     
@@ -188,7 +142,10 @@ def main():
     if args.image:
         print(f"Görüntü işleniyor: {args.image}")
         texts = ocr.extract_text(args.image)
-        drug_queries.extend(texts)
+        # Only names linked to the drug / food indexes are analyzed; raw lines if nothing links
+        entities = loader.link_entities(texts)
+        linked = [d["name"] for d in entities["drugs"]] + entities["foods"]
+        drug_queries.extend(linked or texts)
     
     if args.text:
         drug_queries.append(args.text)
@@ -6,10 +6,11 @@ import json
 import os
 from pathlib import Path
 
+from json_stream import iter_records, json_kind
+
 def merge_training_data():
     """Merge all training_data_part*.json files into one."""
     base_path = Path(__file__).parent
-    all_data = []
     
     # Find all part files
     # Find all relevant data files
@@ -25,57 +26,60 @@ def merge_training_data():
     
     print(f"📂 Found {len(files_to_process)} data files to merge.")
 
-    for file_path in files_to_process:
-        if file_path.name == "training_data_merged.json": continue # Skip self
-        
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                if isinstance(data, list):
-                    all_data.extend(data)
-                    print(f"✅ Loaded {len(data)} items from {file_path.name}")
-                else:
-                    print(f"⚠️ Skipped {file_path.name} (Not a list)")
-        except Exception as e:
-            print(f"❌ Error loading {file_path.name}: {e}")
-    
-    print(f"\n📊 Total training examples: {len(all_data)}")
-    
-    # Save merged file
     output_file = base_path / "training_data_merged.json"
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(all_data, f, ensure_ascii=False, indent=2)
-    print(f"💾 Saved merged data to {output_file.name}")
-    
-    # Create Ollama fine-tuning format (JSONL)
     ollama_file = base_path / "training_data_ollama.jsonl"
-    with open(ollama_file, 'w', encoding='utf-8') as f:
-        for item in all_data:
-            # Ollama format: {"prompt": "...", "completion": "..."}
-            entry = {
-                "prompt": f"<s>[INST] {item['prompt']} [/INST]",
-                "completion": f"{item['response']}</s>"
-            }
-            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
-    print(f"💾 Saved Ollama format to {ollama_file.name}")
-    
-    # Create conversation format for advanced fine-tuning
     conversation_file = base_path / "training_data_conversations.jsonl"
-    with open(conversation_file, 'w', encoding='utf-8') as f:
-        for item in all_data:
-            entry = {
-                "conversations": [
-                    {"role": "user", "content": item['prompt']},
-                    {"role": "assistant", "content": item['response']}
-                ]
-            }
-            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    # Items are streamed from each source straight into all three outputs,
+    # so no source (and not the merged list) is ever held in memory whole
+    total = 0
+    with open(output_file.with_suffix(".json.tmp"), 'w', encoding='utf-8') as merged, \
+         open(ollama_file, 'w', encoding='utf-8') as ollama, \
+         open(conversation_file, 'w', encoding='utf-8') as conversations:
+        merged.write("[")
+        for file_path in files_to_process:
+            if file_path.name == "training_data_merged.json": continue # Skip self
+            if json_kind(str(file_path)) != "array":
+                print(f"⚠️ Skipped {file_path.name} (Not a list)")
+                continue
+
+            count = 0
+            try:
+                for item in iter_records(str(file_path), progress=True):
+                    # Ollama format: {"prompt": "...", "completion": "..."}
+                    ollama_entry = {
+                        "prompt": f"<s>[INST] {item['prompt']} [/INST]",
+                        "completion": f"{item['response']}</s>"
+                    }
+                    # Conversation format for advanced fine-tuning
+                    conversation_entry = {
+                        "conversations": [
+                            {"role": "user", "content": item['prompt']},
+                            {"role": "assistant", "content": item['response']}
+                        ]
+                    }
+                    # Same layout as json.dump(all_data, f, indent=2)
+                    merged.write(("," if total else "") + "\n  " +
+                                 json.dumps(item, ensure_ascii=False, indent=2).replace("\n", "\n  "))
+                    ollama.write(json.dumps(ollama_entry, ensure_ascii=False) + "\n")
+                    conversations.write(json.dumps(conversation_entry, ensure_ascii=False) + "\n")
+                    count += 1
+                    total += 1
+                print(f"✅ Loaded {count} items from {file_path.name}")
+            except Exception as e:
+                print(f"❌ Error loading {file_path.name}: {e}")
+        merged.write("\n]" if total else "]")
+    os.replace(output_file.with_suffix(".json.tmp"), output_file)
+
+    print(f"\n📊 Total training examples: {total}")
+    print(f"💾 Saved merged data to {output_file.name}")
+    print(f"💾 Saved Ollama format to {ollama_file.name}")
     print(f"💾 Saved conversation format to {conversation_file.name}")
     
-    return all_data
+    return total
 
 if __name__ == "__main__":
-    data = merge_training_data()
+    merge_training_data()
     print(f"\n✅ Training data preparation complete!")
     print(f"📁 Files created:")
     print(f"   - training_data_merged.json (raw merged)")
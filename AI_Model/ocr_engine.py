@@ -1,13 +1,193 @@
 import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
 import cv2
 import numpy as np
 
+ANALYSIS_SIDE = 1024     # Layout analysis runs on a copy at most this large
+TARGET_TEXT_HEIGHT = 40  # Text line height (px) detection and recognition handle reliably
+MAX_SIDE = 2560          # EasyOCR's detector canvas; larger input is only shrunk again
+MAX_UPSCALE = 2.0
+ROI_MAX_FRACTION = 0.8   # Crop only when the label covers less of the image than this
+HASH_SIZE = 16           # dHash grid: 16 x 16 = 256 bits
+HASH_THRESHOLD = 20      # Max differing bits (~8%) for two photos to count as the same box
+LINE_HASH_ROWS = 8
+LINE_HASH_THRESHOLD = 0.04  # Max differing bit fraction per text line; one changed digit is ~0.06+
+
+def find_text_lines(gray):
+    """
+    Text line candidates as an (N, 4) array of x, y, w, h in gray's pixels.
+    Morphological gradient + Otsu marks strokes, a horizontal close joins
+    glyphs into lines; boxes that are too thin, too tall or too sparse are dropped.
+    """
+    height, width = gray.shape
+    f = min(1.0, ANALYSIS_SIDE / max(height, width))
+    small = cv2.resize(gray, None, fx=f, fy=f, interpolation=cv2.INTER_AREA) if f < 1 else gray
+    grad = cv2.morphologyEx(small, cv2.MORPH_GRADIENT, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3)))
+    _, strokes = cv2.threshold(grad, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    joined = cv2.morphologyEx(strokes, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (9, 1)))
+    # Components, not outer contours: a box edge would enclose all its text
+    _, _, stats, _ = cv2.connectedComponentsWithStats(joined)
+
+    lines = []
+    for x, y, w, h, area in stats[1:]:
+        if h < 6 or w < h / 2 or h > 0.6 * small.shape[0] or area < 0.4 * w * h:
+            continue
+        lines.append((x, y, w, h))
+    return np.array(lines, dtype=np.float64).reshape(-1, 4) / f
+
+def label_region(lines, shape):
+    """
+    Bounding box (x0, y0, x1, y1) of the densest group of text lines (the
+    medicine box label), or None when no crop would help.
+    """
+    if len(lines) < 2:
+        return None
+    height, width = shape
+    margin = np.median(lines[:, 3])
+    # Lines closer than ~2 line heights belong to the same label block
+    f = min(1.0, ANALYSIS_SIDE / max(height, width))
+    mask = np.zeros((int(height * f) + 1, int(width * f) + 1), dtype=np.uint8)
+    for x, y, w, h in (lines * f).astype(int):
+        mask[y:y + h + 1, x:x + w + 1] = 255
+    k = max(3, int(2 * margin * f) | 1)
+    _, labels, stats, _ = cv2.connectedComponentsWithStats(cv2.dilate(mask, np.ones((k, k), np.uint8)))
+    text_area = np.bincount(labels[mask > 0], minlength=len(stats))
+    text_area[0] = 0
+    x, y, w, h = stats[int(np.argmax(text_area)), :4] / f
+    if w * h >= ROI_MAX_FRACTION * width * height:
+        return None
+    return (max(0, int(x - margin)), max(0, int(y - margin)),
+            min(width, int(x + w + margin)), min(height, int(y + h + margin)))
+
+def dhash(gray, size=HASH_SIZE):
+    """Difference hash of a grayscale image as an int of size * size bits."""
+    small = cv2.resize(gray, (size + 1, size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+def _line_hash(crop, cols):
+    small = cv2.resize(crop, (cols + 1, LINE_HASH_ROWS), interpolation=cv2.INTER_AREA)
+    return small[:, 1:] > small[:, :-1]
+
+class ImageSignature:
+    """
+    Global dHash plus one dHash per text line. The global hash alone cannot
+    tell "Parol 500 mg" from "Parol 250 mg" (the digits are a few bits out of
+    256); per-line hashes are aligned to the text, so a changed digit stands
+    out while a re-taken photo of the same box stays close.
+    """
+
+    def __init__(self, gray):
+        self.hash = dhash(gray)
+        lines = sorted(find_text_lines(gray).tolist(), key=lambda b: (round(b[1] / max(b[3], 1)), b[0]))
+        self._crops = [gray[int(y):int(y + h), int(x):int(x + w)] for x, y, w, h in lines]
+        self.lines = []  # (aspect, cols, bits) per line in reading order
+        for crop in self._crops:
+            aspect = crop.shape[1] / max(crop.shape[0], 1)
+            cols = int(min(128, max(8, round(aspect * LINE_HASH_ROWS))))
+            self.lines.append((aspect, cols, _line_hash(crop, cols)))
+
+    def matches_lines(self, stored):
+        if len(self.lines) != len(stored.lines):
+            return False
+        for crop, (aspect, _, _), (stored_aspect, cols, bits) in zip(self._crops, self.lines, stored.lines):
+            if abs(aspect - stored_aspect) > 0.15 * stored_aspect:
+                return False
+            if np.mean(_line_hash(crop, cols) != bits) > LINE_HASH_THRESHOLD:
+                return False
+        return True
+
+    def stored(self):
+        """Copy without the line crops, for keeping in the cache."""
+        copy = object.__new__(ImageSignature)
+        copy.hash, copy.lines, copy._crops = self.hash, self.lines, None
+        return copy
+
+class PerceptualCache:
+    """
+    Bounded LRU from image signature to OCR text lines. A lookup tries the
+    stored images whose global hash is within `threshold` differing bits,
+    closest first, and hits the first whose text lines also match; so a
+    re-photographed box (slightly moved, different exposure) reuses the
+    earlier result but a different dosage of the same brand does not.
+    """
+
+    def __init__(self, size=256, threshold=HASH_THRESHOLD):
+        self.size = size
+        self.threshold = threshold
+        self._entries = OrderedDict()  # global hash -> (stored signature, texts)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, signature):
+        with self._lock:
+            candidates = []
+            for key, (stored, texts) in self._entries.items():
+                distance = bin(key ^ signature.hash).count("1")
+                if distance <= self.threshold:
+                    candidates.append((distance, key, stored, texts))
+            for _, key, stored, texts in sorted(candidates, key=lambda c: c[0]):
+                if signature.matches_lines(stored):
+                    self.hits += 1
+                    self._entries.move_to_end(key)
+                    return list(texts)
+            self.misses += 1
+            return None
+
+    def put(self, signature, texts):
+        with self._lock:
+            self._entries[signature.hash] = (signature.stored(), list(texts))
+            self._entries.move_to_end(signature.hash)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def info(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"entries": len(self._entries), "capacity": self.size, "hits": self.hits,
+                    "misses": self.misses, "hit_rate": round(self.hits / lookups, 3) if lookups else None}
+
 class OCREngine:
-    def __init__(self, use_gpu=False):
+    def __init__(self, use_gpu=False, lazy=False, adaptive=True, crop_roi=True,
+                 target_text_height=TARGET_TEXT_HEIGHT, cache_size=256, hash_threshold=HASH_THRESHOLD):
+        """
+        lazy=True defers loading the OCR models (hundreds of MB for EasyOCR)
+        until the first extract_text call, so processes that never see an
+        image never pay for them.
+        adaptive=True rescales each image so its text is target_text_height
+        pixels tall (phone photos shrink a lot) and, with crop_roi, crops to
+        the label region; adaptive=False keeps the old fixed 2x upscale.
+        cache_size > 0 keeps the text of recent images keyed by perceptual
+        hashes of the preprocessed image (see PerceptualCache).
+        """
         self.reader = None
         self.use_gpu = use_gpu
+        self.adaptive = adaptive
+        self.crop_roi = crop_roi
+        self.target_text_height = target_text_height
+        self.cache = PerceptualCache(cache_size, hash_threshold) if cache_size else None
         self.engine_type = "easyocr" # Default
-        self._initialize_engine()
+        self._loaded = False
+        self._load_lock = threading.Lock()
+        if not lazy:
+            self.ensure_loaded()
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def ensure_loaded(self):
+        """Loads the OCR engine once; concurrent first calls wait for the same load."""
+        if self._loaded:
+            return
+        with self._load_lock:
+            if not self._loaded:
+                self._initialize_engine()
+                self._loaded = True
 
     def _initialize_engine(self):
         """
@@ -31,72 +211,188 @@ class OCREngine:
                 print("❌ HATA: Hiçbir OCR kütüphanesi bulunamadı ve Mock motoru devre dışı bırakıldı.")
                 self.engine_type = "none"
 
-    def preprocess_image(self, image_path):
+    @staticmethod
+    def load_image(source):
+        """
+        Accepts a file path, encoded image bytes (bytes / bytearray / memoryview)
+        or an already decoded numpy array. Returns a BGR or grayscale array, or None.
+        """
+        if isinstance(source, np.ndarray):
+            return source
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            # np.frombuffer wraps the upload buffer without copying it
+            return cv2.imdecode(np.frombuffer(source, dtype=np.uint8), cv2.IMREAD_COLOR)
+        return cv2.imread(source)
+
+    def preprocess_image(self, source):
         """
         Uses OpenCV to preprocess the image for better OCR results.
+        source: path, encoded bytes or numpy array (see load_image).
         """
-        img = cv2.imread(image_path)
-        if img is None:
+        img = self.load_image(source)
+        if img is None or img.size == 0:
             return None
+        return self._preprocess_array(img)
 
+    def _preprocess_array(self, img):
         # 1. Convert to Grayscale
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-
-        # 2. Rescale if too small (upscaling helps OCR)
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
         height, width = gray.shape
-        if height < 500:
-            scale = 2
-            gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
 
-        # 3. Apply Gaussian Blur to reduce noise
-        blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+        if not self.adaptive:
+            # 2. Rescale if too small (upscaling helps OCR)
+            if height < 500:
+                gray = cv2.resize(gray, None, fx=2, fy=2, interpolation=cv2.INTER_CUBIC)
+            return gray
+
+        # 2. Crop to the label, so the detector doesn't scan background
+        lines = find_text_lines(gray)
+        region = label_region(lines, gray.shape) if self.crop_roi else None
+        if region is not None:
+            x0, y0, x1, y1 = region
+            gray = gray[y0:y1, x0:x1]
+            inside = (lines[:, 0] >= x0) & (lines[:, 1] >= y0) & \
+                     (lines[:, 0] + lines[:, 2] <= x1) & (lines[:, 1] + lines[:, 3] <= y1)
+            lines = lines[inside]
+
+        # 3. Rescale so text lines are ~target_text_height px tall
+        if len(lines):
+            scale = min(MAX_UPSCALE, self.target_text_height / np.median(lines[:, 3]))
+        else:
+            scale = 2.0 if gray.shape[0] < 500 else 1.0  # No text found: old rule
+        scale = min(scale, MAX_SIDE / max(gray.shape))
+        if abs(scale - 1.0) > 0.1:
+            interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_CUBIC
+            gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=interpolation)
 
-        # 4. Adaptive Thresholding (good for variable lighting)
-        # binary = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-        #                                cv2.THRESH_BINARY, 11, 2)
-        
         # Return the processed image (OCR Reader usually takes numpy array)
         return gray
-        
-        return img 
 
-    def extract_text(self, image_path):
+    def _prepare(self, image, timings):
+        """Decode + preprocess one input. Returns (gray image, None) or (None, error lines)."""
+        if isinstance(image, (str, os.PathLike)) and not os.path.exists(image):
+            return None, ["Hata: Resim dosyası bulunamadı."]
+        start = time.perf_counter()
+        img = self.load_image(image)
+        timings["decode"] = time.perf_counter() - start
+        if img is None or img.size == 0:
+            return None, ["Hata: Resim okunamadı."]
+        start = time.perf_counter()
+        gray = self._preprocess_array(img)
+        timings["preprocess"] = time.perf_counter() - start
+        return gray, None
+
+    def _easyocr_batch(self, grays, timings):
         """
-        Extracts text from an image file.
-        Returns: list of strings (detected text lines).
+        Detection for the whole batch in one forward pass, then recognition
+        per image (the same split reader.readtext_batched uses). Images are
+        padded with white to a common size instead of resized, so detected
+        boxes keep their coordinates.
         """
-        if not os.path.exists(image_path):
-            return ["Hata: Resim dosyası bulunamadı."]
+        start = time.perf_counter()
+        if len(grays) > 1 and hasattr(self.reader, "readtext_batched"):
+            height = max(g.shape[0] for g in grays)
+            width = max(g.shape[1] for g in grays)
+            stack = np.full((len(grays), height, width, 3), 255, dtype=np.uint8)
+            for i, g in enumerate(grays):
+                stack[i, :g.shape[0], :g.shape[1]] = g[:, :, None]
+            horizontal, free = self.reader.detect(stack, reformat=False)
+        else:
+            horizontal, free = [], []
+            for g in grays:
+                h, f = self.reader.detect(cv2.cvtColor(g, cv2.COLOR_GRAY2BGR), reformat=False)
+                horizontal.append(h[0])
+                free.append(f[0])
+        detect = (time.perf_counter() - start) / len(grays)
 
-        results = []
-        try:
-            # Preprocess (Read image using OpenCV)
-            processed_img = self.preprocess_image(image_path)
-            if processed_img is None:
-                return ["Hata: Resim okunamadı."]
+        texts = []
+        for i, g in enumerate(grays):
+            start = time.perf_counter()
+            detections = self.reader.recognize(g, horizontal[i], free[i], detail=0, reformat=False)
+            timings[i]["detect"] = detect
+            timings[i]["recognize"] = time.perf_counter() - start
+            # Filter short noise
+            texts.append([text for text in detections if len(text) > 2])
+        return texts
+
+    def extract_batch(self, images):
+        """
+        Runs several images through OCR together (batched detection with
+        EasyOCR). Returns one (text lines, stage timings in seconds) pair per
+        image; timings has decode / preprocess / hash / detect / recognize (a
+        batch's detection time is split evenly over its images; cache hits
+        have no detect / recognize).
+        """
+        self.ensure_loaded()
+        out = [None] * len(images)
+        timings = [{} for _ in images]
+        grays, positions, signatures = [], [], []
+        for i, image in enumerate(images):
+            gray, error = self._prepare(image, timings[i])
+            if error:
+                out[i] = error
+                continue
+            if self.engine_type == "none":
+                out[i] = ["Hata: OCR motoru başlatılamadı."]
+                continue
+            signature = None
+            if self.cache is not None:
+                start = time.perf_counter()
+                signature = ImageSignature(gray)
+                out[i] = self.cache.get(signature)
+                timings[i]["hash"] = time.perf_counter() - start
+                if out[i] is not None:
+                    continue  # Same box seen before: no detect / recognize
+            grays.append(gray)
+            positions.append(i)
+            signatures.append(signature)
+
+        if grays and self.engine_type == "easyocr":
+            for i, texts in zip(positions, self._easyocr_batch(grays, [timings[i] for i in positions])):
+                out[i] = texts
+        elif grays and self.engine_type == "pytesseract":
+            for i, gray in zip(positions, grays):
+                start = time.perf_counter()
+                # processed image is single-channel gray
+                text = self.pytesseract.image_to_string(self.pil_image.fromarray(gray), lang='tur+eng')
+                out[i] = [line.strip() for line in text.split('\n') if len(line.strip()) > 2]
+                timings[i]["recognize"] = time.perf_counter() - start  # Detection included
+        if self.cache is not None:
+            for i, signature in zip(positions, signatures):
+                if out[i]:
+                    self.cache.put(signature, out[i])
+        return list(zip(out, timings))
 
+    def cache_info(self):
+        return self.cache.info() if self.cache is not None else None
+
+    def extract_text_timed(self, image):
+        """extract_text plus the stage timings dict of extract_batch."""
+        label = image if isinstance(image, (str, os.PathLike)) else "<bellek>"
+        try:
             if self.engine_type == "easyocr":
-                print(f"📸 Resim taranıyor (OpenCV + EasyOCR): {image_path}")
-                # EasyOCR accepts numpy array (image) directly
-                detections = self.reader.readtext(processed_img, detail=0)
-                # Filter short noise
-                results = [text for text in detections if len(text) > 2]
-            
-            elif self.engine_type == "pytesseract":
-                # Convert back to PIL for pytesseract
-                img_pil = self.pil_image.fromarray(cv2.cvtColor(processed_img, cv2.COLOR_BGR2RGB))
-                text = self.pytesseract.image_to_string(img_pil, lang='tur+eng')
-                results = [line.strip() for line in text.split('\n') if len(line.strip()) > 2]
-            
-            elif self.engine_type == "none":
-                return ["Hata: OCR motoru başlatılamadı."]
-                
+                print(f"📸 Resim taranıyor (OpenCV + EasyOCR): {label}")
+            results, timings = self.extract_batch([image])[0]
         except Exception as e:
             print(f"❌ OCR Hatası: {e}")
-            return []
+            return [], {}
 
         print(f"🔍 OCR Sonuçları: {results}")
-        return results
+        return results, timings
+
+    def extract_text(self, image):
+        """
+        Extracts text from an image: a file path, encoded bytes (e.g. an upload
+        kept in memory) or a decoded numpy array.
+        Returns: list of strings (detected text lines).
+        """
+        return self.extract_text_timed(image)[0]
+
+    def submit(self, image):
+        """Future-returning form shared with OCRPool; runs synchronously here."""
+        future = Future()
+        future.set_result(self.extract_text_timed(image))
+        return future
 
 if __name__ == "__main__":
     ocr = OCREngine()
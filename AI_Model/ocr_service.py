@@ -0,0 +1,466 @@
+"""
+OCR as a shared, warm worker process.
+
+EasyOCR keeps its detection and recognition models (several hundred MB) in the
+process that created the Reader. Instead of every API worker loading its own
+copy, one long-running OCR process loads them once at startup and the API
+workers send it encoded images over a local socket
+(multiprocessing.connection, authenticated with a shared key). Messages are
+a JSON header plus raw image bytes; nothing received is unpickled.
+
+OCRPool runs OCR in worker processes (at most one per core) fed from a job
+queue. Each worker takes whatever is pending, up to batch_size images, and
+runs detection for them in one forward pass. Callers get a Future per image
+resolving to (text lines, stage timings). The OCR service can run on a pool
+too, so images from all API workers are batched together.
+
+Configuration (environment):
+  NUTRIMED_OCR_MODE      "lazy" (default): load in-process on the first image
+                         "eager": load in-process at startup (old behaviour)
+                         "pool": OCRPool inside this API process (Linux/macOS;
+                         on Windows run the pool in ocr_service.py instead)
+                         "remote": send images to the OCR process below
+  NUTRIMED_OCR_WORKERS   pool size (default and maximum: number of cores)
+  NUTRIMED_OCR_ADDRESS   host:port of the OCR process (default 127.0.0.1:7011)
+  NUTRIMED_OCR_AUTHKEY   shared key (default: generated into data/ocr_secret, mode 0600);
+                         set the same value on both sides when the service is on another host
+
+Usage:
+  python ocr_service.py [--port 7011] [--gpu] [--workers 4]
+  NUTRIMED_OCR_MODE=remote python api_server.py
+"""
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import queue
+import secrets
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing.connection import Client, Listener
+
+import numpy as np
+
+from ocr_engine import OCREngine
+
+DEFAULT_ADDRESS = "127.0.0.1:7011"
+SECRET_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "ocr_secret")
+MAX_MESSAGE_BYTES = 64 * 1024 * 1024  # Largest image (or header) accepted from a connection
+STAGES = ("queue", "decode", "preprocess", "hash", "detect", "recognize")
+
+
+def _address(text=None):
+    host, _, port = (text or os.environ.get("NUTRIMED_OCR_ADDRESS", DEFAULT_ADDRESS)).rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def _authkey(create=False):
+    """
+    Key from NUTRIMED_OCR_AUTHKEY, else from SECRET_FILE. The service creates the file
+    (mode 0600) on first start; clients only read it and refuse to start without a key.
+    """
+    key = os.environ.get("NUTRIMED_OCR_AUTHKEY")
+    if not key:
+        if create:
+            try:
+                os.makedirs(os.path.dirname(SECRET_FILE), exist_ok=True)
+                fd = os.open(SECRET_FILE, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+                with os.fdopen(fd, "w") as f:
+                    f.write(secrets.token_hex(32))
+            except FileExistsError:
+                pass
+        try:
+            with open(SECRET_FILE, "r") as f:
+                key = f.read().strip()
+        except FileNotFoundError:
+            key = None
+    if not key:
+        raise RuntimeError(f"OCR servis anahtarı yok: NUTRIMED_OCR_AUTHKEY ayarlayın ya da önce "
+                           f"ocr_service.py'yi başlatın ({SECRET_FILE} oluşturulur)")
+    return key.encode("utf-8")
+
+
+def _send(conn, message, payload=None):
+    """One JSON message, followed by the raw bytes of payload if given."""
+    conn.send_bytes(json.dumps(message).encode("utf-8"))
+    if payload is not None:
+        conn.send_bytes(payload)
+
+
+def _recv(conn):
+    return json.loads(conn.recv_bytes(MAX_MESSAGE_BYTES).decode("utf-8"))
+
+
+def _image_message(command, image):
+    """(header, payload) for encoded bytes or a uint8 ndarray (shape travels in the header)."""
+    if isinstance(image, np.ndarray):
+        if image.dtype != np.uint8:
+            raise TypeError(f"Desteklenmeyen görsel dizisi türü: {image.dtype}")
+        return {"command": command, "shape": list(image.shape)}, np.ascontiguousarray(image).tobytes()
+    return {"command": command}, image
+
+
+def _decode_image(header, payload):
+    if "shape" not in header:
+        return payload
+    shape = tuple(int(n) for n in header["shape"])
+    return np.frombuffer(payload, dtype=np.uint8).reshape(shape)
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB, or None where unsupported."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def _pool_worker(jobs, results, use_gpu, threads, batch_size, batch_wait, engine_options):
+    # Torch sizes its thread pool on first use: keep workers x threads <= cores
+    os.environ.setdefault("OMP_NUM_THREADS", str(threads))
+    engine = OCREngine(use_gpu=use_gpu, **engine_options)
+    results.put(("ready", os.getpid(), engine.engine_type))
+    stopping = False
+    while not stopping:
+        job = jobs.get()
+        if job is None:
+            break
+        batch = [job]
+        deadline = time.monotonic() + batch_wait
+        while len(batch) < batch_size:
+            try:
+                job = jobs.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if job is None:
+                stopping = True
+                break
+            batch.append(job)
+
+        started = time.time()
+        try:
+            outputs = engine.extract_batch([image for _, _, image in batch])
+        except Exception as e:
+            for job_id, _, _ in batch:
+                results.put(("error", job_id, str(e)))
+            continue
+        for (job_id, submitted, _), (texts, timings) in zip(batch, outputs):
+            timings["queue"] = max(0.0, started - submitted)
+            results.put(("done", job_id, texts, timings, len(batch), os.getpid(), engine.cache_info()))
+
+
+def _pool_context():
+    # spawn/forkserver children re-import __main__, and api_server.py does all
+    # of its setup at import time. fork is safe as long as this process has not
+    # loaded torch itself, which a pool owner never does.
+    if "fork" in multiprocessing.get_all_start_methods() and "torch" not in sys.modules:
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context("spawn")
+
+
+class OCRPool:
+    """Process pool for OCR; submit() returns a Future of (text lines, stage timings)."""
+
+    def __init__(self, workers=None, use_gpu=False, batch_size=4, batch_wait=0.01, engine_options=None):
+        """engine_options: extra OCREngine keyword arguments for every worker (e.g. cache_size=0)."""
+        cores = os.cpu_count() or 1
+        self.workers = max(1, min(int(workers or os.environ.get("NUTRIMED_OCR_WORKERS", cores)), cores))
+        self.use_gpu = use_gpu
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.engine_options = dict(engine_options or {})
+        self._ctx = _pool_context()
+        self._jobs = self._ctx.Queue()
+        self._results = self._ctx.Queue()
+        self._futures = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._stage_totals = dict.fromkeys(STAGES, 0.0)
+        self._completed = 0
+        self._batched = 0  # Sum of batch sizes over completed jobs
+        self._worker_caches = {}  # pid -> latest cache_info() of that worker
+        self.engine_type = None
+        self.loaded = True
+
+        start = time.perf_counter()
+        self._procs = [self._spawn() for _ in range(self.workers)]
+        ready = 0
+        while ready < self.workers:  # Warm: every worker has its model before the first job
+            try:
+                _, _, self.engine_type = self._results.get(timeout=1.0)
+                ready += 1
+            except queue.Empty:
+                if any(not p.is_alive() for p in self._procs):
+                    self.close()
+                    raise RuntimeError("OCR worker başlatılamadı")
+        self.load_seconds = time.perf_counter() - start
+        self._collector = threading.Thread(target=self._collect, daemon=True)
+        self._collector.start()
+        print(f"✅ OCR havuzu hazır: {self.workers} worker ({self.engine_type}, {self.load_seconds:.1f}s)")
+
+    def _spawn(self):
+        threads = max(1, (os.cpu_count() or 1) // self.workers)
+        proc = self._ctx.Process(target=_pool_worker, daemon=True,
+                                 args=(self._jobs, self._results, self.use_gpu, threads,
+                                       self.batch_size, self.batch_wait, self.engine_options))
+        proc.start()
+        return proc
+
+    def _collect(self):
+        while True:
+            try:
+                message = self._results.get(timeout=1.0)
+            except queue.Empty:
+                self._replace_dead_workers()
+                continue
+            if message is None:
+                return
+            kind, job_id = message[0], message[1]
+            if kind == "ready":
+                continue
+            with self._lock:
+                future = self._futures.pop(job_id, None)
+                if kind == "done":
+                    _, _, texts, timings, batch, pid, cache = message
+                    self._worker_caches[pid] = cache
+                    self._completed += 1
+                    self._batched += batch
+                    for stage, seconds in timings.items():
+                        self._stage_totals[stage] = self._stage_totals.get(stage, 0.0) + seconds
+            if future is None:
+                continue
+            if kind == "done":
+                future.set_result((texts, timings))
+            else:
+                future.set_exception(RuntimeError(message[2]))
+
+    def _replace_dead_workers(self):
+        if self._closed:
+            return
+        for i, proc in enumerate(self._procs):
+            if not proc.is_alive():
+                # Its in-flight jobs are lost; callers see their result() timeout
+                print(f"⚠️  OCR worker {proc.pid} durdu (çıkış kodu {proc.exitcode}), yeniden başlatılıyor.")
+                self._procs[i] = self._spawn()
+
+    def submit(self, image):
+        if self._closed:
+            raise RuntimeError("OCR havuzu kapatıldı")
+        if isinstance(image, (bytearray, memoryview)):
+            image = bytes(image)  # Must be picklable for the job queue
+        future = Future()
+        with self._lock:
+            job_id = next(self._ids)
+            self._futures[job_id] = future
+        self._jobs.put((job_id, time.time(), image))
+        return future
+
+    def extract_text_timed(self, image, timeout=None):
+        return self.submit(image).result(timeout)
+
+    def extract_text(self, image, timeout=None):
+        return self.submit(image).result(timeout)[0]
+
+    def stats(self):
+        """Completed jobs, mean batch size and mean milliseconds per stage."""
+        with self._lock:
+            n = self._completed
+            return {"workers": self.workers, "completed": n, "pending": len(self._futures),
+                    "mean_batch": round(self._batched / n, 2) if n else None,
+                    "stage_ms": {stage: round(total / n * 1000, 2) if n else None
+                                 for stage, total in self._stage_totals.items()}}
+
+    def cache_info(self):
+        """OCR result cache totals over all workers (each worker has its own cache)."""
+        with self._lock:
+            caches = [c for c in self._worker_caches.values() if c]
+        if not caches:
+            return None
+        hits = sum(c["hits"] for c in caches)
+        lookups = hits + sum(c["misses"] for c in caches)
+        return {"entries": sum(c["entries"] for c in caches), "capacity": sum(c["capacity"] for c in caches),
+                "hits": hits, "misses": lookups - hits, "hit_rate": round(hits / lookups, 3) if lookups else None}
+
+    def close(self):
+        self._closed = True
+        for _ in self._procs:
+            self._jobs.put(None)
+        for proc in self._procs:
+            proc.join(timeout=10)
+        self._results.put(None)
+        if getattr(self, "_collector", None) is not None:
+            self._collector.join(timeout=10)
+        with self._lock:
+            pending, self._futures = self._futures, {}
+        for future in pending.values():
+            future.set_exception(RuntimeError("OCR havuzu kapatıldı"))
+
+
+class OCRServer:
+    """Serves extract_text requests from one warm OCREngine or an OCRPool."""
+
+    def __init__(self, address=None, authkey=None, use_gpu=False, workers=0):
+        """workers > 0 serves from an OCRPool of that size, batching across clients."""
+        self.address = _address(address) if not isinstance(address, tuple) else address
+        self.authkey = authkey or _authkey(create=True)
+        start = time.perf_counter()
+        # Warm: models load before the first request
+        self.engine = OCRPool(workers, use_gpu) if workers else OCREngine(use_gpu=use_gpu)
+        self.load_seconds = time.perf_counter() - start
+        self.requests = 0
+        # A single in-process model serves one request at a time instead of
+        # several competing for the same cores; the pool queues by itself
+        self._engine_lock = threading.Lock() if not workers else None
+
+    def info(self):
+        info = {"engine_type": self.engine.engine_type, "pid": os.getpid(),
+                "load_seconds": round(self.load_seconds, 3), "rss_mb": peak_rss_mb(),
+                "requests": self.requests}
+        if isinstance(self.engine, OCRPool):
+            info["pool"] = self.engine.stats()
+        info["cache"] = self.engine.cache_info()
+        return info
+
+    def _extract(self, image):
+        self.requests += 1
+        if self._engine_lock is None:
+            return self.engine.extract_text_timed(image)
+        with self._engine_lock:
+            return self.engine.extract_text_timed(image)
+
+    def _handle(self, conn):
+        with conn:
+            while True:
+                try:
+                    header = _recv(conn)
+                    command = header.get("command")
+                    payload = conn.recv_bytes(MAX_MESSAGE_BYTES) if command in ("extract", "extract_timed") else None
+                except (EOFError, OSError, ValueError):  # Closed, oversized or not a JSON header
+                    return
+                try:
+                    if command == "extract":
+                        result = self._extract(_decode_image(header, payload))[0]
+                    elif command == "extract_timed":
+                        result = self._extract(_decode_image(header, payload))
+                    elif command == "info":
+                        result = self.info()
+                    else:
+                        raise ValueError(f"Bilinmeyen komut: {command}")
+                    _send(conn, {"status": "ok", "result": result})
+                except Exception as e:
+                    _send(conn, {"status": "error", "result": str(e)})
+
+    def serve_forever(self):
+        with Listener(self.address, authkey=self.authkey) as listener:
+            print(f"✅ OCR servisi hazır: {self.address[0]}:{self.address[1]} "
+                  f"({self.engine.engine_type}, {self.load_seconds:.1f}s)")
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:  # Failed handshake (wrong key) etc.
+                    print(f"⚠️  OCR bağlantısı reddedildi: {e}")
+                    continue
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+
+class RemoteOCREngine:
+    """Drop-in OCREngine replacement that forwards to an OCRServer."""
+
+    engine_type = "remote"
+    loaded = True
+
+    def __init__(self, address=None, authkey=None):
+        self.address = _address(address) if not isinstance(address, tuple) else address
+        self.authkey = authkey or _authkey()
+        self._local = threading.local()  # One connection per API thread
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = Client(self.address, authkey=self.authkey)
+        return conn
+
+    def _call(self, command, image=None):
+        header, payload = _image_message(command, image) if image is not None else ({"command": command}, None)
+        for attempt in (1, 2):
+            try:
+                conn = self._connection()
+                _send(conn, header, payload)
+                response = _recv(conn)
+                status, result = response["status"], response["result"]
+                break
+            except (EOFError, OSError):
+                # Service restarted since the last call: reconnect once
+                self._local.conn = None
+                if attempt == 2:
+                    raise
+        if status != "ok":
+            raise RuntimeError(result)
+        return result
+
+    def info(self):
+        return self._call("info")
+
+    def cache_info(self):
+        try:
+            return self.info().get("cache")
+        except (OSError, EOFError, RuntimeError):
+            return None
+
+    def extract_text_timed(self, image):
+        """Same contract as OCREngine.extract_text_timed (path, encoded bytes or ndarray)."""
+        if isinstance(image, (str, os.PathLike)):
+            if not os.path.exists(image):
+                return ["Hata: Resim dosyası bulunamadı."], {}
+            with open(image, "rb") as f:
+                image = f.read()
+        elif isinstance(image, (bytearray, memoryview)):
+            image = bytes(image)
+        elif not isinstance(image, (bytes, np.ndarray)):
+            raise TypeError(f"Desteklenmeyen görsel türü: {type(image).__name__}")
+        try:
+            return tuple(self._call("extract_timed", image))
+        except (ConnectionRefusedError, EOFError, OSError) as e:
+            print(f"❌ OCR servisine ulaşılamadı ({self.address[0]}:{self.address[1]}): {e}")
+            return ["Hata: OCR servisine ulaşılamadı."], {}
+
+    def extract_text(self, image):
+        return self.extract_text_timed(image)[0]
+
+    def submit(self, image):
+        """Future-returning form shared with OCRPool; blocks on the service here."""
+        future = Future()
+        future.set_result(self.extract_text_timed(image))
+        return future
+
+
+def open_ocr(use_gpu=False, mode=None):
+    """OCR engine for an API process, chosen by NUTRIMED_OCR_MODE (see module docstring)."""
+    mode = mode or os.environ.get("NUTRIMED_OCR_MODE", "lazy")
+    if mode == "remote":
+        return RemoteOCREngine()
+    if mode == "pool":
+        return OCRPool(use_gpu=use_gpu)
+    if mode not in ("lazy", "eager"):
+        raise ValueError(f"Bilinmeyen OCR modu: {mode}")
+    return OCREngine(use_gpu=use_gpu, lazy=(mode == "lazy"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Paylaşılan, modeli önceden yüklenmiş OCR servisi")
+    parser.add_argument("--host", default=None, help="Varsayılan: NUTRIMED_OCR_ADDRESS ya da 127.0.0.1")
+    parser.add_argument("--port", type=int, default=None)
+    parser.add_argument("--gpu", action="store_true", help="OCR için GPU kullan")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="OCR process havuzu boyutu (0: tek model, en fazla çekirdek sayısı)")
+    args = parser.parse_args()
+
+    host, port = _address()
+    OCRServer((args.host or host, args.port or port), use_gpu=args.gpu, workers=args.workers).serve_forever()
@@ -2,6 +2,9 @@ import json
 import os
 import glob
 
+from json_stream import iter_records, json_kind
+from severity import classify, severity_of
+
 def format_output(data):
     """
     Formats the drug data into the target Turkish output string,
@@ -23,16 +26,18 @@ def format_output(data):
                 # Parse the structure {"drug": [], "brand": [], "effect": []}
                 if "drug" in parsed_json and "effect" in parsed_json:
                     for i in range(len(parsed_json["drug"])):
+                        effect = parsed_json["effect"][i] if i < len(parsed_json["effect"]) else "Unknown"
                         parsed.append({
                             "drug": parsed_json["drug"][i],
-                            "effect": parsed_json["effect"][i] if i < len(parsed_json["effect"]) else "Unknown"
+                            "effect": effect,
+                            "severity": int(classify(effect))
                         })
             elif isinstance(interactions_raw, list):
                 parsed = interactions_raw
             
             for i in parsed:
-                effect = i.get('effect', '')
-                effect_tr = "CİDDİ" if effect == 'SERIOUS' else "ORTA" if effect == 'MODERATE' else "HAFİF"
+                # Same classes and labels as the LLM prompt (severity.py)
+                effect_tr = severity_of(i).label
                 interactions_list.append(f"{i.get('drug', '')} ({effect_tr} Risk)")
         except:
             pass
@@ -102,54 +107,59 @@ Bu ilacı kullanırken dikkat edilmesi gerekenler:
 """
     return response
 
-def process_file(filename, dataset):
+def process_file(filename, out):
+    """Streams the records of filename and writes one training example per line to out. Returns the count."""
     if not os.path.exists(filename):
         print(f"Skipping {filename} (not found)")
-        return
+        return 0
+    if json_kind(filename) not in ("array", "jsonl"):
+        print(f"Skipping {filename} (not a list)")
+        return 0
         
     print(f"Reading {filename}...")
+    count = 0
     try:
-        with open(filename, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        for entry in iter_records(filename, progress=True):
+            count += _write_example(entry, out)
     except Exception as e:
         print(f"❌ Error reading {filename}: {e}")
-        return
-        
-    count = 0
-    for entry in data:
-        # Detect Schema
-        drug_name = None
-        output_text = None
         
-        # Schema 1: Main Data (veri*.json, training_data*.json)
-        if "product_name" in entry:
-            drug_name = entry.get("product_name")
-            output_text = format_output(entry)
-            
-        # Schema 2: DB Interactions (db_drug_interactions.json)
-        elif "Generic Name" in entry:
-            drug_name = entry.get("Generic Name")
-            output_text = format_db_interactions(entry)
-            
-        # Schema 3: Drug Food (drug-food.json)
-        elif "food_interactions" in entry and "name" in entry:
-            drug_name = entry.get("name")
-            output_text = format_drug_food(entry)
-            
-        if not drug_name or not output_text: 
-            continue
+    print(f"Added {count} entries from {filename}")
+    return count
+
+def _write_example(entry, out):
+    """Writes the training example for one record, if its schema is known. Returns 1 or 0."""
+    # Detect Schema
+    drug_name = None
+    output_text = None
+    
+    # Schema 1: Main Data (veri*.json, training_data*.json)
+    if "product_name" in entry:
+        drug_name = entry.get("product_name")
+        output_text = format_output(entry)
         
-        # Create Training Example
-        training_example = {
-            "instruction": f"Şu ilaç hakkında bilgi ver: {drug_name}",
-            "input": "",
-            "output": output_text
-        }
+    # Schema 2: DB Interactions (db_drug_interactions.json)
+    elif "Generic Name" in entry:
+        drug_name = entry.get("Generic Name")
+        output_text = format_db_interactions(entry)
         
-        dataset.append(training_example)
-        count += 1
+    # Schema 3: Drug Food (drug-food.json)
+    elif "food_interactions" in entry and "name" in entry:
+        drug_name = entry.get("name")
+        output_text = format_drug_food(entry)
         
-    print(f"Added {count} entries from {filename}")
+    if not drug_name or not output_text: 
+        return 0
+    
+    # Create Training Example
+    training_example = {
+        "instruction": f"Şu ilaç hakkında bilgi ver: {drug_name}",
+        "input": "",
+        "output": output_text
+    }
+    
+    out.write(json.dumps(training_example, ensure_ascii=False) + "\n")
+    return 1
 
 def main():
     # 1. Merge all data first
@@ -168,19 +178,16 @@ def main():
     
     print(f"🎯 Processing {len(files)} files: {files}")
     
-    dataset = []
-    
-    for f in files:
-        process_file(f, dataset)
-        
     output_file = "finetune_dataset.jsonl"
-    print(f"Writing {len(dataset)} examples to {output_file}...")
+    print(f"Writing examples to {output_file}...")
     
-    with open(output_file, 'w', encoding='utf-8') as f:
-        for entry in dataset:
-            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    # Examples are written as they are produced; no file is held in memory whole
+    total = 0
+    with open(output_file, 'w', encoding='utf-8') as out:
+        for f in files:
+            total += process_file(f, out)
             
-    print("Done.")
+    print(f"Done. {total} examples.")
 
 if __name__ == "__main__":
     main()
@@ -1,38 +1,35 @@
-import json
+"""
+Quick keyword lookup over the data files, backed by the full-text index in
+search_index.py (the index is brought up to date before each search).
+"""
+
 import os
-import glob
 
-def search_json(keyword):
+from search_index import SearchIndex
+
+def search_json(keyword, limit=50):
     print(f"Searching for '{keyword}'...")
-    json_files = glob.glob("*.json")
-    found = False
-    for file in json_files:
-        try:
-            with open(file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                count = 0
-                if isinstance(data, list):
-                    for item in data:
-                        # Convert to string to search everything
-                        s = json.dumps(item).lower()
-                        if keyword.lower() in s:
-                            count += 1
-                            if count <= 2:
-                                print(f"Found in {file}: {str(item)[:100]}...")
-                elif isinstance(data, dict):
-                    s = json.dumps(data).lower()
-                    if keyword.lower() in s:
-                         count += 1
-                         print(f"Found in {file} (dict)")
-                
-                if count > 0:
-                    found = True
-                    print(f"Total {count} matches in {file}")
-        except Exception as e:
-            print(f"Could not read {file}: {e}")
-            
-    if not found:
+    index = SearchIndex()
+    try:
+        index.update(verbose=True)
+        # Every word of the keyword as a prefix, ranked by relevance
+        results = index.search(keyword, limit=limit, prefix=True)
+    finally:
+        index.close()
+
+    if not results:
         print("Not found in any JSON file.")
+        return results
+
+    counts = {}
+    for r in results:
+        file = os.path.basename(r["source"])
+        counts[file] = counts.get(file, 0) + 1
+        if counts[file] <= 2:
+            print(f"Found in {file}: {r['name'][:60]} | {r['snippet'][:100]}...")
+    for file, count in counts.items():
+        print(f"Total {count} matches in {file}")
+    return results
 
 if __name__ == "__main__":
     search_json("Delix")
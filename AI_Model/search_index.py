@@ -0,0 +1,277 @@
+"""
+Persistent full-text index (SQLite FTS5) over the data sources.
+
+Indexed sources (data/): veri*.json (or their .jsonl copies / .kb snapshots),
+drug-food.json, db_drug_interactions.json, enriched_drugs.json and the
+training_data*.json Q&A files. Every record is one row of the FTS5 table
+with three searchable columns:
+  name   product / drug / generic name, enriched alias or Q&A question
+  kind   drug, patient, food, generic, enriched or qa
+  body   every other value of the record, nested JSON strings included
+
+update() only re-indexes files whose mtime or size changed since the last
+run (and drops files that disappeared). Row ids are (source id << 32) + record
+number, so a changed file is deleted as one rowid range.
+
+Queries use FTS5 syntax: field-scoped (name:parol), prefix (parol*), phrases
+("greyfurt suyu"), AND / OR / NOT. Results are ranked with bm25, with name
+matches weighted above body matches. Dotless ı is indexed and searched as i,
+so "agri" finds "Ağrı".
+
+Usage:
+  python search_index.py delix
+  python search_index.py parol --field name --prefix --kind drug
+  python search_index.py --raw 'name:ramipril AND body:potasyum'
+  python search_index.py --rebuild
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+import sqlite3
+import time
+
+from json_stream import iter_items, iter_records, json_kind
+from kb_snapshot import read_snapshot
+
+DEFAULT_DB = "data/search_index.db"
+
+# (file name pattern, kind) in data/; the first matching pattern wins
+SOURCES = [
+    ("veri5.json", "patient"),
+    ("veri*.json", "drug"),
+    ("drug-food.json", "food"),
+    ("db_drug_interactions.json", "generic"),
+    ("enriched_drugs.json", "enriched"),
+    ("training_data*.json", "qa"),
+]
+FIELDS = ("name", "kind", "body")
+NAME_KEYS = ("product_name", "drug_name", "Generic Name", "Drug_Name", "name", "prompt", "instruction", "question")
+RANK_WEIGHTS = (10.0, 0.0, 1.0)  # bm25 weight of name, kind, body
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    kind TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    records INTEGER NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS docs USING fts5(
+    name, kind, body, title UNINDEXED,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+);
+"""
+
+
+def _searchable(text):
+    # unicode61 folds ş/ç/ğ/ö/ü and İ, but not the dotless ı
+    return text.replace("ı", "i")
+
+
+def _flatten(value, out):
+    """Appends every scalar in value to out; strings holding JSON (drug_interactions) are expanded."""
+    if isinstance(value, dict):
+        for item in value.values():
+            _flatten(item, out)
+    elif isinstance(value, list):
+        for item in value:
+            _flatten(item, out)
+    elif isinstance(value, str):
+        text = value.strip()
+        if text[:1] in "{[":
+            try:
+                _flatten(json.loads(text), out)
+                return
+            except ValueError:
+                pass
+        if text:
+            out.append(text)
+    elif value is not None:
+        out.append(str(value))
+
+
+def _document(record):
+    """(name, body) of one record."""
+    if isinstance(record, tuple):  # (key, value) of a top-level object, e.g. enriched alias -> generic
+        key, record = record
+        name, rest = key, record
+    elif isinstance(record, dict):
+        name_key = next((k for k in NAME_KEYS if isinstance(record.get(k), str) and record[k].strip()), None)
+        name = record[name_key] if name_key else ""
+        rest = {k: v for k, v in record.items() if k != name_key}
+    else:
+        name, rest = "", record
+    body = []
+    _flatten(rest, body)
+    return name.strip(), "\n".join(body)
+
+
+def build_query(text, fields=None, prefix=False, kind=None):
+    """
+    FTS5 query for plain text: every word must match (quoted, so punctuation is safe),
+    optionally as a prefix and only in the given fields.
+    """
+    terms = [f'"{term}"' + ("*" if prefix else "") for term in re.findall(r"\w+", _searchable(text))]
+    if not terms:
+        raise ValueError("Arama terimi boş")
+    query = " ".join(terms)
+    if fields:
+        query = "{%s} : (%s)" % (" ".join(fields), query)
+    if kind:
+        query = f'({query}) AND kind : "{kind}"'
+    return query
+
+
+class SearchIndex:
+    """Full-text index in an SQLite database next to the data files."""
+
+    def __init__(self, db_path=DEFAULT_DB, data_dir="data"):
+        self.db_path = db_path
+        self.data_dir = data_dir
+        self.conn = sqlite3.connect(db_path, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def discover(self):
+        """{path: kind} of the source files; a .jsonl copy or .kb snapshot stands in for its .json."""
+        found = {}
+        for pattern, kind in SOURCES:
+            for path in sorted(glob.glob(os.path.join(self.data_dir, pattern))):
+                stem = os.path.splitext(path)[0]
+                if os.path.isdir(stem + ".kb"):
+                    path = stem + ".kb"
+                elif os.path.exists(stem + ".jsonl"):
+                    path = stem + ".jsonl"
+                found.setdefault(path, kind)
+        for snapshot in glob.glob(os.path.join(self.data_dir, "veri*.kb")):  # Converted without a JSON file
+            found.setdefault(snapshot, "drug")
+        return found
+
+    @staticmethod
+    def _signature(path):
+        stat = os.stat(os.path.join(path, "meta.json") if os.path.isdir(path) else path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def update(self, force=False, verbose=False):
+        """
+        Re-indexes new and changed sources and drops deleted ones.
+        Returns {"indexed": [paths], "removed": [paths], "unchanged": count}.
+        """
+        sources = self.discover()
+        known = {path: (source_id, mtime_ns, size) for source_id, path, mtime_ns, size
+                 in self.conn.execute("SELECT id, path, mtime_ns, size FROM sources")}
+        result = {"indexed": [], "removed": [], "unchanged": 0}
+
+        for path in sorted(set(known) - set(sources)):
+            with self.conn:
+                self.conn.execute("BEGIN")
+                self._delete_source(known[path][0])
+                self.conn.execute("DELETE FROM sources WHERE id = ?", (known[path][0],))
+            result["removed"].append(path)
+
+        for path, kind in sources.items():
+            signature = self._signature(path)
+            if not force and path in known and known[path][1:] == signature:
+                result["unchanged"] += 1
+                continue
+            start = time.perf_counter()
+            records = self._index_source(path, kind, signature, known.get(path, (None,))[0])
+            result["indexed"].append(path)
+            if verbose:
+                print(f"📇 {path}: {records} kayıt ({time.perf_counter() - start:.1f}s)")
+        return result
+
+    def _delete_source(self, source_id):
+        self.conn.execute("DELETE FROM docs WHERE rowid BETWEEN ? AND ?", (source_id << 32, (source_id << 32) | 0xFFFFFFFF))
+
+    def _records(self, path):
+        if os.path.isdir(path):
+            for name, attributes, interactions in read_snapshot(path):
+                yield {"product_name": name, **attributes,
+                       "drug_interactions": [f"{i['drug']}: {i['effect']}" for i in interactions]}
+        elif json_kind(path) == "object":
+            yield from iter_items(path)
+        else:
+            yield from iter_records(path)
+
+    def _index_source(self, path, kind, signature, source_id):
+        """Replaces the rows of one source in a single transaction. Returns the record count."""
+        with self.conn:
+            self.conn.execute("BEGIN")
+            if source_id is None:
+                source_id = self.conn.execute(
+                    "INSERT INTO sources (path, kind, mtime_ns, size, records) VALUES (?, ?, 0, 0, 0)",
+                    (path, kind)).lastrowid
+            else:
+                self._delete_source(source_id)
+            base = source_id << 32
+
+            def rows():
+                for n, record in enumerate(self._records(path)):
+                    name, body = _document(record)
+                    yield base + n, _searchable(name), kind, _searchable(body), name
+
+            cursor = self.conn.executemany("INSERT INTO docs (rowid, name, kind, body, title) VALUES (?, ?, ?, ?, ?)", rows())
+            count = cursor.rowcount
+            self.conn.execute("UPDATE sources SET kind = ?, mtime_ns = ?, size = ?, records = ? WHERE id = ?",
+                              (kind, *signature, count, source_id))
+        return count
+
+    def search(self, query, limit=10, fields=None, prefix=False, kind=None, raw=False):
+        """
+        Ranked matches: [{"name", "kind", "source", "record", "score", "snippet"}].
+        query is plain text (see build_query) or, with raw=True, an FTS5 query.
+        """
+        match = _searchable(query) if raw else build_query(query, fields, prefix, kind)
+        rows = self.conn.execute(f"""
+            SELECT docs.rowid, title, docs.kind, sources.path, bm25(docs, {', '.join(map(str, RANK_WEIGHTS))}) AS score,
+                   snippet(docs, 2, '[', ']', '…', 12)
+            FROM docs JOIN sources ON sources.id = docs.rowid >> 32
+            WHERE docs MATCH ?
+            ORDER BY score
+            LIMIT ?""", (match, limit))
+        return [{"name": title, "kind": doc_kind, "source": path, "record": rowid & 0xFFFFFFFF,
+                 "score": round(-score, 3), "snippet": " ".join(snippet.split())}
+                for rowid, title, doc_kind, path, score, snippet in rows]
+
+    def stats(self):
+        return {path: records for path, records in self.conn.execute("SELECT path, records FROM sources ORDER BY path")}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Veri kaynaklarında indeksli tam metin arama (SQLite FTS5)")
+    parser.add_argument("query", nargs="?", help="Aranacak metin")
+    parser.add_argument("--field", action="append", choices=["name", "body"], help="Yalnızca bu alanda ara (tekrarlanabilir)")
+    parser.add_argument("--prefix", action="store_true", help="Önek araması (parol -> parol, parolex...)")
+    parser.add_argument("--kind", choices=sorted({kind for _, kind in SOURCES}), help="Yalnızca bu kayıt türü")
+    parser.add_argument("--raw", action="store_true", help="Sorguyu FTS5 sözdizimiyle olduğu gibi kullan")
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--rebuild", action="store_true", help="Tüm kaynakları yeniden indeksle")
+    parser.add_argument("--db", default=DEFAULT_DB)
+    parser.add_argument("--data-dir", default="data")
+    args = parser.parse_args()
+
+    index = SearchIndex(args.db, args.data_dir)
+    changes = index.update(force=args.rebuild, verbose=True)
+    if changes["indexed"] or changes["removed"]:
+        print(f"✅ İndeks güncellendi: {len(changes['indexed'])} kaynak indekslendi, "
+              f"{len(changes['removed'])} kaldırıldı, {changes['unchanged']} değişmedi.")
+    if args.query:
+        start = time.perf_counter()
+        try:
+            results = index.search(args.query, args.limit, args.field, args.prefix, args.kind, args.raw)
+        except (ValueError, sqlite3.OperationalError) as e:  # Empty query or invalid FTS5 syntax
+            parser.error(f"Geçersiz sorgu: {e}")
+        print(f"🔎 '{args.query}': {len(results)} sonuç ({(time.perf_counter() - start) * 1000:.1f} ms)")
+        for r in results:
+            print(f"  [{r['kind']}] {r['name'][:60]}  ({os.path.basename(r['source'])} #{r['record']}, skor {r['score']})")
+            print(f"      {r['snippet']}")
+    index.close()
@@ -0,0 +1,163 @@
+"""
+Password hashing and signed session tokens for UserManager.
+
+Stored password format (self-describing, so the cost can change over time):
+  scrypt$<n>$<r>$<p>$<salt b64>$<hash b64>
+  pbkdf2_sha256$<iterations>$<salt b64>$<hash b64>
+Anything else is a legacy plaintext password; it still verifies and is
+replaced by a hash on the next successful login.
+
+Configuration (environment):
+  NUTRIMED_PASSWORD_SCHEME      "scrypt" (default when available) or "pbkdf2_sha256"
+  NUTRIMED_SCRYPT_N             scrypt CPU/memory cost, power of two (default 16384)
+  NUTRIMED_PBKDF2_ITERATIONS    PBKDF2 iterations (default 600000)
+  NUTRIMED_SESSION_TTL          seconds a session token stays valid (default 900)
+  NUTRIMED_SESSION_SECRET       token signing key (default: generated into data/session_secret)
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import time
+
+SCRYPT_R = 8
+SCRYPT_P = 1
+SALT_BYTES = 16
+HASH_BYTES = 32
+
+
+def _b64(data):
+    return base64.b64encode(data).decode("ascii")
+
+
+def _unb64(text):
+    return base64.b64decode(text.encode("ascii"))
+
+
+class PasswordHasher:
+    """Hashes and verifies passwords at the configured work factor."""
+
+    def __init__(self, scheme=None, scrypt_n=None, pbkdf2_iterations=None):
+        default_scheme = "scrypt" if hasattr(hashlib, "scrypt") else "pbkdf2_sha256"
+        self.scheme = scheme or os.environ.get("NUTRIMED_PASSWORD_SCHEME", default_scheme)
+        if self.scheme not in ("scrypt", "pbkdf2_sha256"):
+            raise ValueError(f"Bilinmeyen parola şeması: {self.scheme}")
+        self.scrypt_n = int(scrypt_n or os.environ.get("NUTRIMED_SCRYPT_N", 16384))
+        self.pbkdf2_iterations = int(pbkdf2_iterations or os.environ.get("NUTRIMED_PBKDF2_ITERATIONS", 600000))
+
+    @staticmethod
+    def _scrypt(password, salt, n, r, p):
+        # maxmem must cover 128 * n * r bytes plus some headroom
+        return hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=r, p=p,
+                              maxmem=256 * n * r * p + (1 << 20), dklen=HASH_BYTES)
+
+    @staticmethod
+    def _pbkdf2(password, salt, iterations):
+        return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations, dklen=HASH_BYTES)
+
+    def hash(self, password):
+        salt = secrets.token_bytes(SALT_BYTES)
+        if self.scheme == "scrypt":
+            digest = self._scrypt(password, salt, self.scrypt_n, SCRYPT_R, SCRYPT_P)
+            return f"scrypt${self.scrypt_n}${SCRYPT_R}${SCRYPT_P}${_b64(salt)}${_b64(digest)}"
+        digest = self._pbkdf2(password, salt, self.pbkdf2_iterations)
+        return f"pbkdf2_sha256${self.pbkdf2_iterations}${_b64(salt)}${_b64(digest)}"
+
+    @staticmethod
+    def is_hashed(stored):
+        return isinstance(stored, str) and stored.startswith(("scrypt$", "pbkdf2_sha256$"))
+
+    def verify(self, stored, password):
+        """
+        Returns (ok, needs_rehash). needs_rehash is True for plaintext and for
+        hashes made with a different scheme or work factor than the current one.
+        """
+        if stored is None or password is None:
+            return False, False
+        if not self.is_hashed(stored):
+            # Legacy plaintext; constant-time compare all the same
+            return hmac.compare_digest(str(stored).encode("utf-8"), password.encode("utf-8")), True
+
+        parts = stored.split("$")
+        try:
+            if parts[0] == "scrypt":
+                n, r, p = int(parts[1]), int(parts[2]), int(parts[3])
+                expected = _unb64(parts[5])
+                digest = self._scrypt(password, _unb64(parts[4]), n, r, p)
+                current = self.scheme == "scrypt" and (n, r, p) == (self.scrypt_n, SCRYPT_R, SCRYPT_P)
+            else:
+                iterations = int(parts[1])
+                expected = _unb64(parts[3])
+                digest = self._pbkdf2(password, _unb64(parts[2]), iterations)
+                current = self.scheme == "pbkdf2_sha256" and iterations == self.pbkdf2_iterations
+        except (IndexError, ValueError):
+            return False, False
+        ok = hmac.compare_digest(digest, expected)
+        return ok, ok and not current
+
+
+class SessionTokens:
+    """
+    Signed, stateless session tokens: v1.<payload>.<signature>
+    payload = base64url(JSON {"u": user key, "v": profile version, "exp": unix time})
+    signature = base64url(HMAC-SHA256(secret, "v1." + payload))
+
+    Any worker holding the same secret can verify a token without a store
+    read; the profile version tells endpoints whether cached data is current.
+    """
+
+    PREFIX = "v1"
+
+    def __init__(self, secret, ttl=None):
+        self.secret = secret if isinstance(secret, bytes) else secret.encode("utf-8")
+        self.ttl = float(ttl or os.environ.get("NUTRIMED_SESSION_TTL", 900))
+
+    @classmethod
+    def from_env(cls, secret_file, ttl=None):
+        """
+        Secret from NUTRIMED_SESSION_SECRET, else from secret_file (created on
+        first use), so every worker process on this data directory agrees.
+        """
+        secret = os.environ.get("NUTRIMED_SESSION_SECRET")
+        if not secret:
+            try:
+                fd = os.open(secret_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+                with os.fdopen(fd, "w") as f:
+                    f.write(secrets.token_hex(32))
+            except FileExistsError:
+                pass
+            with open(secret_file, "r") as f:
+                secret = f.read().strip()
+        return cls(secret, ttl)
+
+    def _sign(self, signed_part):
+        digest = hmac.new(self.secret, signed_part.encode("utf-8"), hashlib.sha256).digest()
+        return base64.urlsafe_b64encode(digest).rstrip(b"=").decode("ascii")
+
+    def issue(self, user_key, version):
+        payload = json.dumps({"u": user_key, "v": version, "exp": int(time.time() + self.ttl)},
+                             separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        signed_part = f"{self.PREFIX}.{base64.urlsafe_b64encode(payload).rstrip(b'=').decode('ascii')}"
+        return f"{signed_part}.{self._sign(signed_part)}"
+
+    def verify(self, token):
+        """Returns (user key, profile version) of a valid, unexpired token, else None."""
+        if not token or not isinstance(token, str) or token.count(".") != 2:
+            return None
+        signed_part, signature = token.rsplit(".", 1)
+        # Constant time: the comparison never stops at the first differing byte
+        if not hmac.compare_digest(self._sign(signed_part).encode("ascii"), signature.encode("utf-8")):
+            return None
+        prefix, payload = signed_part.split(".")
+        if prefix != self.PREFIX:
+            return None
+        try:
+            data = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        except ValueError:
+            return None
+        if data.get("exp", 0) < time.time():
+            return None
+        return data["u"], data["v"]
@@ -0,0 +1,64 @@
+"""
+Severity classes of drug-drug interaction effects.
+
+Each interaction edge is classified once, when it is parsed (DataLoader._parse_interactions,
+prepare_dataset), and carries the result as a small int under "severity". The prompt
+builder and the training data formatter both read it, so their labels always agree:
+  SERIOUS  (3) "CİDDİ"  life-threatening / severe / contraindicated / serious / avoid
+  MODERATE (2) "ORTA"   monitor / risk / increase / decrease / moderate
+  MINOR    (1) "HAFİF"  anything else
+Effects already given as a code ("SERIOUS", "MODERATE", "MINOR") keep that class.
+"""
+
+from enum import IntEnum
+
+
+class Severity(IntEnum):
+    MINOR = 1
+    MODERATE = 2
+    SERIOUS = 3
+
+    @property
+    def label(self):
+        return LABELS[self]
+
+
+LABELS = {Severity.SERIOUS: "CİDDİ", Severity.MODERATE: "ORTA", Severity.MINOR: "HAFİF"}
+
+_SERIOUS_TERMS = ("life-threatening", "severe", "contraindicated", "serious", "avoid")
+_MODERATE_TERMS = ("monitor", "risk", "increase", "decrease", "moderate")
+
+
+def classify(effect):
+    """Severity of an interaction effect text."""
+    text = (effect or "").strip()
+    if text.upper() in Severity.__members__:
+        return Severity[text.upper()]
+    text = text.lower()
+    if any(term in text for term in _SERIOUS_TERMS):
+        return Severity.SERIOUS
+    if any(term in text for term in _MODERATE_TERMS):
+        return Severity.MODERATE
+    return Severity.MINOR
+
+
+def severity_of(interaction):
+    """Stored severity of an interaction edge; edges from other sources are classified on the fly."""
+    stored = interaction.get("severity")
+    return Severity(stored) if stored else classify(interaction.get("effect"))
+
+
+def most_severe(interactions, limit):
+    """
+    The `limit` most severe interactions, in data order within a class: one pass into
+    per-class buckets instead of a sort (same result as a stable sort by severity).
+    """
+    buckets = {severity: [] for severity in Severity}
+    for interaction in interactions:
+        buckets[severity_of(interaction)].append(interaction)
+    selected = []
+    for severity in sorted(Severity, reverse=True):
+        selected.extend(buckets[severity][:limit - len(selected)])
+        if len(selected) >= limit:
+            break
+    return selected
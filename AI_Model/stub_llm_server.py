@@ -0,0 +1,246 @@
+"""
+NutriMedAI Stub LLM Sunucusu
+============================
+Ollama ile uyumlu, modelsiz bir test sunucusu. GPU veya gerçek Ollama olmadan
+LLMInterface, api_server.py ve benchmark_accuracy.py'nin gecikme/verim
+ölçümlerini tekrarlanabilir şekilde yapabilmek için kullanılır.
+
+Desteklenen uç noktalar:
+  GET  /            -> "Ollama is running"
+  GET  /api/tags    -> yapılandırılan model listesi
+  POST /api/generate (stream: true/false)
+
+Kullanım:
+  python stub_llm_server.py --port 11435 --tokens-per-sec 40 --ttft-ms 300
+  NUTRIMED_LLM_URL=http://localhost:11435 python api_server.py
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_MODEL = "llama-3.1-8b-turkish-drug-finetuned"
+DEFAULT_RESPONSE = (
+    "### 💊 Genel Bilgi\n"
+    "Bu yanıt test sunucusu tarafından üretilmiştir. İlacınızı doktorunuzun "
+    "önerdiği şekilde kullanın ve yeni bir ilaca başlamadan önce etkileşimleri "
+    "kontrol edin. Dikkat: Alkol ile birlikte kullanmayınız."
+)
+
+_TOKEN_RE = re.compile(r"\S+\s*|\s+")
+
+
+class StubConfig:
+    """Runtime knobs of the stub server."""
+
+    def __init__(self, models=None, tokens_per_sec=50.0, ttft_ms=200.0,
+                 error_rate=0.0, error_status=500, responses=None,
+                 default_response=DEFAULT_RESPONSE, seed=42):
+        self.models = models or [DEFAULT_MODEL]
+        self.tokens_per_sec = tokens_per_sec
+        self.ttft_ms = ttft_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        # List of {"match": substring, "response": text}; first match wins
+        self.responses = responses or []
+        self.default_response = default_response
+        self.seed = seed
+
+    def pick_response(self, prompt, fmt=None):
+        prompt_lower = prompt.lower()
+        for item in self.responses:
+            if item.get("match", "").lower() in prompt_lower:
+                return item["response"]
+        if fmt == "json":
+            return json.dumps({"results": []})
+        return self.default_response
+
+    @staticmethod
+    def load_responses(path):
+        """Loads canned responses from a JSON file (list or {match: response} dict)."""
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            return [{"match": k, "response": v} for k, v in data.items()]
+        return data
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    server_version = "StubOllama/1.0"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, obj):
+        body = json.dumps(obj, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/":
+            body = b"Ollama is running"
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif self.path == "/api/tags":
+            models = [{"name": f"{m}:latest", "model": f"{m}:latest", "size": 0}
+                      for m in self.server.config.models]
+            self._send_json(200, {"models": models})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/api/generate":
+            self._send_json(404, {"error": "not found"})
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._send_json(400, {"error": "invalid JSON"})
+            return
+
+        cfg = self.server.config
+        model = payload.get("model", "")
+        if model.split(':')[0] not in cfg.models:
+            self._send_json(404, {"error": f"model '{model}' not found"})
+            return
+
+        if self.server.should_fail():
+            self._send_json(cfg.error_status, {"error": "injected failure"})
+            return
+
+        text = cfg.pick_response(payload.get("prompt", ""), payload.get("format"))
+        tokens = _TOKEN_RE.findall(text)
+        num_predict = payload.get("options", {}).get("num_predict")
+        if num_predict and num_predict > 0:
+            tokens = tokens[:num_predict]
+
+        start = time.perf_counter()
+        time.sleep(cfg.ttft_ms / 1000.0)
+        per_token = 1.0 / cfg.tokens_per_sec if cfg.tokens_per_sec > 0 else 0.0
+
+        if payload.get("stream", True):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.end_headers()
+            for i, tok in enumerate(tokens):
+                if i:
+                    time.sleep(per_token)
+                self._write_line(self._chunk(model, tok, False))
+            self._write_line(self._final(model, len(tokens), start))
+        else:
+            time.sleep(per_token * max(0, len(tokens) - 1))
+            obj = self._final(model, len(tokens), start)
+            obj["response"] = "".join(tokens)
+            self._send_json(200, obj)
+
+    def _write_line(self, obj):
+        self.wfile.write(json.dumps(obj, ensure_ascii=False).encode('utf-8') + b"\n")
+        self.wfile.flush()
+
+    @staticmethod
+    def _chunk(model, token, done):
+        return {
+            "model": model,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "response": token,
+            "done": done,
+        }
+
+    def _final(self, model, eval_count, start):
+        obj = self._chunk(model, "", True)
+        obj["done_reason"] = "stop"
+        obj["eval_count"] = eval_count
+        obj["total_duration"] = int((time.perf_counter() - start) * 1e9)
+        return obj
+
+
+class StubOllamaServer(ThreadingHTTPServer):
+    """
+    Threaded Ollama stand-in. Can be run from the CLI or embedded in a script:
+
+        server = StubOllamaServer(port=0).start()
+        llm = LLMInterface(host=server.url)
+        ...
+        server.stop()
+    """
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=11435, config=None, verbose=False):
+        super().__init__((host, port), _StubHandler)
+        self.config = config or StubConfig()
+        self.verbose = verbose
+        self._rng = random.Random(self.config.seed)
+        self._rng_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def should_fail(self):
+        if self.config.error_rate <= 0:
+            return False
+        with self._rng_lock:
+            return self._rng.random() < self.config.error_rate
+
+    def start(self):
+        """Serves in a background daemon thread and returns self."""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ollama uyumlu stub LLM sunucusu")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--model", action="append", help="Listelenecek model adı (tekrarlanabilir)")
+    parser.add_argument("--tokens-per-sec", type=float, default=50.0)
+    parser.add_argument("--ttft-ms", type=float, default=200.0, help="İlk token gecikmesi (ms)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Hata enjeksiyon oranı (0-1)")
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--responses", help="Hazır yanıtlar JSON dosyası")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    config = StubConfig(
+        models=args.model,
+        tokens_per_sec=args.tokens_per_sec,
+        ttft_ms=args.ttft_ms,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        responses=StubConfig.load_responses(args.responses) if args.responses else None,
+        seed=args.seed,
+    )
+    server = StubOllamaServer(args.host, args.port, config, verbose=args.verbose)
+    print(f"🧪 Stub LLM sunucusu çalışıyor: {server.url} (modeller: {config.models})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
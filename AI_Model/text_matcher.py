@@ -0,0 +1,186 @@
+"""
+Dictionary phrase matching for OCR text and chat messages.
+
+All phrases (drug names, aliases, foods) go into one Aho–Corasick automaton,
+so a text is scanned once no matter how many names are known. Text and
+phrases are folded the same way before matching:
+  - Turkish lowercasing (I -> ı, İ -> i) then ASCII folding (ş -> s, ı -> i, ...)
+  - punctuation and runs of whitespace -> one space
+  - ocr=True also folds common OCR confusions: 0 -> o and 1 / l / | / ! -> i
+Matches must start and end on word boundaries; overlapping matches are
+resolved leftmost-longest. Spans refer to the original (unfolded) text.
+With suffixes=TURKISH_SUFFIXES a match may also end inside a word when the
+rest of the word is a case/plural/possessive suffix ("aspirini", "parolu",
+"majeziği" via the softened stem). The span then covers the name only.
+
+pyahocorasick (pip install pyahocorasick) is used when installed; the pure
+Python automaton below gives the same results.
+"""
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+_TURKISH_UPPER = str.maketrans({"I": "ı", "İ": "i"})
+_ASCII_FOLD = {"ç": "c", "ğ": "g", "ı": "i", "ö": "o", "ş": "s", "ü": "u", "â": "a", "î": "i", "û": "u"}
+_OCR_FOLD = {"0": "o", "1": "i", "l": "i", "|": "i", "!": "i"}
+
+# Folded Turkish suffixes that may follow a name inside the same word
+TURKISH_SUFFIXES = frozenset(
+    "i u yi yu a e ya ye da de ta te dan den tan ten in un nin nun yla yle la le "
+    "im um yim yum imi umu yimi yumu si su yi sini sunu ler lar leri lari lerim larim "
+    "lerimi larimi ile yle yla dir dur".split()
+)
+_SOFTENED = {"k": "g", "p": "b", "t": "d"}  # Final consonant softening before a vowel suffix
+
+
+def _fold_table(ocr):
+    table = dict(_ASCII_FOLD)
+    if ocr:
+        table.update(_OCR_FOLD)
+    return table
+
+
+def fold(text, ocr=False):
+    """Folded form of text (see module docstring)."""
+    return fold_with_offsets(text, ocr)[0]
+
+
+def fold_with_offsets(text, ocr=False):
+    """
+    Returns (folded, offsets): offsets[i] is the index in text of folded[i],
+    plus one final entry for the end of the text.
+    """
+    table = _fold_table(ocr)
+    chars, offsets = [], []
+    pending_space = False
+    for i, ch in enumerate(text.translate(_TURKISH_UPPER)):
+        ch = table.get(ch, ch)
+        ch = ch.lower()
+        ch = table.get(ch, ch)
+        if len(ch) == 1 and ("a" <= ch <= "z" or "0" <= ch <= "9"):
+            if pending_space and chars:
+                chars.append(" ")
+                offsets.append(i - 1)
+            pending_space = False
+            chars.append(ch)
+            offsets.append(i)
+        else:
+            pending_space = True
+    offsets.append(len(text))
+    return "".join(chars), offsets
+
+
+class AhoCorasick:
+    """Multi-pattern string search; iter(text) yields (end index, value) for every occurrence."""
+
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        self._native = ahocorasick.Automaton() if ahocorasick is not None else None
+
+    def add(self, pattern, value):
+        if self._native is not None:
+            self._native.add_word(pattern, value)
+            return
+        node = 0
+        for ch in pattern:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append(value)
+
+    def build(self):
+        if self._native is not None:
+            self._native.make_automaton()
+            return
+        queue = list(self._goto[0].values())
+        for node in queue:  # Breadth first: a node's fail link is ready before its children
+            for ch, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+                queue.append(child)
+
+    def iter(self, text):
+        if self._native is not None:
+            if len(self._native):
+                yield from self._native.iter(text)
+            return
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for value in out[node]:
+                yield i, value
+
+
+class PhraseMatcher:
+    """Maps folded phrases to payloads and finds them on word boundaries."""
+
+    def __init__(self, ocr=False, min_length=3, suffixes=None):
+        self.ocr = ocr
+        self.min_length = min_length
+        self.suffixes = suffixes or frozenset()
+        self._payloads = {}  # folded phrase -> payload (first registration wins)
+        self._suffix_only = set()  # softened stems ("majezig"), valid only before a suffix
+        self._automaton = None
+
+    def __len__(self):
+        return len(self._payloads)
+
+    def add(self, phrase, payload, min_length=None):
+        folded = fold(phrase or "", self.ocr)
+        if len(folded) < (min_length or self.min_length) or folded in self._payloads:
+            return
+        self._payloads[folded] = payload
+        self._automaton = None
+        softened = self.suffixes and folded[-1] in _SOFTENED and not folded[-2].isdigit()
+        if softened and folded[:-1] + _SOFTENED[folded[-1]] not in self._payloads:
+            stem = folded[:-1] + _SOFTENED[folded[-1]]
+            self._payloads[stem] = payload
+            self._suffix_only.add(stem)
+
+    def build(self):
+        automaton = AhoCorasick()
+        for folded in self._payloads:
+            automaton.add(folded, folded)
+        automaton.build()
+        self._automaton = automaton
+
+    def find(self, text):
+        """Returns [(start, end, payload)] over the original text, leftmost-longest, non-overlapping."""
+        if self._automaton is None:
+            self.build()
+        folded, offsets = fold_with_offsets(text, self.ocr)
+        candidates = []
+        for end, phrase in self._automaton.iter(folded):
+            start = end - len(phrase) + 1
+            if start and folded[start - 1] != " ":
+                continue
+            word_end = folded.find(" ", end + 1)
+            word_end = len(folded) if word_end < 0 else word_end
+            if word_end == end + 1 and phrase not in self._suffix_only:
+                candidates.append((start, end + 1, phrase))
+            elif folded[end + 1:word_end] in self.suffixes:
+                candidates.append((start, end + 1, phrase))
+
+        matches, covered_until = [], 0
+        for start, end, phrase in sorted(candidates, key=lambda m: (m[0], m[0] - m[1])):
+            if start < covered_until:
+                continue
+            matches.append((offsets[start], offsets[end - 1] + 1, self._payloads[phrase]))
+            covered_until = end
+        return matches
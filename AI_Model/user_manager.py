@@ -1,24 +1,49 @@
+import argparse
 import json
 import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import datetime
+from lstm_export import LSTMExporter
+from security import PasswordHasher, SessionTokens
+from user_store import HISTORY_SEQ_KEY, open_store
 
 class UserManager:
-    def __init__(self, data_dir="."):
+    LOCK_STRIPES = 64
+
+    def __init__(self, data_dir=".", store=None, write_behind=True, backend=None, shared=None):
         self.history_file = os.path.join(data_dir, "data/user_history.json")
-        self.history = self._load_history()
+        # backend: "json" (write-behind journal) or "sqlite"; see user_store.py
+        # shared: several worker processes use the same data directory
+        self.store = store or open_store(data_dir, backend, write_behind, shared)
+        # Striped: users share a fixed set of locks instead of one lock per user ever seen
+        self._user_locks = [threading.Lock() for _ in range(self.LOCK_STRIPES)]
+        self.hasher = PasswordHasher()
+        self.sessions = SessionTokens.from_env(os.path.join(data_dir, "data/session_secret"))
+        # (user_key, version) -> (advice text, profile_complete); valid as long as the version is
+        self._advice_cache = OrderedDict()
+        self._advice_cache_lock = threading.Lock()
+
+    @contextmanager
+    def _locked(self, user_key):
+        """
+        Serializes read-modify-write sequences on one user: the user's lock stripe
+        for threads of this process, the store transaction for other processes.
+        Two users may share a stripe, so these blocks must never nest.
+        """
+        with self._user_locks[hash(user_key) % self.LOCK_STRIPES]:
+            with self.store.transaction():
+                yield
 
-    def _load_history(self):
-        if os.path.exists(self.history_file):
-            try:
-                with open(self.history_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except json.JSONDecodeError:
-                return {}
-        return {}
+    @property
+    def history(self):
+        """User records keyed by email (or "Name SURNAME" for legacy logs)."""
+        return self.store.users
 
-    def _save_history(self):
-        with open(self.history_file, 'w', encoding='utf-8') as f:
-            json.dump(self.history, f, ensure_ascii=False, indent=2)
+    def flush(self):
+        """Blocks until every pending change is durable on disk."""
+        self.store.flush()
 
     def log_interaction(self, name, surname, items, interaction_summary):
         """
@@ -29,33 +54,36 @@ class UserManager:
         interaction_summary: Text description of the result.
         """
         user_key = f"{name.strip().title()} {surname.strip().upper()}"
-        
-        if user_key not in self.history:
-            self.history[user_key] = {
-                "user_info": {"name": name, "surname": surname},
-                "history": []
-            }
-            
         entry = {
             "date": datetime.now().isoformat(),
             "items": items,
             "summary": interaction_summary
         }
-        
-        self.history[user_key]["history"].append(entry)
-        self._save_history()
+
+        with self._locked(user_key):
+            if user_key not in self.store:
+                self.store.put(user_key, {
+                    "user_info": {"name": name, "surname": surname},
+                    "history": []
+                })
+            self.store.push(user_key, "history", entry)
 
     def register_user(self, name, surname, email, password):
         """Registers a new user."""
         user_key = email.lower().strip() # Use email as unique key
-        if user_key in self.history:
+        password_hash = self.hasher.hash(password)  # Slow on purpose; done outside the lock
+        with self._locked(user_key):
+            return self._register_locked(user_key, name, surname, password_hash)
+
+    def _register_locked(self, user_key, name, surname, password_hash):
+        if user_key in self.store:
             return False, "Kullanıcı zaten kayıtlı."
             
-        self.history[user_key] = {
+        self.store.put(user_key, {
             "user_info": {
                 "name": name, 
                 "surname": surname,
-                "password": password # In real app, hash this!
+                "password": password_hash
             },
             "medications": [],
             "diseases": [],  # New field for chronic diseases
@@ -63,34 +91,68 @@ class UserManager:
             "history": [],
             "analysis_history": [],
             "profile_complete": False # Track if user completed health profile
-        }
-        self._save_history()
+        })
         return True, "Kayıt başarılı."
 
     def authenticate_user(self, email, password):
         """Validates user credentials."""
         user_key = email.lower().strip()
-        user_data = self.history.get(user_key)
+        user_data = self.store.get(user_key, include_history=False)
         
         if not user_data:
             return None, "Kullanıcı bulunamadı."
             
-        if user_data["user_info"].get("password") == password:
-            # Return profile without password - use deepcopy to avoid modifying original!
-            import copy
-            profile = copy.deepcopy(user_data)
-            if "password" in profile.get("user_info", {}):
-                del profile["user_info"]["password"]
+        user_info = user_data["user_info"]
+        ok, needs_rehash = self.hasher.verify(user_info.get("password"), password)
+        if ok:
+            if needs_rehash:
+                # Plaintext or outdated work factor: upgrade transparently
+                new_hash = self.hasher.hash(password)
+                with self._locked(user_key):
+                    self.store.set_fields(user_key, {"user_info": {**user_info, "password": new_hash}})
+            # Summary projection (no password, no history); history is paged via get_user_profile
+            profile = self._project(user_data)
+            profile["history_count"] = self.store.history_count(user_key)
             return profile, "Giriş başarılı."
             
         return None, "Hatalı şifre."
 
+    def start_session(self, email):
+        """Issues a signed session token (user key + current profile version)."""
+        user_key = email.lower().strip()
+        return self.sessions.issue(user_key, self.store.version(user_key))
+
+    def session_user(self, token):
+        """(user key, profile version) of a valid token, or None. No store read."""
+        return self.sessions.verify(token)
+
+    # Fields returned to clients; everything else (password, legacy "history", _version) stays private
+    PROFILE_FIELDS = ("medications", "diseases", "allergies", "profile_complete", "health_score")
+
+    def _project(self, user_data):
+        """Copies only the returned fields (replaces a deepcopy of the whole record)."""
+        profile = {"user_info": {k: v for k, v in user_data.get("user_info", {}).items() if k != "password"}}
+        for field in self.PROFILE_FIELDS:
+            if field in user_data:
+                value = user_data[field]
+                profile[field] = list(value) if isinstance(value, list) else value
+        return profile
+
+    # The score only looks at the newest 10 entries (5 for drug/disease)
+    SCORE_WINDOW = 10
+
+    @staticmethod
+    def _score_event(entry):
+        """The part of a history entry the score formula reads."""
+        return {"riskLevel": entry.get("riskLevel"), "warning": "⚠️" in entry.get("summary", "")}
+
     def calculate_health_score(self, history):
         """
         Calculates health score (0-100) based on weighted factors:
         - 50% Drug-Food Interaction Safety
         - 30% Chronic Disease Management (Proxy: 'Medium' risks)
         - 20% Nutritional Discipline (History Trend)
+        history: newest-first history entries or score window events.
         """
         if not history:
             return 0 # Start at 0, user needs to interact to build score
@@ -102,7 +164,7 @@ class UserManager:
         low_risk_count_recent = 0
         
         for h in recent_5:
-            if h.get('riskLevel') == 'high' or "⚠️" in h.get('summary', ''):
+            if h.get('riskLevel') == 'high' or h.get('warning') or "⚠️" in h.get('summary', ''):
                 drug_score -= 20
         drug_score = max(0, drug_score)
 
@@ -128,50 +190,73 @@ class UserManager:
         final_score = (drug_score * 0.50) + (disease_score * 0.30) + (discipline_score * 0.20)
         return int(final_score)
 
-    def get_user_profile(self, email):
-        """Returns the full user profile with dynamic health score."""
+    def get_user_profile(self, email, view="full", history_limit=None, before=None, since=None):
+        """
+        Returns the user profile with dynamic health score, or None.
+        view="summary": no history, only "history_count".
+        view="full": analysis_history as well; all of it unless history_limit,
+        before (cursor) or since (entry seq) is given, in which case one page
+        plus "history_cursor" (None on the last page) is returned.
+        Unless paging with before, "history_since" is the seq of the newest entry
+        (or the given since): pass it as since to fetch only newer entries later.
+        "version" changes whenever the stored user changes (usable as ETag).
+        """
         user_key = email.lower().strip()
-        data = self.history.get(user_key)
-        if data:
-            # Calculate dynamic score on fetch
-            score = self.calculate_health_score(data.get("analysis_history", []))
-            data["health_score"] = score
-        return data
+        # Read before the content: a concurrent change can only make the ETag
+        # older than the data (one extra refetch), never newer (a false 304)
+        version = self.store.version(user_key)
+        data = self.store.get(user_key, include_history=False)
+        if not data:
+            return None
+
+        profile = self._project(data)
+        profile["health_score"] = self._stored_health_score(user_key, data)
+        profile["version"] = version
+        profile["history_count"] = self.store.history_count(user_key)
+        if view == "summary":
+            return profile
+
+        if history_limit is None and before is None and since is None:
+            profile["analysis_history"] = list(self.store.get(user_key).get("analysis_history", []))
+        else:
+            page, cursor = self.store.history_page(user_key, history_limit or 20, before, since)
+            profile["analysis_history"] = page
+            profile["history_cursor"] = cursor
+        if before is None:
+            history = profile["analysis_history"]
+            profile["history_since"] = history[0].get(HISTORY_SEQ_KEY, 0) if history else since
+        return profile
+
+    def profile_version(self, email):
+        """Current change counter of a user (None if not registered)."""
+        return self.store.version(email.lower().strip())
 
     def add_active_medication(self, email, medication_name):
         """Adds a medication to the user's active list if not present."""
         user_key = email.lower().strip()
-        if user_key not in self.history:
-            return # Should not happen if logged in
-            
-        if "medications" not in self.history[user_key]:
-            self.history[user_key]["medications"] = []
-            
-        # Check defaults
-        # Strip and lower case for robust comparison
-        medication_clean = medication_name.strip().lower()
-        existing = [m["name"].strip().lower() for m in self.history[user_key]["medications"]]
-        
-        if medication_clean not in existing:
-            new_med = {
-                "id": str(datetime.now().timestamp()),
-                "name": medication_name.strip(), # Save clean version
-                "status": "active",
-                "startDate": datetime.now().strftime("%Y-%m-%d"),
-                "frequency": "Belirtilmedi"
-            }
-            self.history[user_key]["medications"].append(new_med)
-            self._save_history()
+        with self._locked(user_key):
+            user_data = self.store.get(user_key, include_history=False)
+            if user_data is None:
+                return # Should not happen if logged in
+
+            # Check defaults
+            # Strip and lower case for robust comparison
+            medication_clean = medication_name.strip().lower()
+            existing = [m["name"].strip().lower() for m in user_data.get("medications", [])]
+
+            if medication_clean not in existing:
+                new_med = {
+                    "id": str(datetime.now().timestamp()),
+                    "name": medication_name.strip(), # Save clean version
+                    "status": "active",
+                    "startDate": datetime.now().strftime("%Y-%m-%d"),
+                    "frequency": "Belirtilmedi"
+                }
+                self.store.push(user_key, "medications", new_med)
 
     def log_interaction_v2(self, email, query, risk_level, summary, full_reply):
         """Logs chat interaction to user history."""
         user_key = email.lower().strip()
-        if user_key not in self.history:
-            return
-
-        if "analysis_history" not in self.history[user_key]:
-            self.history[user_key]["analysis_history"] = []
-
         entry = {
             "id": int(datetime.now().timestamp()), # Use int timestamp as ID
             "date": datetime.now().strftime("%Y-%m-%d"),
@@ -182,23 +267,83 @@ class UserManager:
             "fullResponse": full_reply
         }
         
-        # Add to beginning
-        self.history[user_key]["analysis_history"].insert(0, entry)
-        self._save_history()
+        with self._locked(user_key):
+            user_data = self.store.get(user_key, include_history=False)
+            if user_data is None:
+                return
+            window = user_data.get("score_window")
+            if window is None:
+                window = self._rebuild_score_window(user_key)
+            # Add to beginning
+            self.store.push(user_key, "analysis_history", entry, front=True)
+            # Slide the window instead of re-reading the history
+            window = [self._score_event(entry)] + window[:self.SCORE_WINDOW - 1]
+            self.store.set_fields(user_key, {
+                "score_window": window,
+                "health_score": self.calculate_health_score(window),
+            })
+
+    def _rebuild_score_window(self, user_key):
+        recent, _ = self.store.history_page(user_key, self.SCORE_WINDOW)
+        return [self._score_event(h) for h in recent]
+
+    def _stored_health_score(self, user_key, user_data):
+        """
+        Score kept up to date by log_interaction_v2. Older records without one are
+        scored from their history on every read, without writing (a read must not
+        change the profile version); recompute_health_scores backfills them once.
+        """
+        if "score_window" in user_data:
+            return user_data.get("health_score", 0)
+        return self.calculate_health_score(self._rebuild_score_window(user_key))
+
+    def recompute_health_scores(self):
+        """
+        Rebuilds every user's score window and score from the stored history.
+        Run after changing the scoring formula. Returns the number of users updated.
+        """
+        updated = 0
+        for user_key in self.store.keys():
+            with self._locked(user_key):
+                user_data = self.store.get(user_key, include_history=False)
+                if user_data is None or ("score_window" not in user_data
+                                         and self.store.history_count(user_key) == 0):
+                    continue  # Nothing to score yet (e.g. legacy name-keyed logs)
+                window = self._rebuild_score_window(user_key)
+                self.store.set_fields(user_key, {
+                    "score_window": window,
+                    "health_score": self.calculate_health_score(window),
+                })
+            updated += 1
+        return updated
+
+    def get_analysis_history(self, email, limit=20, before=None, since=None):
+        """
+        Returns one page of analysis history, newest first: (entries, next_cursor).
+        Pass next_cursor back as `before` for the following page.
+        """
+        user_key = email.lower().strip()
+        return self.store.history_page(user_key, limit, before, since)
 
     def update_user_health_profile(self, email, diseases=None, allergies=None, medications=None):
         """Updates user's health profile with diseases, allergies, and marks profile as complete."""
         user_key = email.lower().strip()
-        if user_key not in self.history:
+        with self._locked(user_key):
+            return self._update_health_profile_locked(user_key, diseases, allergies, medications)
+
+    def _update_health_profile_locked(self, user_key, diseases, allergies, medications):
+        user_data = self.store.get(user_key, include_history=False)
+        if user_data is None:
             return False
             
+        fields = {"profile_complete": True}
         if diseases is not None:
-            self.history[user_key]["diseases"] = diseases
+            fields["diseases"] = diseases
         if allergies is not None:
-            self.history[user_key]["allergies"] = allergies
+            fields["allergies"] = allergies
         if medications is not None:
             # Add new medications without duplicates
-            existing = [m["name"].lower() for m in self.history[user_key].get("medications", [])]
+            existing = [m["name"].lower() for m in user_data.get("medications", [])]
             for med in medications:
                 if med.lower() not in existing:
                     new_med = {
@@ -208,24 +353,46 @@ class UserManager:
                         "startDate": datetime.now().strftime("%Y-%m-%d"),
                         "frequency": "Belirtilmedi"
                     }
-                    self.history[user_key]["medications"].append(new_med)
+                    self.store.push(user_key, "medications", new_med)
         
-        self.history[user_key]["profile_complete"] = True
-        self._save_history()
+        self.store.set_fields(user_key, fields)
         return True
 
-    def get_health_advice(self, email):
+    ADVICE_CACHE_SIZE = 1024
+
+    def get_health_advice(self, email, version=None):
         """Generates personalized health advice based on user's profile."""
+        return self.get_health_advice_status(email, version)[0]
+
+    def get_health_advice_status(self, email, version=None):
+        """
+        (advice, profile_complete) of a user, read from the same profile version.
+        version: profile version the caller knows to be current (from a session
+        token); when given, a cached answer for it is returned without a store read.
+        """
         user_key = email.lower().strip()
-        user_data = self.history.get(user_key)
+        if version is not None:
+            with self._advice_cache_lock:
+                cached = self._advice_cache.get((user_key, version))
+            if cached is not None:
+                return cached
+
+        version = self.store.version(user_key)  # Before the content, as in get_user_profile
+        user_data = self.store.get(user_key, include_history=False)
         
         if not user_data:
-            return "Kullanıcı bulunamadı."
-        
+            return "Kullanıcı bulunamadı.", False
+        result = (self._build_health_advice(user_key, user_data), user_data.get("profile_complete", False))
+        with self._advice_cache_lock:
+            self._advice_cache[(user_key, version)] = result
+            while len(self._advice_cache) > self.ADVICE_CACHE_SIZE:
+                self._advice_cache.popitem(last=False)
+        return result
+
+    def _build_health_advice(self, user_key, user_data):
         diseases = user_data.get("diseases", [])
         medications = user_data.get("medications", [])
         allergies = user_data.get("allergies", [])
-        analysis_history = user_data.get("analysis_history", [])
         
         advice_parts = []
         
@@ -276,7 +443,7 @@ class UserManager:
             advice_parts.append("")
         
         # Score section
-        score = self.calculate_health_score(analysis_history)
+        score = self._stored_health_score(user_key, user_data)
         advice_parts.append(f"### 📊 Sağlık Skorunuz: {score}/100")
         
         if score < 30:
@@ -300,13 +467,30 @@ class UserManager:
     def is_profile_complete(self, email):
         """Checks if user has completed their health profile."""
         user_key = email.lower().strip()
-        user_data = self.history.get(user_key, {})
+        user_data = self.store.get(user_key, {}, include_history=False)
         return user_data.get("profile_complete", False)
 
-    def export_for_lstm(self):
+    def export_for_lstm(self, output_dir=None, full=False, **options):
         """
-        Prepares data for future LSTM training.
-        Returns a flat list of sequences or events.
+        Prepares data for future LSTM training: streams every user's history
+        into time-bucketed sequence shards (see lstm_export.py).
+        Returns the exporter state (users, events, shard files).
         """
-        # Placeholder for future implementation
-        return self.history
+        output_dir = output_dir or os.path.join(os.path.dirname(self.history_file), "lstm_export")
+        return LSTMExporter(self.store, output_dir, **options).run(full=full)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Kullanıcı verisi bakım komutları")
+    parser.add_argument("--recompute-scores", action="store_true",
+                        help="Skor formülü değiştiğinde tüm kullanıcıların sağlık skorunu yeniden hesaplar")
+    parser.add_argument("--data-dir", default=".")
+    parser.add_argument("--backend", choices=["json", "sqlite"], default=None)
+    args = parser.parse_args()
+
+    if args.recompute_scores:
+        um = UserManager(args.data_dir, write_behind=False, backend=args.backend)
+        print(f"✅ {um.recompute_health_scores()} kullanıcının sağlık skoru yeniden hesaplandı.")
+        um.store.close()
+    else:
+        parser.print_help()
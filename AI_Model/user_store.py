@@ -0,0 +1,829 @@
+"""
+Persistence layer for UserManager.
+
+Two interchangeable backends implement the UserStore interface:
+  - JsonUserStore:   in-memory dict + write-behind journal + user_history.json snapshot
+  - SQLiteUserStore: SQLite (WAL) with indexed users / medications / analysis_history tables
+
+JsonUserStore keeps every user in memory and persists mutations write-behind:
+each change is appended as a small operation to a JSON Lines journal by a
+background thread (fsync'ed in batches), and the journal is periodically
+compacted into the user_history.json snapshot. On startup the snapshot is
+loaded and the journal replayed, so a crash loses at most the last unsynced
+batch instead of corrupting the whole file. With shared=True several
+processes may use the same files; see JsonUserStore.
+
+Concurrency: every mutation is atomic on its own. Sequences that read and
+then write (e.g. "add the medication unless it is already listed") go through
+store.transaction(): a file lock for shared JSON stores, BEGIN IMMEDIATE for
+SQLite. UserManager adds per-user locks on top for threads of one process.
+
+Journal operations (one JSON object per line, "seq" strictly increasing):
+  {"seq": 7, "op": "put",  "key": k, "value": {...}}                  replace record
+  {"seq": 8, "op": "set",  "key": k, "fields": {...}}                 update fields
+  {"seq": 9, "op": "push", "key": k, "field": f, "value": v, "front": true}
+"""
+
+import argparse
+import atexit
+import json
+import os
+import queue
+import sqlite3
+import threading
+from collections.abc import Mapping
+from contextlib import contextmanager
+
+SEQ_KEY = "__journal_seq__"  # Stored inside the snapshot, never exposed as a user
+HISTORY_SEQ_KEY = "seq"  # Sync cursor of an analysis_history entry (see history_page)
+VERSION_KEY = "_version"  # Per-user change counter (JSON records); bumped by every mutation
+
+
+class UserStore:
+    """
+    Interface shared by the storage backends.
+
+    Reads:     get(key, default=None, include_history=True), key in store, keys(),
+               history_page(key, limit, before=None, since=None), history_count(key),
+               version(key), history_seq(), users (read mapping)
+    Mutations: put(key, record), set_fields(key, fields), push(key, field, value, front=False)
+    Lifecycle: flush(), compact(), close()
+    Atomicity: transaction() groups a read-check-write sequence so that no
+               other thread or process interleaves with it
+    """
+
+    @contextmanager
+    def transaction(self):
+        yield self
+
+    def history_page(self, key, limit=20, before=None, since=None):
+        """
+        Returns (entries, next_cursor) from analysis_history, newest first.
+        before: cursor from a previous page; since: only entries with seq > since.
+        Every history entry carries "seq", unique and increasing per store, so an
+        entry logged in the same second as the last one a client saw is still new.
+        The default works on the in-memory record: a cursor is the number of
+        entries older than the next page, which stays valid as new entries are
+        prepended.
+        """
+        record = self.get(key)
+        if record is None:
+            return [], None
+        history = record.get("analysis_history", [])
+        n = len(history)
+        start = 0 if before is None else max(0, n - int(before))
+        page = history[start:start + limit]
+        if since is not None:
+            page = [h for h in page if h.get(HISTORY_SEQ_KEY, 0) > since]
+            # Newest first: once one entry is too old, the rest are as well
+            if len(page) < len(history[start:start + limit]):
+                return page, None
+        remaining = n - start - len(page)
+        return page, (remaining if remaining > 0 and len(page) == limit else None)
+
+    def history_count(self, key):
+        record = self.get(key)
+        return len(record.get("analysis_history", [])) if record else 0
+
+    def history_seq(self):
+        """Upper bound of every history seq so far: entries logged later get a larger one."""
+        raise NotImplementedError
+
+    def version(self, key):
+        """Change counter of one user (None if unknown); cheap enough for ETags."""
+        record = self.get(key, include_history=False)
+        return None if record is None else record.get(VERSION_KEY, 0)
+
+
+class _FileLock:
+    """
+    Exclusive inter-process lock on a side file (fcntl on POSIX, msvcrt on Windows).
+    Not re-entrant and not thread-aware; JsonUserStore wraps it in an RLock.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._fh = open(path, "a+b")
+
+    def acquire(self):
+        if os.name == "nt":
+            import msvcrt
+            self._fh.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(self._fh.fileno(), msvcrt.LK_LOCK, 1)
+                    return
+                except OSError:
+                    continue  # LK_LOCK gives up after ~10s; keep waiting
+        else:
+            import fcntl
+            fcntl.flock(self._fh.fileno(), fcntl.LOCK_EX)
+
+    def release(self):
+        if os.name == "nt":
+            import msvcrt
+            self._fh.seek(0)
+            msvcrt.locking(self._fh.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(self._fh.fileno(), fcntl.LOCK_UN)
+
+    def close(self):
+        self._fh.close()
+
+
+class JsonUserStore(UserStore):
+    """
+    shared=False: this process owns the files; mutations are journaled
+    write-behind by the background thread.
+
+    shared=True: several processes (e.g. gunicorn workers) use the same files.
+    Every read and mutation runs under an exclusive file lock; before touching
+    memory the store catches up on journal lines appended by other processes
+    (or reloads everything if another process compacted the snapshot), and
+    mutations are appended to the journal before the lock is released. Only
+    the fsync is deferred to the background thread.
+    """
+
+    def __init__(self, snapshot_file, journal_file=None, flush_interval=0.5,
+                 compact_every=1000, write_behind=True, shared=False):
+        self.snapshot_file = snapshot_file
+        self.journal_file = journal_file or self.journal_path(snapshot_file)
+        self.flush_interval = flush_interval
+        self.compact_every = compact_every
+        self.write_behind = write_behind
+        self.shared = shared
+
+        self._lock = threading.RLock()
+        self._io_lock = threading.Lock()
+        # In-process half of the cross-process lock (shared mode only)
+        self._xlock = threading.RLock()
+        self._xdepth = 0
+        self._file_lock = _FileLock(snapshot_file + ".lock") if shared else None
+        self._queue = queue.Queue()
+        self._seq = 0
+        self._ops_since_compact = 0
+        self._journal = None
+        self._journal_pos = 0  # Bytes of the journal already applied to self.users
+        self._snapshot_sig = None
+        self._unsynced = False
+        self._stopped = threading.Event()
+
+        self.users = {}
+        if self._file_lock is not None:
+            self._file_lock.acquire()
+        try:
+            replayed, torn = self._reload()
+            # In shared mode a non-empty journal is just other workers' recent writes
+            recovered = replayed and not self.shared
+            if recovered:
+                print(f"♻️  Kullanıcı günlüğünden {replayed} işlem geri yüklendi.")
+            self._journal = open(self.journal_file, "ab")
+            if recovered or torn:
+                # After recovery the snapshot holds everything, so the journal restarts empty
+                self._compact_locked()
+        finally:
+            if self._file_lock is not None:
+                self._file_lock.release()
+
+        self._writer = None
+        if self.write_behind or self.shared:
+            self._writer = threading.Thread(target=self._writer_loop, daemon=True, name="user-store-writer")
+            self._writer.start()
+        atexit.register(self.close)
+
+    @staticmethod
+    def journal_path(snapshot_file):
+        return os.path.splitext(snapshot_file)[0] + ".journal.jsonl"
+
+    @classmethod
+    def read_users(cls, snapshot_file, journal_file=None):
+        """
+        The users of a store (snapshot plus journal) without opening it: nothing is
+        written, compacted or locked, and a torn journal tail is only skipped.
+        """
+        reader = cls.__new__(cls)
+        reader.snapshot_file = snapshot_file
+        reader.journal_file = journal_file or cls.journal_path(snapshot_file)
+        reader._lock = threading.RLock()
+        reader.users = {}
+        reader._reload()
+        return reader.users
+
+    # ------------------------------------------------------------------
+    # Recovery / catch-up
+    # ------------------------------------------------------------------
+    def _snapshot_signature(self):
+        try:
+            st = os.stat(self.snapshot_file)
+        except FileNotFoundError:
+            return None
+        # os.replace gives the compacted snapshot a new inode
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _reload(self):
+        """
+        Loads the snapshot and replays the journal on top of it.
+        Returns (replayed ops, torn tail found). self.users keeps its identity.
+        """
+        users = {}
+        snapshot_seq = 0
+        if os.path.exists(self.snapshot_file):
+            try:
+                with open(self.snapshot_file, 'r', encoding='utf-8') as f:
+                    users = json.load(f)
+                snapshot_seq = users.pop(SEQ_KEY, 0)
+            except json.JSONDecodeError:
+                print(f"⚠️  {self.snapshot_file} okunamadı, boş geçmişle başlanıyor.")
+                users = {}
+        self._snapshot_sig = self._snapshot_signature()
+
+        with self._lock:
+            self._seq = snapshot_seq
+            replayed, self._journal_pos, torn = self._replay(users, 0, snapshot_seq)
+            self.users.clear()
+            self.users.update(users)
+        self._ops_since_compact = replayed
+        return replayed, torn
+
+    def _replay(self, users, pos, min_seq):
+        """Applies journal ops after byte offset pos. Returns (applied, new pos, torn)."""
+        applied = 0
+        torn = False
+        if not os.path.exists(self.journal_file):
+            return applied, 0, torn
+        with open(self.journal_file, 'rb') as f:
+            f.seek(pos)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    torn = True  # Torn write at the tail: everything after it is lost
+                    break
+                try:
+                    op = json.loads(line)
+                except json.JSONDecodeError:
+                    torn = True
+                    break
+                pos += len(line)
+                if op.get("seq", 0) <= min_seq:
+                    continue  # Already contained in the snapshot
+                self._apply(users, op)
+                self._seq = max(self._seq, op["seq"])
+                applied += 1
+        return applied, pos, torn
+
+    def _catch_up(self):
+        """Shared mode: applies what other processes wrote since our last look."""
+        if self._snapshot_signature() != self._snapshot_sig:
+            self._reload()  # Another process compacted
+            return
+        try:
+            size = os.path.getsize(self.journal_file)
+        except FileNotFoundError:
+            size = 0
+        if size < self._journal_pos:
+            self._reload()
+        elif size > self._journal_pos:
+            with self._lock:
+                applied, self._journal_pos, torn = self._replay(self.users, self._journal_pos, 0)
+            self._ops_since_compact += applied
+            if torn:
+                # A writer died mid-line; appending after it would corrupt our own ops
+                with self._io_lock:
+                    self._compact_locked()
+
+    @staticmethod
+    def _apply(users, op):
+        key = op["key"]
+        kind = op["op"]
+        # Derived from the op order, so replay and other processes agree on it
+        version = users.get(key, {}).get(VERSION_KEY, 0) + 1
+        if kind == "put":
+            users[key] = dict(op["value"])
+        elif kind == "set":
+            users.setdefault(key, {}).update(op["fields"])
+        elif kind == "push":
+            target = users.setdefault(key, {}).setdefault(op["field"], [])
+            value = op["value"]
+            if op["field"] == "analysis_history":
+                # The journal seq is unique and increasing, and replay assigns the same one
+                value = dict(value, **{HISTORY_SEQ_KEY: op["seq"]})
+            if op.get("front"):
+                target.insert(0, value)
+            else:
+                target.append(value)
+        users[key][VERSION_KEY] = version
+
+    @contextmanager
+    def transaction(self):
+        """
+        Groups reads and mutations into one atomic unit across processes
+        (shared mode). Re-entrant; a no-op for a single-process store.
+        """
+        if not self.shared:
+            yield self
+            return
+        with self._xlock:
+            self._xdepth += 1
+            try:
+                if self._xdepth == 1:
+                    self._file_lock.acquire()
+                    self._catch_up()
+                yield self
+            finally:
+                self._xdepth -= 1
+                if self._xdepth == 0:
+                    self._file_lock.release()
+
+    # ------------------------------------------------------------------
+    # Mapping-style reads
+    # ------------------------------------------------------------------
+    def get(self, key, default=None, include_history=True):
+        with self.transaction():
+            return self.users.get(key, default)
+
+    def __contains__(self, key):
+        with self.transaction():
+            return key in self.users
+
+    def keys(self):
+        with self.transaction():
+            return list(self.users.keys())
+
+    def history_seq(self):
+        with self.transaction():
+            return self._seq  # History seqs are journal seqs
+
+    # ------------------------------------------------------------------
+    # Mutations
+    # ------------------------------------------------------------------
+    def put(self, key, record):
+        self._mutate({"op": "put", "key": key, "value": record})
+
+    def set_fields(self, key, fields):
+        self._mutate({"op": "set", "key": key, "fields": fields})
+
+    def push(self, key, field, value, front=False):
+        self._mutate({"op": "push", "key": key, "field": field, "value": value, "front": front})
+
+    def _mutate(self, op):
+        if self.shared:
+            with self.transaction():
+                with self._lock:
+                    self._seq += 1
+                    op["seq"] = self._seq
+                    self._apply(self.users, op)
+                self._append_shared(json.dumps(op, ensure_ascii=False))
+            return
+
+        with self._lock:
+            self._seq += 1
+            op["seq"] = self._seq
+            self._apply(self.users, op)
+            # Enqueued under the lock so the journal order matches the seq order
+            self._queue.put(json.dumps(op, ensure_ascii=False))
+        if not self.write_behind:
+            self._drain()
+
+    def _append_shared(self, line):
+        # Called under the file lock, right after _catch_up: our position is the end of the journal
+        data = (line + "\n").encode("utf-8")
+        with self._io_lock:
+            self._journal.write(data)
+            self._journal.flush()
+            self._journal_pos += len(data)
+            self._unsynced = True
+            self._ops_since_compact += 1
+            if not self.write_behind:
+                os.fsync(self._journal.fileno())
+                self._unsynced = False
+            if self._ops_since_compact >= self.compact_every:
+                self._compact_locked()
+
+    # ------------------------------------------------------------------
+    # Background persistence
+    # Lock order is always _xlock -> file lock -> _io_lock -> _lock;
+    # mutators never hold _lock while waiting for _io_lock.
+    # ------------------------------------------------------------------
+    def _writer_loop(self):
+        # Group commit: everything queued during one interval shares one fsync
+        while not self._stopped.wait(self.flush_interval):
+            self._drain()
+
+    def _drain(self):
+        with self._io_lock:
+            if self.shared:
+                # Lines are already in the journal; only make them durable
+                if self._unsynced:
+                    os.fsync(self._journal.fileno())
+                    self._unsynced = False
+                return
+            batch = []
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return
+            self._journal.write(("\n".join(batch) + "\n").encode("utf-8"))
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+            self._ops_since_compact += len(batch)
+            if self._ops_since_compact >= self.compact_every:
+                self._compact_locked()
+
+    def flush(self):
+        """Writes every queued operation to the journal and fsyncs it."""
+        self._drain()
+
+    def compact(self):
+        """Folds the journal into the snapshot file."""
+        self._drain()
+        with self.transaction():
+            with self._io_lock:
+                self._compact_locked()
+
+    def _compact_locked(self):
+        # The snapshot covers every op up to its seq; ops still queued carry a
+        # higher seq or are skipped on replay, so nothing is applied twice.
+        self._write_snapshot()
+        # Truncate in place: other processes keep appending to the same file
+        self._journal.seek(0)
+        self._journal.truncate()
+        self._journal_pos = 0
+        self._unsynced = False
+        self._ops_since_compact = 0
+
+    def _write_snapshot(self):
+        with self._lock:
+            data = dict(self.users)
+            data[SEQ_KEY] = self._seq
+            text = json.dumps(data, ensure_ascii=False)
+        tmp_path = f"{self.snapshot_file}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_file)
+        self._snapshot_sig = self._snapshot_signature()
+
+    def close(self):
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        if self._writer is not None:
+            self._writer.join(timeout=self.flush_interval * 2)
+        self.compact()
+        self._journal.close()
+        if self._file_lock is not None:
+            self._file_lock.close()
+
+
+class _SQLiteUsersView(Mapping):
+    """Read-only mapping over SQLiteUserStore, so UserManager.history keeps working."""
+
+    def __init__(self, store):
+        self._store = store
+
+    def __getitem__(self, key):
+        record = self._store.get(key)
+        if record is None:
+            raise KeyError(key)
+        return record
+
+    def __contains__(self, key):
+        return key in self._store
+
+    def __iter__(self):
+        return iter(self._store.keys())
+
+    def __len__(self):
+        return self._store.count()
+
+
+class SQLiteUserStore(UserStore):
+    """
+    SQLite backend (WAL mode). Analysis history and medications are rows, so a
+    new chat entry is one INSERT instead of an O(n) list insert, and history
+    pages are read through the (user_email, seq) / (user_email, ts) indexes.
+    """
+
+    # Top-level record fields stored in dedicated columns; anything else goes to "extra"
+    _LIST_COLUMNS = ("diseases", "allergies")
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS users (
+        email TEXT PRIMARY KEY,  -- normalized user key; the PK is the email index
+        name TEXT,
+        surname TEXT,
+        password TEXT,
+        diseases TEXT NOT NULL DEFAULT '[]',
+        allergies TEXT NOT NULL DEFAULT '[]',
+        profile_complete INTEGER NOT NULL DEFAULT 0,
+        extra TEXT NOT NULL DEFAULT '{}',
+        version INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE TABLE IF NOT EXISTS medications (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_email TEXT NOT NULL REFERENCES users(email) ON DELETE CASCADE,
+        name TEXT NOT NULL,
+        data TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS analysis_history (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_email TEXT NOT NULL REFERENCES users(email) ON DELETE CASCADE,
+        ts INTEGER NOT NULL,
+        data TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_medications_user ON medications(user_email);
+    CREATE INDEX IF NOT EXISTS idx_history_user_seq ON analysis_history(user_email, seq);
+    CREATE INDEX IF NOT EXISTS idx_history_user_ts ON analysis_history(user_email, ts);
+    """
+
+    def __init__(self, db_path, busy_timeout_ms=10000):
+        self.db_path = db_path
+        self.busy_timeout_ms = busy_timeout_ms
+        self._local = threading.local()
+        conn = self._conn()
+        conn.executescript(self.SCHEMA)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(users)")}
+        if "version" not in columns:  # Databases created before the version column
+            conn.execute("ALTER TABLE users ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        self.users = _SQLiteUsersView(self)
+
+    def _conn(self):
+        """One connection per thread (sqlite3 connections are not thread-safe)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout_ms / 1000.0,
+                                   isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    def _write(self):
+        """Context manager for a write transaction (BEGIN IMMEDIATE takes the write lock up front)."""
+        return _Transaction(self._conn())
+
+    def transaction(self):
+        """
+        Holds the database write lock across several calls on this thread.
+        Other processes wait up to busy_timeout_ms; nested writes join it.
+        """
+        return _Transaction(self._conn())
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+    def get(self, key, default=None, include_history=True):
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT name, surname, password, diseases, allergies, profile_complete, extra "
+            "FROM users WHERE email = ?", (key,)).fetchone()
+        if row is None:
+            return default
+        name, surname, password, diseases, allergies, profile_complete, extra = row
+
+        user_info = {"name": name, "surname": surname}
+        if password is not None:
+            user_info["password"] = password
+        record = {
+            "user_info": user_info,
+            "medications": [json.loads(d) for (d,) in conn.execute(
+                "SELECT data FROM medications WHERE user_email = ? ORDER BY seq", (key,))],
+            "diseases": json.loads(diseases),
+            "allergies": json.loads(allergies),
+            "profile_complete": bool(profile_complete),
+        }
+        if include_history:
+            record["analysis_history"] = [dict(json.loads(d), **{HISTORY_SEQ_KEY: seq}) for seq, d in conn.execute(
+                "SELECT seq, data FROM analysis_history WHERE user_email = ? ORDER BY seq DESC", (key,))]
+        record.update(json.loads(extra))
+        return record
+
+    def __contains__(self, key):
+        return self._conn().execute("SELECT 1 FROM users WHERE email = ?", (key,)).fetchone() is not None
+
+    def keys(self):
+        return [k for (k,) in self._conn().execute("SELECT email FROM users ORDER BY email")]
+
+    def count(self):
+        return self._conn().execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def history_count(self, key):
+        return self._conn().execute(
+            "SELECT COUNT(*) FROM analysis_history WHERE user_email = ?", (key,)).fetchone()[0]
+
+    def version(self, key):
+        row = self._conn().execute("SELECT version FROM users WHERE email = ?", (key,)).fetchone()
+        return None if row is None else row[0]
+
+    def history_seq(self):
+        # AUTOINCREMENT never reuses a seq, so the counter covers deleted rows as well
+        row = self._conn().execute("SELECT seq FROM sqlite_sequence WHERE name = 'analysis_history'").fetchone()
+        return row[0] if row else 0
+
+    def history_page(self, key, limit=20, before=None, since=None):
+        """Cursor is the seq of the last returned row; entries carry their row seq."""
+        sql = "SELECT seq, data FROM analysis_history WHERE user_email = ?"
+        params = [key]
+        if before is not None:
+            sql += " AND seq < ?"
+            params.append(int(before))
+        if since is not None:
+            sql += " AND seq > ?"
+            params.append(since)
+        sql += " ORDER BY seq DESC LIMIT ?"
+        params.append(limit + 1)
+        rows = self._conn().execute(sql, params).fetchall()
+        page = [dict(json.loads(d), **{HISTORY_SEQ_KEY: seq}) for seq, d in rows[:limit]]
+        next_cursor = rows[limit - 1][0] if len(rows) > limit else None
+        return page, next_cursor
+
+    # ------------------------------------------------------------------
+    # Mutations
+    # ------------------------------------------------------------------
+    def put(self, key, record):
+        with self._write() as conn:
+            row = conn.execute("SELECT version FROM users WHERE email = ?", (key,)).fetchone()
+            conn.execute("DELETE FROM users WHERE email = ?", (key,))
+            self._insert_record(conn, key, record, version=(row[0] if row else 0) + 1)
+
+    def _insert_record(self, conn, key, record, version=None):
+        record = dict(record)
+        stored_version = record.pop(VERSION_KEY, 0)
+        user_info = record.pop("user_info", {}) or {}
+        medications = record.pop("medications", [])
+        history = record.pop("analysis_history", [])
+        conn.execute(
+            "INSERT INTO users (email, name, surname, password, diseases, allergies, profile_complete, extra, version) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, user_info.get("name"), user_info.get("surname"), user_info.get("password"),
+             json.dumps(record.pop("diseases", []), ensure_ascii=False),
+             json.dumps(record.pop("allergies", []), ensure_ascii=False),
+             int(bool(record.pop("profile_complete", False))),
+             json.dumps(record, ensure_ascii=False),
+             stored_version if version is None else version))
+        self._insert_medications(conn, key, medications)
+        # Stored newest first in JSON; insert oldest first so seq grows with time
+        self._insert_history(conn, key, list(reversed(history)))
+
+    @staticmethod
+    def _insert_medications(conn, key, medications):
+        conn.executemany(
+            "INSERT INTO medications (user_email, name, data) VALUES (?, ?, ?)",
+            [(key, m.get("name", "") if isinstance(m, dict) else str(m), json.dumps(m, ensure_ascii=False))
+             for m in medications])
+
+    @staticmethod
+    def _insert_history(conn, key, entries):
+        conn.executemany(
+            "INSERT INTO analysis_history (user_email, ts, data) VALUES (?, ?, ?)",
+            [(key, int(e.get("id", 0) or 0), json.dumps(e, ensure_ascii=False)) for e in entries])
+
+    def _touch_user(self, conn, key):
+        """Creates the user row if needed and bumps its version."""
+        conn.execute("INSERT OR IGNORE INTO users (email) VALUES (?)", (key,))
+        conn.execute("UPDATE users SET version = version + 1 WHERE email = ?", (key,))
+
+    def set_fields(self, key, fields):
+        with self._write() as conn:
+            self._touch_user(conn, key)
+            extra_updates = {}
+            for field, value in fields.items():
+                if field == "user_info":
+                    conn.execute("UPDATE users SET name = ?, surname = ?, password = ? WHERE email = ?",
+                                 (value.get("name"), value.get("surname"), value.get("password"), key))
+                elif field in self._LIST_COLUMNS:
+                    conn.execute(f"UPDATE users SET {field} = ? WHERE email = ?",
+                                 (json.dumps(value, ensure_ascii=False), key))
+                elif field == "profile_complete":
+                    conn.execute("UPDATE users SET profile_complete = ? WHERE email = ?", (int(bool(value)), key))
+                elif field == "medications":
+                    conn.execute("DELETE FROM medications WHERE user_email = ?", (key,))
+                    self._insert_medications(conn, key, value)
+                elif field == "analysis_history":
+                    conn.execute("DELETE FROM analysis_history WHERE user_email = ?", (key,))
+                    self._insert_history(conn, key, list(reversed(value)))
+                else:
+                    extra_updates[field] = value
+            if extra_updates:
+                self._update_extra(conn, key, lambda extra: extra.update(extra_updates))
+
+    def push(self, key, field, value, front=False):
+        with self._write() as conn:
+            self._touch_user(conn, key)
+            if field == "analysis_history":
+                # History is always read newest first, so "front" is implied by seq order
+                self._insert_history(conn, key, [value])
+            elif field == "medications":
+                self._insert_medications(conn, key, [value])
+            else:
+                def add(extra):
+                    target = extra.setdefault(field, [])
+                    if front:
+                        target.insert(0, value)
+                    else:
+                        target.append(value)
+                self._update_extra(conn, key, add)
+
+    @staticmethod
+    def _update_extra(conn, key, fn):
+        (extra,) = conn.execute("SELECT extra FROM users WHERE email = ?", (key,)).fetchone()
+        extra = json.loads(extra)
+        fn(extra)
+        conn.execute("UPDATE users SET extra = ? WHERE email = ?", (json.dumps(extra, ensure_ascii=False), key))
+
+    # ------------------------------------------------------------------
+    # Migration & lifecycle
+    # ------------------------------------------------------------------
+    def migrate_from_json(self, json_path):
+        """
+        One-shot import of user_history.json (plus any pending journal), read only:
+        the JSON files are left exactly as they are. Runs only while the database
+        has no users. Returns the number imported.
+        """
+        if not os.path.exists(json_path) or self.count() > 0:
+            return 0
+        users = JsonUserStore.read_users(json_path)
+        with self._write() as conn:
+            for key, record in users.items():
+                self._insert_record(conn, key, record)
+            # Row seqs replace the journal seqs; start new rows above every cursor a client may hold
+            last_seq = max((h.get(HISTORY_SEQ_KEY, 0) for record in users.values()
+                            for h in record.get("analysis_history", [])), default=0)
+            conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'analysis_history'", (last_seq,))
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('migrated_from', ?)",
+                         (os.path.abspath(json_path),))
+        print(f"📦 {len(users)} kullanıcı {json_path} dosyasından SQLite'a taşındı.")
+        return len(users)
+
+    def flush(self):
+        pass  # Every mutation is committed in its own transaction
+
+    def compact(self):
+        self._conn().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class _Transaction:
+    def __init__(self, conn):
+        self.conn = conn
+        self.outer = False
+
+    def __enter__(self):
+        # Only the outermost block begins and ends the transaction
+        self.outer = not self.conn.in_transaction
+        if self.outer:
+            self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.outer:
+            self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+def open_store(data_dir=".", backend=None, write_behind=True, shared=None):
+    """
+    Creates the configured backend. backend: "json" (default) or "sqlite";
+    falls back to the NUTRIMED_USER_BACKEND environment variable.
+    The SQLite database is seeded from user_history.json on first use.
+    shared: JSON only; set when several processes serve the same data
+    directory (default: NUTRIMED_USER_STORE_SHARED=1). SQLite always is.
+    """
+    backend = (backend or os.environ.get("NUTRIMED_USER_BACKEND") or "json").lower()
+    json_path = os.path.join(data_dir, "data/user_history.json")
+    if backend == "sqlite":
+        store = SQLiteUserStore(os.path.join(data_dir, "data/users.db"))
+        store.migrate_from_json(json_path)
+        return store
+    if backend != "json":
+        raise ValueError(f"Bilinmeyen kullanıcı deposu: {backend}")
+    if shared is None:
+        shared = os.environ.get("NUTRIMED_USER_STORE_SHARED", "0") == "1"
+    return JsonUserStore(json_path, write_behind=write_behind, shared=shared)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Kullanıcı geçmişini JSON'dan SQLite'a taşır")
+    parser.add_argument("--json", default="data/user_history.json")
+    parser.add_argument("--db", default="data/users.db")
+    args = parser.parse_args()
+
+    store = SQLiteUserStore(args.db)
+    imported = store.migrate_from_json(args.json)
+    if not imported:
+        print("Taşınacak kayıt yok (veritabanı dolu veya JSON dosyası bulunamadı).")
+    store.close()
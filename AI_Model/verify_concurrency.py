@@ -0,0 +1,109 @@
+"""
+Eşzamanlılık stres testi: çok sayıda thread ve process aynı veri klasörüne
+log_interaction_v2 / add_active_medication çağrısı yapar, ardından hiçbir
+kaydın kaybolmadığı ve ilaçların çoğalmadığı kontrol edilir.
+
+Kullanım:
+  python verify_concurrency.py                       # json (shared) + sqlite
+  python verify_concurrency.py --backend sqlite --processes 8 --threads 16 --calls 100
+"""
+
+import argparse
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.getcwd())
+
+from user_manager import UserManager
+
+MEDICATIONS = ["Aspirin", "Parol", "Coraspin"]
+
+
+def user_email(i):
+    return f"stress_{i}@example.com"
+
+
+def worker(data_dir, backend, proc_id, threads, calls, users):
+    um = UserManager(data_dir, backend=backend, shared=True)
+
+    def run(thread_id):
+        for i in range(calls):
+            email = user_email((thread_id + i) % users)
+            um.log_interaction_v2(email, f"p{proc_id}-t{thread_id}-{i}", "low", "ok", "")
+            # Every thread races to add the same medications
+            um.add_active_medication(email, MEDICATIONS[i % len(MEDICATIONS)])
+
+    pool = [threading.Thread(target=run, args=(t,)) for t in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    um.store.close()
+
+
+def run_stress(backend, processes, threads, calls, users):
+    data_dir = tempfile.mkdtemp(prefix=f"nutrimed_stress_{backend}_")
+    os.makedirs(os.path.join(data_dir, "data"))
+    try:
+        um = UserManager(data_dir, backend=backend, shared=True)
+        for u in range(users):
+            um.register_user("Stres", "Test", user_email(u), "x")
+        um.store.close()
+
+        start = time.perf_counter()
+        ctx = multiprocessing.get_context("spawn")
+        procs = [ctx.Process(target=worker, args=(data_dir, backend, p, threads, calls, users))
+                 for p in range(processes)]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+        elapsed = time.perf_counter() - start
+        failed = [p.exitcode for p in procs if p.exitcode != 0]
+
+        # Fresh instance: sees only what actually reached the disk
+        um = UserManager(data_dir, backend=backend, shared=True)
+        expected = {f"p{p}-t{t}-{i}" for p in range(processes) for t in range(threads) for i in range(calls)}
+        found = []
+        duplicate_meds = 0
+        for u in range(users):
+            record = um.store.get(user_email(u))
+            found.extend(h["query"] for h in record.get("analysis_history", []))
+            names = [m["name"] for m in record.get("medications", [])]
+            duplicate_meds += len(names) - len(set(names))
+        um.store.close()
+
+        lost = len(expected - set(found))
+        doubled = len(found) - len(set(found))
+        total = processes * threads * calls
+        ok = not failed and lost == 0 and doubled == 0 and duplicate_meds == 0
+        print(f"{'✅' if ok else '❌'} {backend}: {processes} process x {threads} thread x {calls} çağrı "
+              f"= {total} kayıt, {elapsed:.1f}s ({total * 2 / elapsed:.0f} işlem/s)")
+        print(f"   kayıp: {lost} | çift: {doubled} | tekrarlanan ilaç: {duplicate_meds}"
+              + (f" | hatalı process çıkış kodları: {failed}" if failed else ""))
+        return ok
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="UserManager eşzamanlılık stres testi")
+    parser.add_argument("--backend", choices=["json", "sqlite", "all"], default="all")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--calls", type=int, default=100, help="Thread başına çağrı sayısı")
+    parser.add_argument("--users", type=int, default=5)
+    args = parser.parse_args()
+
+    backends = ["json", "sqlite"] if args.backend == "all" else [args.backend]
+    results = [run_stress(b, args.processes, args.threads, args.calls, args.users) for b in backends]
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+LSTM dışa aktarımı artımlı çalıştırma testi: ilk aktarımdan sonra eklenen
+kayıtlar (aynı saniyede eklenenler dahil) bir sonraki artımlı aktarımda
+yalnızca bir kez yer almalı, değişiklik yoksa aktarım boş kalmalı.
+
+Kullanım:
+  python verify_lstm_export.py                 # json + sqlite
+  python verify_lstm_export.py --backend sqlite
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.append(os.getcwd())
+
+from lstm_export import LSTMExporter
+from user_manager import UserManager
+
+EMAIL = "lstm_test@example.com"
+
+
+def run_check(backend):
+    data_dir = tempfile.mkdtemp(prefix=f"nutrimed_lstm_{backend}_")
+    os.makedirs(os.path.join(data_dir, "data"))
+    output_dir = os.path.join(data_dir, "data", "lstm_export")
+    try:
+        um = UserManager(data_dir, backend=backend, write_behind=False)
+        um.register_user("Lstm", "Test", EMAIL, "x")
+        um.log_interaction_v2(EMAIL, "ilk", "low", "ok", "")
+
+        first = LSTMExporter(um.store, output_dir, fmt="npz").run()
+        um.log_interaction_v2(EMAIL, "ikinci", "high", "riskli", "")
+        um.log_interaction_v2(EMAIL, "üçüncü", "medium", "dikkat", "")
+        second = LSTMExporter(um.store, output_dir, fmt="npz").run()
+        third = LSTMExporter(um.store, output_dir, fmt="npz").run()
+        full = LSTMExporter(um.store, output_dir, fmt="npz").run(full=True)
+        um.store.close()
+
+        results = [("ilk aktarım", first["events"], 1), ("artımlı (2 yeni kayıt)", second["events"], 2),
+                   ("artımlı (değişiklik yok)", third["events"], 0), ("tam aktarım", full["events"], 3)]
+        ok = all(found == expected for _, found, expected in results)
+        print(f"{'✅' if ok else '❌'} {backend}: "
+              + " | ".join(f"{name}: {found}/{expected} olay" for name, found, expected in results))
+        return ok
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LSTM artımlı dışa aktarım testi")
+    parser.add_argument("--backend", choices=["json", "sqlite", "all"], default="all")
+    args = parser.parse_args()
+
+    backends = ["json", "sqlite"] if args.backend == "all" else [args.backend]
+    results = [run_check(b) for b in backends]
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -17,7 +17,7 @@ import {
   Image as ImageIcon,
 } from "lucide-react";
 import { Avatar, AvatarFallback } from "./ui/avatar";
-import { useUser } from "../context/UserContext";
+import { useUser, authHeaders, saveSessionToken } from "../context/UserContext";
 
 interface AIAssistantProps {
   onBack: () => void;
@@ -129,8 +129,6 @@ export function AIAssistant({ onBack }: AIAssistantProps) {
 
     try {
       // Connect to NutriMedAI Python API
-      const userEmail = localStorage.getItem("nutrimedai_user_email");
-
       let response;
 
       // If image is selected, use image analysis endpoint
@@ -139,10 +137,10 @@ export function AIAssistant({ onBack }: AIAssistantProps) {
           method: "POST",
           headers: {
             "Content-Type": "application/json",
+            ...authHeaders(),
           },
           body: JSON.stringify({
             image: currentImage, // Base64 encoded image
-            email: userEmail
           }),
         });
       } else {
@@ -151,15 +149,21 @@ export function AIAssistant({ onBack }: AIAssistantProps) {
           method: "POST",
           headers: {
             "Content-Type": "application/json",
+            ...authHeaders(),
           },
           body: JSON.stringify({
             message: currentInput,
-            email: userEmail
           }),
         });
       }
 
       const data = await response.json();
+      saveSessionToken(response);
+
+      // Expired session: the API answers 401 with an "error" message
+      if (response.status === 401) {
+        throw new Error(data.error);
+      }
 
       // Check for error response
       if (!data.success && data.message) {
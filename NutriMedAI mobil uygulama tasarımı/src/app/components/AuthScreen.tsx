@@ -38,7 +38,7 @@ export function AuthScreen({ onLogin }: AuthScreenProps) {
 
         if (data.success) {
           // Sync with context immediately
-          await login(email);
+          await login(email, data.token);
           // Save to local storage for persistence
           localStorage.setItem("nutrimedai_user_email", email);
           onLogin(email); // Parent handles navigation
@@ -1,5 +1,21 @@
 import { createContext, useContext, useState, useEffect, ReactNode } from "react";
 
+const SESSION_TOKEN_KEY = "nutrimedai_session_token";
+
+// The API identifies the user by the signed token from /api/login, not by the email
+export function authHeaders(): Record<string, string> {
+  const token = localStorage.getItem(SESSION_TOKEN_KEY);
+  return token ? { Authorization: `Bearer ${token}` } : {};
+}
+
+// Authenticated responses carry a refreshed token (later expiry, current profile version)
+export function saveSessionToken(res: Response) {
+  const token = res.headers.get("X-Session-Token");
+  if (token) {
+    localStorage.setItem(SESSION_TOKEN_KEY, token);
+  }
+}
+
 export interface Medication {
   id: string;
   name: string;
@@ -54,7 +70,7 @@ interface UserContextType {
   updateMedication: (id: string, medication: Partial<Medication>) => void;
   removeMedication: (id: string) => void;
   addAnalysis: (analysis: Omit<Analysis, "id">) => void;
-  login: (email: string) => Promise<void>;
+  login: (email: string, token?: string) => Promise<void>;
   clearProfile: () => void;
 }
 
@@ -105,17 +121,25 @@ export function UserProvider({ children }: { children: ReactNode }) {
     localStorage.setItem("nutrimedai_user_profile", JSON.stringify(userProfile));
   }, [userProfile]);
 
-  const login = async (email: string) => {
+  const login = async (email: string, token?: string) => {
     try {
       localStorage.setItem("nutrimedai_user_email", email);
+      if (token) {
+        localStorage.setItem(SESSION_TOKEN_KEY, token);
+      }
 
       const res = await fetch("http://localhost:5000/api/profile", {
         method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ email }),
+        headers: { "Content-Type": "application/json", ...authHeaders() },
+        body: JSON.stringify({}),
       });
 
+      if (res.status === 401) {
+        // Expired or missing session: the next login issues a new token
+        localStorage.removeItem(SESSION_TOKEN_KEY);
+      }
       if (!res.ok) throw new Error("Profile fetch failed");
+      saveSessionToken(res);
 
       const data = await res.json();
 
@@ -214,6 +238,7 @@ export function UserProvider({ children }: { children: ReactNode }) {
     setUserProfile(defaultProfile);
     localStorage.removeItem("nutrimedai_user_profile");
     localStorage.removeItem("nutrimedai_user_email");
+    localStorage.removeItem(SESSION_TOKEN_KEY);
   };
 
   return (